@@ -0,0 +1,72 @@
+"""
+Measure availability read throughput while writer threads book and confirm seats, reading either the published snapshot
+(Screening.availability) or the live screening under its lock.
+
+Each read fetches the title availability and the seat map with a booking's seats marked, as the main menu and check_booking do.
+
+Run with `python -m benchmarks.availability_reads [readers] [writers] [seconds]`.
+"""
+import random
+import sys
+import threading
+import time
+
+from cinema.screening import Screening
+
+def writer(screening:Screening, seed:int, stop:threading.Event) -> int:
+  rng = random.Random(seed)
+  writes = 0
+  while not stop.is_set():
+    booking_id = screening.create_booking(rng.randint(1, 6))
+    if not booking_id:
+      break
+    screening.confirm_booking(booking_id)
+    writes += 1
+  return writes
+
+def snapshot_read(screening:Screening, selection:dict):
+  availability = screening.availability
+  return availability.get_title_availability(), availability.get_theatre(selection)
+
+def locked_read(screening:Screening, selection:dict):
+  with screening._lock:
+    return screening.get_title_availability(), screening.get_theatre(selection)
+
+def run(read, readers:int, writers:int, seconds:float, rows:int=200, spr:int=60) -> tuple[float, float]:
+  """
+  :return: Reads and writes per second.
+  """
+  screening = Screening("Benchmark", rows, spr, hold_timeout=60)
+  selection = {0: [0, 1, 2, 3]}
+  stop = threading.Event()
+  counts = []
+
+  def reader():
+    reads = 0
+    while not stop.is_set():
+      read(screening, selection)
+      reads += 1
+    counts.append(("read", reads))
+
+  def write(seed):
+    counts.append(("write", writer(screening, seed, stop)))
+
+  threads = [threading.Thread(target=reader) for i in range(readers)] + [threading.Thread(target=write, args=(i,)) for i in range(writers)]
+  start = time.perf_counter()
+  for thread in threads:
+    thread.start()
+  time.sleep(seconds)
+  stop.set()
+  for thread in threads:
+    thread.join()
+  elapsed = time.perf_counter() - start
+  return tuple(sum(count for kind, count in counts if kind == name) / elapsed for name in ["read", "write"])
+
+def main(readers=8, writers=2, seconds=2.0):
+  print(f"{readers} readers, {writers} writers for {seconds}s")
+  for name, read in [("locked live reads", locked_read), ("snapshot reads", snapshot_read)]:
+    reads, writes = run(read, readers, writers, seconds)
+    print(f"{name}: {reads:,.0f} reads/sec, {writes:,.0f} writes/sec")
+
+if __name__ == "__main__":
+  main(*[int(arg) for arg in sys.argv[1:3]], *[float(arg) for arg in sys.argv[3:4]])
@@ -0,0 +1,88 @@
+"""
+Compare memory per booking of the booking stores, against bookings kept as plain objects with seats as dictionaries of lists.
+After creating the bookings, a share of them change seats, some several times, as customers picking other seats would.
+
+Run with `python -m benchmarks.booking_memory [bookings] [changes_per_booking]`.
+"""
+import random
+import sys
+import time
+import tracemalloc
+
+from cinema.booking import BOOKING_STORES
+
+class DictBooking:
+  """
+  Booking with a __dict__ and seats kept as a dictionary of lists, for comparison.
+  """
+  def __init__(self, id, count, seats, confirmed=False):
+    self.id = id
+    self.count = count
+    self.seats = seats.copy()
+    self.confirmed = confirmed
+
+def selections(bookings:int, spr:int=500, seed:int=0) -> list[tuple[int, dict]]:
+  """
+  Parties of 1-6 tickets seated one after another, row by row, so parties reaching the end of a row are split over two rows.
+  """
+  rng = random.Random(seed)
+  entries = []
+  position = 0
+  for i in range(bookings):
+    tickets = rng.randint(1, 6)
+    selection = {}
+    for seat in range(position, position + tickets):
+      selection.setdefault(seat // spr, []).append(seat % spr)
+    position += tickets
+    entries.append((tickets, selection))
+  return entries
+
+def seat_changes(entries:list[tuple[int, dict]], changes_per_booking:float, seed:int=1) -> list[tuple[int, dict]]:
+  """
+  Seat changes as (booking index, new seats) pairs, each moving a booking to the seats of another random booking, which may span
+  a different number of rows.
+  """
+  rng = random.Random(seed)
+  return [
+    (rng.randrange(len(entries)), rng.choice(entries)[1]) for i in range(int(len(entries) * changes_per_booking))
+  ]
+
+def measure(create, entries, changes) -> tuple[float, float]:
+  """
+  :return: Bytes allocated per booking and bookings created or changed per second.
+  """
+  tracemalloc.start()
+  start = time.perf_counter()
+  store = create(entries, changes)
+  elapsed = time.perf_counter() - start
+  size, _ = tracemalloc.get_traced_memory()
+  tracemalloc.stop()
+  del store
+  return size / len(entries), (len(entries) + len(changes)) / elapsed
+
+def create_dict_bookings(entries, changes):
+  bookings = {f"GIC{idx:04d}": DictBooking(f"GIC{idx:04d}", tickets, seats) for idx, (tickets, seats) in enumerate(entries, 1)}
+  for idx, seats in changes:
+    bookings[f"GIC{idx + 1:04d}"].seats = seats.copy()
+  return bookings
+
+def create_store(name):
+  def create(entries, changes):
+    store = BOOKING_STORES[name]()
+    for tickets, seats in entries:
+      store.create_booking(tickets, seats)
+    for idx, seats in changes:
+      store.update_booking(f"GIC{idx + 1:04d}", seats)
+    return store
+  return create
+
+def main(bookings=200000, changes_per_booking=0.5):
+  entries = selections(bookings)
+  changes = seat_changes(entries, changes_per_booking)
+  print(f"{bookings} bookings of 1-6 seats, {len(changes)} seat changes")
+  for name, create in [("dict of lists", create_dict_bookings), *[(name, create_store(name)) for name in BOOKING_STORES]]:
+    per_booking, rate = measure(create, entries, changes)
+    print(f"{name}: {per_booking:.0f} bytes per booking, {rate:,.0f} bookings and changes/sec")
+
+if __name__ == "__main__":
+  main(*[float(arg) if i else int(arg) for i, arg in enumerate(sys.argv[1:3])])
@@ -0,0 +1,38 @@
+"""
+Compare booking parties one at a time against Screening.create_bookings.
+
+Run with `python -m benchmarks.bulk_booking [parties] [rows] [spr]`.
+"""
+import random
+import sys
+import time
+
+from cinema.screening import Screening
+
+def main(parties=50000, rows=400, spr=400):
+  rng = random.Random(0)
+  ticket_counts = [rng.randint(1, 6) for i in range(parties)]
+
+  sequential = Screening("Sequential", rows, spr)
+  start = time.perf_counter()
+  sequential_ids = []
+  for tickets in ticket_counts:
+    booking_id = sequential.create_booking(tickets)
+    if booking_id:
+      sequential.confirm_booking(booking_id)
+    sequential_ids.append(booking_id)
+  sequential_time = time.perf_counter() - start
+
+  bulk = Screening("Bulk", rows, spr)
+  start = time.perf_counter()
+  bulk_ids = [booking_id for booking_id, selection in bulk.create_bookings(ticket_counts)]
+  bulk_time = time.perf_counter() - start
+
+  assert bulk_ids == sequential_ids
+  assert bulk.get_theatre() == sequential.get_theatre()
+  print(f"{parties} parties in a {rows}x{spr} theatre")
+  print(f"create_booking + confirm_booking: {sequential_time:.3f}s ({parties / sequential_time:,.0f} parties/sec)")
+  print(f"create_bookings: {bulk_time:.3f}s ({parties / bulk_time:,.0f} parties/sec), {sequential_time / bulk_time:.1f}x faster")
+
+if __name__ == "__main__":
+  main(*[int(arg) for arg in sys.argv[1:4]])
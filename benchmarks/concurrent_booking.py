@@ -0,0 +1,54 @@
+"""
+Stress a single Screening in concurrent booking mode from a pool of worker threads, as box-office terminals would.
+
+Each worker books parties of 1-6 tickets, optionally changes seats, and confirms until the screening is sold out.
+Afterwards every confirmed seat is checked to belong to exactly one booking.
+
+Run with `python -m benchmarks.concurrent_booking [workers] [rows] [spr]`.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import random
+import sys
+import time
+
+from cinema.screening import Screening
+
+def terminal(screening:Screening, seed:int) -> int:
+  rng = random.Random(seed)
+  booked = 0
+  while True:
+    booking_id = screening.create_booking(rng.randint(1, 6))
+    if not booking_id:
+      if screening.get_vacancy() == 0:
+        return booked
+      # Remaining seats are either too few for this party or held by bookings about to be confirmed.
+      continue
+    if rng.random() < 0.2:
+      row = screening.row_to_alpha_row(rng.randrange(min(screening.rows, 26)))
+      screening.change_seats(booking_id, row, str(rng.randint(1, screening.spr)))
+    screening.confirm_booking(booking_id)
+    booked += 1
+
+def check_no_double_allocation(screening:Screening) -> int:
+  seen = set()
+  for booking in screening.bookings.values():
+    for row_idx, seats in booking.seats.items():
+      for seat_idx in seats:
+        if (row_idx, seat_idx) in seen:
+          raise AssertionError(f"Seat {(row_idx, seat_idx)} allocated twice!")
+        seen.add((row_idx, seat_idx))
+  return len(seen)
+
+def main(workers=8, rows=200, spr=100):
+  screening = Screening("Stress", rows, spr, hold_timeout=60)
+  start = time.perf_counter()
+  with ThreadPoolExecutor(workers) as pool:
+    bookings = sum(pool.map(terminal, [screening] * workers, range(workers)))
+  elapsed = time.perf_counter() - start
+
+  seats = check_no_double_allocation(screening)
+  print(f"{workers} workers, {rows}x{spr} theatre: {bookings} bookings in {elapsed:.2f}s ({bookings / elapsed:,.0f} bookings/sec)")
+  print(f"{seats} seats allocated exactly once, {screening.get_vacancy()} seats left")
+
+if __name__ == "__main__":
+  main(*[int(arg) for arg in sys.argv[1:4]])
@@ -0,0 +1,40 @@
+"""
+Measure restart time of a journaled screening holding many bookings.
+
+Books and confirms parties of 1-3 tickets through a journaled screening, closes it, then times open_screening,
+which loads the latest snapshot and replays the journal tail.
+
+Run with `python -m benchmarks.journal_startup [bookings] [snapshot_every]`.
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+from cinema.journal import JOURNAL_FILE, SNAPSHOT_FILE, open_screening
+
+def main(bookings=100000, snapshot_every=60000):
+  rng = random.Random(0)
+  with tempfile.TemporaryDirectory() as directory:
+    # Enough seats for the bookings with room to spare, so every party can be seated.
+    screening = open_screening(directory, "Benchmark", 500, 500, journal_options={"snapshot_every": snapshot_every})
+    start = time.perf_counter()
+    for i in range(bookings):
+      screening.confirm_booking(screening.create_booking(rng.randint(1, 3)))
+    screening.journal.close()
+    print(f"Recorded {bookings} bookings in {time.perf_counter() - start:.2f}s")
+    for name in [SNAPSHOT_FILE, JOURNAL_FILE]:
+      print(f"  {name}: {os.path.getsize(os.path.join(directory, name)) / 1024 / 1024:.2f} MiB")
+
+    start = time.perf_counter()
+    restored = open_screening(directory)
+    elapsed = time.perf_counter() - start
+    restored.journal.close()
+
+    assert len(restored.bookings) == bookings
+    assert restored.get_theatre() == screening.get_theatre()
+    print(f"Restored {len(restored.bookings)} bookings ({restored.journal.sequence} events) in {elapsed:.3f}s")
+
+if __name__ == "__main__":
+  main(*[int(arg) for arg in sys.argv[1:3]])
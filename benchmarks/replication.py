@@ -0,0 +1,110 @@
+"""
+Measure replication lag and follower read throughput, with followers in separate processes standing in for read replicas.
+
+The leader books and confirms parties of 1-6 tickets at a steady rate, changing seats for some, while each follower serves
+availability and check_booking reads as fast as it can. Once the leader is done, each follower waits to catch up and checks
+its seat map and bookings match the leader's.
+
+Run with `python -m benchmarks.replication [followers] [bookings] [rows] [spr]`.
+"""
+import hashlib
+import multiprocessing
+import random
+import sys
+import threading
+import time
+
+from cinema.replication import ReplicationFollower, ReplicationLeader
+from cinema.screening import Screening
+
+def state_digest(screening:Screening) -> str:
+  bookings = sorted((booking.id, booking.confirmed, sorted(booking.seats.items())) for booking in screening.bookings.values())
+  return hashlib.sha256((screening.get_theatre() + repr(bookings)).encode()).hexdigest()
+
+def follower_process(address, seed:int, ready, final_sequence, results):
+  follower = ReplicationFollower(address).start(timeout=10)
+  rng = random.Random(seed)
+  stop = threading.Event()
+  reads = [0]
+
+  def reader():
+    while not stop.is_set():
+      follower.get_title_availability()
+      issued = follower.screening.bookings.next_id - 1
+      if issued:
+        follower.check_booking(f"GIC{rng.randint(1, issued):04d}")
+      reads[0] += 2
+
+  threads = [threading.Thread(target=reader) for i in range(2)]
+  ready.set()
+  start = time.perf_counter()
+  for thread in threads:
+    thread.start()
+  while final_sequence.value < 0:
+    time.sleep(0.01)
+  caught_up = follower.wait_for(final_sequence.value, timeout=30)
+  stop.set()
+  for thread in threads:
+    thread.join()
+  elapsed = time.perf_counter() - start
+  lags = sorted(follower.lags)
+  follower.close()
+  results.put({
+    "caught_up": caught_up,
+    "reads_per_sec": reads[0] / elapsed,
+    "events": len(lags),
+    "lag_p50_ms": lags[len(lags) // 2] * 1000 if lags else 0,
+    "lag_p99_ms": lags[min(len(lags) - 1, len(lags) * 99 // 100)] * 1000 if lags else 0,
+    "lag_max_ms": lags[-1] * 1000 if lags else 0,
+    "digest": state_digest(follower.screening),
+  })
+
+def run(followers:int=2, bookings:int=2000, rows=40, spr=50, interval:float=0.0005) -> tuple[list[dict], str]:
+  """
+  :param interval: Seconds between bookings on the leader.
+  :return: Results of each follower, and the digest of the leader's final state.
+  """
+  screening = Screening("Replicated", rows, spr, hold_timeout=60)
+  leader = ReplicationLeader(screening)
+  final_sequence = multiprocessing.Value("q", -1)
+  results = multiprocessing.Queue()
+  readiness = [multiprocessing.Event() for i in range(followers)]
+  processes = [
+    multiprocessing.Process(target=follower_process, args=(leader.address, seed, ready, final_sequence, results))
+    for seed, ready in enumerate(readiness)
+  ]
+  for process in processes:
+    process.start()
+  for ready in readiness:
+    ready.wait(30)
+
+  rng = random.Random(0)
+  for i in range(bookings):
+    booking_id = screening.create_booking(rng.randint(1, 6))
+    if not booking_id:
+      break
+    if rng.random() < 0.2:
+      alpha_row, seat_num = screening.row_coord_to_seat(rng.randrange(rows), rng.randrange(spr))
+      screening.change_seats(booking_id, alpha_row, seat_num)
+    screening.confirm_booking(booking_id)
+    time.sleep(interval)
+  with screening._lock:
+    final_sequence.value = leader.sequence
+
+  outcomes = [results.get(timeout=60) for process in processes]
+  for process in processes:
+    process.join()
+  leader.close()
+  return outcomes, state_digest(screening)
+
+def main(followers=2, bookings=2000, rows=40, spr=50):
+  outcomes, digest = run(followers, bookings, rows, spr)
+  for idx, outcome in enumerate(outcomes):
+    print(
+      f"Follower {idx}: {outcome['events']} events, lag p50 {outcome['lag_p50_ms']:.2f} ms, p99 {outcome['lag_p99_ms']:.2f} ms, "
+      f"max {outcome['lag_max_ms']:.2f} ms, {outcome['reads_per_sec']:,.0f} reads/sec, "
+      f"{'matches' if outcome['caught_up'] and outcome['digest'] == digest else 'DOES NOT match'} the leader"
+    )
+
+if __name__ == "__main__":
+  main(*[int(arg) for arg in sys.argv[1:5]])
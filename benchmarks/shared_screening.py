@@ -0,0 +1,76 @@
+"""
+Scale bookings and seat reads on one SharedScreening from 1 to N worker processes.
+
+Each worker attaches to the same memory-mapped screening, then books parties of 1-6 tickets, changing seats for some, and
+confirms them until the screening is sold out. Between bookings it reads seat states and vacancies straight from the mapping,
+as kiosks showing availability would. Afterwards every claimed seat is checked to belong to exactly one booking.
+
+Run with `python -m benchmarks.shared_screening [max_workers] [rows] [spr] [reads_per_booking]`.
+"""
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+
+from cinema.shared import SharedScreening
+
+def worker(path:str, seed:int, reads_per_booking:int, start, results):
+  screening = SharedScreening(path)
+  rng = random.Random(seed)
+  bookings = reads = 0
+  start.wait()
+  began = time.perf_counter()
+  while True:
+    for i in range(reads_per_booking):
+      screening.is_free(rng.randrange(screening.rows), rng.randrange(screening.spr))
+      screening.get_vacancy()
+    reads += 2 * reads_per_booking
+    booking_id = screening.create_booking(rng.randint(1, 6))
+    if not booking_id:
+      if screening.get_vacancy() == 0:
+        break
+      # Remaining seats are too few for this party, or held by bookings about to be confirmed.
+      continue
+    if rng.random() < 0.2:
+      alpha_row, seat_num = screening.local.row_coord_to_seat(rng.randrange(screening.rows), rng.randrange(screening.spr))
+      screening.change_seats(booking_id, alpha_row, seat_num)
+    screening.confirm_booking(booking_id)
+    bookings += 1
+  results.put((bookings, reads, time.perf_counter() - began))
+  screening.close()
+
+def run(workers:int, rows:int, spr:int, reads_per_booking:int) -> tuple[int, int, float, int]:
+  """
+  :return: Bookings, reads, seconds until the last worker finished and seats checked.
+  """
+  with tempfile.TemporaryDirectory() as directory:
+    path = os.path.join(directory, "screening.shared")
+    screening = SharedScreening.create(path, "Benchmark", rows, spr)
+    start = multiprocessing.Event()
+    results = multiprocessing.Queue()
+    processes = [
+      multiprocessing.Process(target=worker, args=(path, seed, reads_per_booking, start, results)) for seed in range(workers)
+    ]
+    for process in processes:
+      process.start()
+    start.set()
+    outcomes = [results.get() for process in processes]
+    for process in processes:
+      process.join()
+    seats = screening.check_no_double_allocation()
+    screening.close()
+  return sum(outcome[0] for outcome in outcomes), sum(outcome[1] for outcome in outcomes), max(outcome[2] for outcome in outcomes), seats
+
+def main(max_workers=4, rows=200, spr=100, reads_per_booking=20):
+  print(f"{rows}x{spr} theatre, {reads_per_booking * 2} reads per booking, {os.cpu_count()} CPUs")
+  for workers in range(1, max_workers + 1):
+    bookings, reads, elapsed, seats = run(workers, rows, spr, reads_per_booking)
+    print(
+      f"{workers} workers: {bookings} bookings in {elapsed:.2f}s ({bookings / elapsed:,.0f} bookings/sec, "
+      f"{reads / elapsed:,.0f} reads/sec), {seats} seats allocated exactly once"
+    )
+
+if __name__ == "__main__":
+  main(*[int(arg) for arg in sys.argv[1:5]])
@@ -0,0 +1,183 @@
+"""
+Simulate sell-outs of many screenings across a pool of processes, for capacity planning of hall layouts and pricing.
+
+Each scenario books random parties into one hall until it sells out, changing seats and abandoning bookings at random, and
+reports its fill rate, operation latencies and allocation overflows as one JSON line. Scenarios are generated from a single
+seed, so every field of a run except the latencies is reproduced by rerunning with the same seed, whatever the number of workers.
+
+Run with `python -m benchmarks.simulation [--scenarios N] [--seed N] [--workers N] [--halls small,26x51] [--output results.jsonl]`.
+"""
+import argparse
+import json
+from multiprocessing import Pool
+import random
+import sys
+import time
+
+from benchmarks.suite import HALLS
+from cinema.instrumentation import metrics
+from cinema.screening import Screening
+
+# Parties turned away in a row before a scenario stops, when the seats left are too few or too scattered for the parties arriving.
+MAX_TURNED_AWAY = 20
+
+def parse_halls(halls:str) -> list[tuple[int, int]]:
+  """
+  :param halls: Comma-separated hall names from benchmarks.suite.HALLS or sizes as [Rows]x[SeatsPerRow], e.g. "small,26x51".
+  """
+  sizes = []
+  for hall in halls.split(","):
+    if hall in HALLS:
+      sizes.append(HALLS[hall])
+    else:
+      rows, _, spr = hall.partition("x")
+      if not rows.isnumeric() or not spr.isnumeric():
+        raise Exception(f"\"{hall}\" is not a hall name or [Rows]x[SeatsPerRow]!")
+      sizes.append((int(rows), int(spr)))
+  return sizes
+
+def generate_scenarios(seed:int, count:int, halls:list[tuple[int, int]], party_max:int=6, change_rate:float=0.2,
+                       abandon_rate:float=0.05, together_rate:float=0.0):
+  """
+  Yield count scenarios, cycling through the halls, each with its own seed drawn from the run's seed.
+  """
+  rng = random.Random(seed)
+  for idx in range(count):
+    rows, spr = halls[idx % len(halls)]
+    yield {
+      "scenario": idx, "seed": rng.getrandbits(32), "rows": rows, "spr": spr, "party_max": party_max,
+      "change_rate": change_rate, "abandon_rate": abandon_rate, "together_rate": together_rate,
+    }
+
+def latency_summary(timings:list[float]) -> dict:
+  """
+  :return: Mean, median, 99th percentile and maximum of timings in microseconds.
+  """
+  if not timings:
+    return {"n": 0}
+  timings.sort()
+  return {
+    "n": len(timings),
+    "mean_us": round(sum(timings) / len(timings) * 1000000, 2),
+    "p50_us": round(timings[len(timings) // 2] * 1000000, 2),
+    "p99_us": round(timings[min(len(timings) - 1, len(timings) * 99 // 100)] * 1000000, 2),
+    "max_us": round(timings[-1] * 1000000, 2),
+  }
+
+def run_scenario(scenario:dict) -> dict:
+  """
+  Sell out one screening: book parties of 1 to party_max tickets, sometimes changing seats to a random position first,
+  and confirm all but the abandoned bookings, until the hall is full or MAX_TURNED_AWAY parties in a row cannot be seated.
+  """
+  rng = random.Random(scenario["seed"])
+  rows, spr = scenario["rows"], scenario["spr"]
+  screening = Screening("Simulation", rows, spr)
+  timings = {"create_booking": [], "change_seats": [], "confirm_booking": []}
+  counts = {"bookings": 0, "changes": 0, "abandoned": 0, "turned_away": 0, "split_parties": 0}
+  # Allocation counters are read from the process-wide registry, isolated so the caller's metrics are left as they were.
+  with metrics.isolated():
+    clock = time.perf_counter
+    start = clock()
+
+    turned_away = 0
+    while screening.get_vacancy() > 0 and turned_away < MAX_TURNED_AWAY:
+      tickets = rng.randint(1, scenario["party_max"])
+      together = rng.random() < scenario["together_rate"]
+      before = clock()
+      booking_id = screening.create_booking(tickets, together=together)
+      timings["create_booking"].append(clock() - before)
+      if not booking_id:
+        counts["turned_away"] += 1
+        turned_away += 1
+        continue
+      turned_away = 0
+      counts["bookings"] += 1
+      if rng.random() < scenario["change_rate"]:
+        alpha_row, seat_num = screening.row_coord_to_seat(rng.randrange(rows), rng.randrange(spr))
+        before = clock()
+        screening.change_seats(booking_id, alpha_row, seat_num)
+        timings["change_seats"].append(clock() - before)
+        counts["changes"] += 1
+      if rng.random() < scenario["abandon_rate"]:
+        counts["abandoned"] += 1
+        continue
+      if len(screening.bookings.get_booking(booking_id).seats) > 1:
+        counts["split_parties"] += 1
+      before = clock()
+      screening.confirm_booking(booking_id)
+      timings["confirm_booking"].append(clock() - before)
+
+    elapsed = clock() - start
+    allocation = {name: value for (name, labels), value in metrics.counters.items() if name.startswith("allocate_")}
+  capacity = rows * spr
+  return {
+    **scenario,
+    **counts,
+    "fill_rate": round((capacity - screening.get_vacancy()) / capacity, 6) if capacity else 0,
+    "overflow_recursions": allocation.get("allocate_overflow_recursions_total", 0),
+    "rows_scanned": allocation.get("allocate_rows_scanned_total", 0),
+    "elapsed_s": round(elapsed, 6),
+    "latency": {operation: latency_summary(operation_timings) for operation, operation_timings in timings.items()},
+  }
+
+def run_simulation(scenarios, output, workers:int=1, chunksize:int=1) -> dict:
+  """
+  Run scenarios across a process pool, writing each result to output as one JSON line in scenario order, as soon as it and
+  every earlier scenario have finished.
+  :param scenarios: Iterable of scenarios, e.g. from generate_scenarios. It is consumed lazily, so it may be a long generator.
+  :return: Totals over all scenarios.
+  """
+  encode = json.JSONEncoder(separators=(",", ":")).encode
+  totals = {"scenarios": 0, "seats": 0, "seats_sold": 0, "bookings": 0, "overflow_recursions": 0}
+
+  def record(result):
+    output.write(encode(result) + "\n")
+    capacity = result["rows"] * result["spr"]
+    totals["scenarios"] += 1
+    totals["seats"] += capacity
+    totals["seats_sold"] += round(result["fill_rate"] * capacity)
+    totals["bookings"] += result["bookings"]
+    totals["overflow_recursions"] += result["overflow_recursions"]
+
+  if workers <= 1:
+    for scenario in scenarios:
+      record(run_scenario(scenario))
+  else:
+    with Pool(workers) as pool:
+      for result in pool.imap(run_scenario, scenarios, chunksize):
+        record(result)
+  totals["fill_rate"] = totals["seats_sold"] / totals["seats"] if totals["seats"] else 0
+  return totals
+
+def main(args=None):
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--scenarios", type=int, default=100, help="Number of scenarios to run")
+  parser.add_argument("--seed", type=int, default=0, help="Seed all scenarios are generated from")
+  parser.add_argument("--workers", type=int, default=4, help="Number of processes, 1 to run in this process")
+  parser.add_argument("--halls", default="small,medium,large", help="Hall names or [Rows]x[SeatsPerRow] sizes, cycled through")
+  parser.add_argument("--party-max", type=int, default=6, help="Largest party size")
+  parser.add_argument("--change-rate", type=float, default=0.2, help="Share of bookings which change seats before confirming")
+  parser.add_argument("--abandon-rate", type=float, default=0.05, help="Share of bookings which are never confirmed")
+  parser.add_argument("--together-rate", type=float, default=0.0, help="Share of parties booked with create_booking(together=True)")
+  parser.add_argument("--output", help="File to write JSON lines to, defaults to stdout")
+  options = parser.parse_args(args)
+
+  scenarios = generate_scenarios(
+    options.seed, options.scenarios, parse_halls(options.halls), options.party_max, options.change_rate, options.abandon_rate,
+    options.together_rate
+  )
+  start = time.perf_counter()
+  if options.output:
+    with open(options.output, "w") as output:
+      totals = run_simulation(scenarios, output, options.workers)
+  else:
+    totals = run_simulation(scenarios, sys.stdout, options.workers)
+  elapsed = time.perf_counter() - start
+  print(
+    f"{totals['scenarios']} scenarios, {totals['bookings']:,} bookings in {elapsed:.2f}s, "
+    f"{totals['fill_rate']:.2%} of {totals['seats']:,} seats sold, {totals['overflow_recursions']:,} overflow recursions",
+    file=sys.stderr
+  )
+
+if __name__ == "__main__":
+  main(sys.argv[1:])
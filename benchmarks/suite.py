@@ -0,0 +1,189 @@
+"""
+Reproducible benchmark suite for the hot paths of Screening and Bookings, with results written as JSON so runs on different
+commits can be compared.
+
+Run with `python -m benchmarks.suite [--output results.json] [--compare baseline.json] [--filter name] [--quick]`.
+"""
+import argparse
+from itertools import cycle
+import json
+import platform
+import random
+import subprocess
+import sys
+import time
+
+from cinema.screening import Screening
+
+# Hall sizes as (rows, spr), covering odd and even seats per row.
+HALLS = {
+  "small": (8, 10),
+  "medium": (26, 51),
+  "large": (200, 300),
+  "arena": (1000, 501),
+}
+
+def filled_screening(rows:int, spr:int, fill:float, seed:int=0) -> Screening:
+  """
+  Screening with roughly fill of its seats confirmed, booked by parties of 1-6 tickets.
+  """
+  rng = random.Random(seed)
+  screening = Screening("Benchmark", rows, spr)
+  target = int(rows * spr * fill)
+  list(screening.create_bookings(rng.randint(1, 6) for i in range(target // 3)))
+  while screening.get_vacancy() > rows * spr - target:
+    screening.confirm_booking(screening.create_booking(min(rng.randint(1, 6), screening.get_vacancy() - (rows * spr - target))))
+  return screening
+
+def case_allocate(hall:str, fill:float):
+  def setup():
+    screening = filled_screening(*HALLS[hall], fill)
+    tickets = min(4, screening.get_vacancy())
+    return lambda: screening.allocate_seats(tickets)
+  return setup
+
+def case_change_seats(hall:str):
+  def setup():
+    rows, spr = HALLS[hall]
+    screening = filled_screening(rows, spr, 0.5)
+    booking_id = screening.create_booking(4)
+    rng = random.Random(1)
+    positions = [(screening.row_to_alpha_row(rng.randrange(min(rows, 26))), str(rng.randint(1, spr))) for i in range(64)]
+    position = cycle(positions)
+    return lambda: screening.change_seats(booking_id, *next(position))
+  return setup
+
+def case_get_theatre(hall:str, with_selection:bool, cached:bool=True):
+  def setup():
+    screening = filled_screening(*HALLS[hall], 0.5)
+    selection = screening.bookings.get_booking(screening.create_booking(6)).seats if with_selection else None
+    if cached:
+      return lambda: screening.get_theatre(selection)
+    every_row = dict(enumerate(screening.availability.occupancy))
+    def render_from_scratch():
+      # A snapshot publishing every row as changed renders each of them again.
+      screening.availability = screening.availability.publish(screening.title, screening.vacancies, every_row)
+      return screening.get_theatre(selection)
+    return render_from_scratch
+  return setup
+
+# Bookings created for each confirm_booking case, which also caps the number of timed calls.
+CONFIRM_BUDGET = 200000
+
+def case_confirm_booking(hall:str):
+  def setup():
+    rows, spr = HALLS[hall]
+    # In hold mode each booking is given its own seat, so every confirmation takes a free seat, as in valid use.
+    # The hold never runs out during the case.
+    screening = Screening("Benchmark", rows, spr, hold_timeout=86400)
+    budget = min(CONFIRM_BUDGET, rows * spr)
+    booking_ids = iter([screening.create_booking(1) for i in range(budget)])
+    return lambda: screening.confirm_booking(next(booking_ids)), budget
+  return setup
+
+def case_get_booking(bookings:int):
+  def setup():
+    screening = Screening("Benchmark", 1000, 1000)
+    list(screening.create_bookings([1] * bookings))
+    rng = random.Random(2)
+    booking_ids = [f"GIC{rng.randint(1, bookings):04d}" for i in range(1024)]
+    position = cycle(booking_ids)
+    return lambda: screening.bookings.get_booking(next(position))
+  return setup
+
+CASES = {
+  **{f"allocate_seats/{hall}/{name}": case_allocate(hall, fill)
+     for hall in HALLS for name, fill in [("fresh", 0), ("half", 0.5), ("nearly_full", 0.98)]},
+  **{f"change_seats/{hall}": case_change_seats(hall) for hall in HALLS},
+  **{f"get_theatre/{hall}": case_get_theatre(hall, False) for hall in HALLS},
+  **{f"get_theatre_selection/{hall}": case_get_theatre(hall, True) for hall in HALLS},
+  **{f"get_theatre_uncached/{hall}": case_get_theatre(hall, False, cached=False) for hall in HALLS},
+  **{f"confirm_booking/{hall}": case_confirm_booking(hall) for hall in ["small", "large"]},
+  **{f"get_booking/{count}": case_get_booking(count) for count in [1000, 100000, 1000000]},
+}
+
+def measure(operation, min_time:float, repeat:int, budget:int=None) -> dict:
+  """
+  Time an operation in rounds of at least min_time seconds, keeping the fastest round to reduce noise.
+  :param budget: Maximum number of calls the operation supports, for operations which consume prepared state.
+  """
+  number = 1
+  calibration_calls = 0
+  while True:
+    start = time.perf_counter()
+    for i in range(number):
+      operation()
+    elapsed = time.perf_counter() - start
+    calibration_calls += number
+    # Calibration uses at most half of a budget, leaving the rest for the timed rounds.
+    if elapsed >= min_time / 10 or number >= 1000000 or (budget and calibration_calls + number * 10 > budget // 2):
+      break
+    number *= 10
+  number = max(1, int(number * (min_time / max(elapsed, 1e-9))))
+  if budget:
+    number = max(1, min(number, (budget - calibration_calls) // repeat))
+
+  best = float("inf")
+  for i in range(repeat):
+    start = time.perf_counter()
+    for j in range(number):
+      operation()
+    best = min(best, (time.perf_counter() - start) / number)
+  return {"mean_us": best * 1000000, "ops_per_sec": 1 / best, "number": number, "repeat": repeat}
+
+def git_commit() -> str:
+  try:
+    return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+  except (OSError, subprocess.CalledProcessError):
+    return ""
+
+def run(name_filter:str="", min_time:float=0.2, repeat:int=5) -> dict:
+  results = {}
+  for name, setup in CASES.items():
+    if name_filter not in name:
+      continue
+    # Setups return the operation to time, or the operation and its call budget.
+    operation, budget = setup(), None
+    if isinstance(operation, tuple):
+      operation, budget = operation
+    results[name] = measure(operation, min_time, repeat, budget)
+    print(f"{name}: {results[name]['mean_us']:.2f} us", file=sys.stderr)
+  return {
+    "commit": git_commit(),
+    "python": platform.python_version(),
+    "machine": platform.machine(),
+    "results": results,
+  }
+
+def compare(current:dict, baseline:dict) -> list[str]:
+  """
+  Describe the change in mean time of each case found in both runs. Ratios above 1 are slowdowns.
+  """
+  lines = []
+  for name, result in current["results"].items():
+    previous = baseline["results"].get(name)
+    if previous:
+      ratio = result["mean_us"] / previous["mean_us"]
+      lines.append(f"{name}: {previous['mean_us']:.2f} us -> {result['mean_us']:.2f} us ({ratio:.2f}x)")
+  return lines
+
+def main(args=None):
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--output", help="File to write JSON results to, defaults to stdout")
+  parser.add_argument("--compare", help="JSON results of a previous run to compare against")
+  parser.add_argument("--filter", default="", help="Only run cases whose name contains this string")
+  parser.add_argument("--quick", action="store_true", help="Shorter rounds, for smoke testing")
+  options = parser.parse_args(args)
+
+  results = run(options.filter, *((0.02, 2) if options.quick else ()))
+  if options.output:
+    with open(options.output, "w") as output:
+      json.dump(results, output, indent=2)
+  else:
+    print(json.dumps(results, indent=2))
+  if options.compare:
+    with open(options.compare) as baseline:
+      print("\n".join(compare(results, json.load(baseline))), file=sys.stderr)
+
+if __name__ == "__main__":
+  main(sys.argv[1:])
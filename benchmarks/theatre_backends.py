@@ -0,0 +1,57 @@
+"""
+Compare memory use and occupancy query throughput of the theatre matrix backends.
+
+Run with `python -m benchmarks.theatre_backends [rows] [spr]`.
+"""
+import sys
+import time
+import tracemalloc
+
+from cinema.theatre import THEATRE_BACKENDS
+
+def measure_memory(backend, rows, spr) -> int:
+  tracemalloc.start()
+  theatre = THEATRE_BACKENDS[backend](rows, spr)
+  size, _ = tracemalloc.get_traced_memory()
+  tracemalloc.stop()
+  del theatre
+  return size
+
+def measure_throughput(backend, rows, spr, repeat=5) -> dict:
+  theatre = THEATRE_BACKENDS[backend](rows, spr)
+  # Occupy every other block of 10 seats, as confirm_booking would for groups of 10, so that free lists and counts are not trivial.
+  blocks = [list(range(seat, min(seat + 10, spr))) for seat in range(0, spr, 20)]
+
+  start = time.perf_counter()
+  for row in range(rows):
+    for block in blocks:
+      theatre.mark(row, block)
+  mark_time = time.perf_counter() - start
+
+  start = time.perf_counter()
+  for i in range(repeat):
+    theatre.count_free()
+  count_time = (time.perf_counter() - start) / repeat
+
+  start = time.perf_counter()
+  for row in range(rows):
+    theatre.free_seats(row)
+  free_seats_time = time.perf_counter() - start
+
+  return {
+    "mark_rows_per_sec": rows / mark_time,
+    "count_free_ms": count_time * 1000,
+    "free_seats_rows_per_sec": rows / free_seats_time,
+  }
+
+def main(rows=2000, spr=500):
+  print(f"Theatre of {rows} rows x {spr} seats")
+  for backend in THEATRE_BACKENDS:
+    memory = measure_memory(backend, rows, spr)
+    results = measure_throughput(backend, rows, spr)
+    print(f"[{backend}] memory: {memory / 1024 / 1024:.2f} MiB ({memory / (rows * spr):.2f} bytes/seat)")
+    for name, value in results.items():
+      print(f"  {name}: {value:,.2f}")
+
+if __name__ == "__main__":
+  main(*[int(arg) for arg in sys.argv[1:3]])
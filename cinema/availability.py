@@ -0,0 +1,220 @@
+from math import isqrt
+
+from cinema.instrumentation import metrics
+
+# Translation table rendering occupancy bytes as seat characters, 0 (unoccupied) as "." and 1 (occupied) as "#".
+_SEAT_CHARS = bytes.maketrans(b"\x00\x01", b".#")
+
+def overlay_row(rendered:str, label_width:int, seats:list[int], spr:int) -> str:
+  """
+  Copy a rendered row and replace the selected seats with "o". Each seat is rendered as " x ", following the row label.
+  """
+  characters = list(rendered)
+  offset = label_width + 1
+  for seat in seats:
+    if 0 <= seat < spr:
+      characters[offset + 3 * seat] = "o"
+  return "".join(characters)
+
+def theatre_frame(rows:int, columns:range) -> tuple[list[str], str]:
+  """
+  Generate the screen header and column labels over a range of seats, which only depend on the theatre size.
+  """
+  # Get width of alphabet labels on left hand. Need to match this with trailing space on right to maintain symmetry
+  vertical_label_width = (rows // 26) + 1
+  row_width = len(columns) * 3
+  # Calculate number of hyphens to represent screen width. Written in this "redundant" way for visualization.
+  screen_width = vertical_label_width + row_width + vertical_label_width
+
+  # Find starting index to place "S C R E E N". Displaced to the left for even number widths
+  screen_label_index = (screen_width - 11) // 2
+  screen_label = (" " * screen_label_index) + "S C R E E N" + (" " * screen_label_index)
+  screen_repr = "-" * screen_width
+
+  column_labels = vertical_label_width * " " + "".join([f" {seat + 1} " for seat in columns])
+  return [screen_label, screen_repr], column_labels
+
+def context_bands(selection:dict, context:int, rows:range) -> list[range]:
+  """
+  Ranges of rows within rows which hold a selected seat or are at most context rows away from one, merging ranges which touch.
+  """
+  bands = []
+  for row in sorted(selection):
+    start, stop = max(row - context, rows.start), min(row + context + 1, rows.stop)
+    if start >= stop:
+      continue
+    if bands and start <= bands[-1].stop:
+      bands[-1] = range(bands[-1].start, max(stop, bands[-1].stop))
+    else:
+      bands.append(range(start, stop))
+  return bands
+
+class RowChunks:
+  __slots__ = ("size", "chunk_size", "chunks")
+
+  def __init__(self, values:list, chunk_size:int=None):
+    """
+    Read-only sequence of one value per row, kept in chunks of consecutive rows so that a version with a few rows replaced
+    (see replace) only copies the chunks holding them, and shares every other chunk with the version it was made from.
+    :param chunk_size: Rows per chunk. Defaults to the square root of the number of rows, which balances copying the list of chunks
+      against copying the chunks themselves.
+    """
+    self.size = len(values)
+    self.chunk_size = chunk_size or max(isqrt(self.size), 1)
+    self.chunks = tuple(values[start:start + self.chunk_size] for start in range(0, self.size, self.chunk_size))
+
+  def __len__(self) -> int:
+    return self.size
+
+  def __getitem__(self, row:int):
+    if row < 0:
+      row += self.size
+    if not 0 <= row < self.size:
+      raise IndexError("row index out of range")
+    return self.chunks[row // self.chunk_size][row % self.chunk_size]
+
+  def __iter__(self):
+    for chunk in self.chunks:
+      yield from chunk
+
+  def replace(self, values:dict) -> "RowChunks":
+    """
+    Copy with the rows in values replaced, e.g. {row_idx: new value}.
+    """
+    chunks = list(self.chunks)
+    copied = set()
+    for row, value in values.items():
+      chunk_idx, offset = divmod(row, self.chunk_size)
+      if chunk_idx not in copied:
+        chunks[chunk_idx] = chunks[chunk_idx].copy()
+        copied.add(chunk_idx)
+      chunks[chunk_idx][offset] = value
+    replaced = RowChunks.__new__(RowChunks)
+    replaced.size, replaced.chunk_size, replaced.chunks = self.size, self.chunk_size, tuple(chunks)
+    return replaced
+
+  def fill(self, row:int, value):
+    """
+    Set a row in place, which every version sharing its chunk sees. Only for cached values which are the same in all of them.
+    """
+    self.chunks[row // self.chunk_size][row % self.chunk_size] = value
+
+class AvailabilitySnapshot:
+  __slots__ = ("version", "title", "rows", "spr", "vacancies", "occupancy", "row_free", "labels", "frame", "_rendered", "_map")
+
+  def __init__(self, version:int, title:str, rows:int, spr:int, vacancies:int, occupancy:RowChunks, row_free:RowChunks, labels:list[str],
+               frame:tuple[list[str], str], rendered:RowChunks=None):
+    """
+    Immutable view of a screening's confirmed seats at one version, published by Screening after each confirmation.
+
+    A snapshot is never changed once published, so readers on any thread can use Screening.availability without taking a lock,
+    and see one consistent version for as long as they hold on to it.
+    :param occupancy: RowChunks of bytes per row, 1 for occupied seats. Chunks of rows unchanged since the previous version are shared with it.
+    :param row_free: RowChunks of unoccupied seat counts per row.
+    :param rendered: Rendered rows carried over from the previous version, None for rows to be rendered when first read.
+    """
+    self.version = version
+    self.title = title
+    self.rows = rows
+    self.spr = spr
+    self.vacancies = vacancies
+    self.occupancy = occupancy
+    self.row_free = row_free
+    self.labels = labels
+    self.frame = frame
+    # Rendering is the only state filled in after publishing. Rendering the same row twice gives the same string,
+    # so concurrent readers filling it in race harmlessly.
+    # Rows are rendered into chunks shared with other versions, which hold the same occupancy for every row of a shared chunk.
+    self._rendered = rendered if rendered is not None else RowChunks([None] * rows)
+    self._map = None
+
+  def get_vacancy(self) -> int:
+    return self.vacancies
+
+  def get_title_availability(self) -> str:
+    return f"{self.title} ({self.vacancies} {'seat' if self.vacancies == 1 else 'seats'} available)"
+
+  def is_free(self, row:int, seat:int) -> bool:
+    return self.occupancy[row][seat] == 0
+
+  def get_theatre(self, selection=None) -> str:
+    """
+    Same output as Screening.get_theatre at this version.
+    :param selection: Dictionary of row_idx: [List of seat_idx], e.g. Booking.seats.
+    """
+    header, footer = self.frame
+    if metrics.enabled:
+      metrics.count("renders_total", cached="yes" if not selection and self._map is not None else "no")
+    if not selection:
+      if self._map is None:
+        self._map = "\n".join(header + [self.rendered_row(idx) for idx in reversed(range(self.rows))] + [footer])
+      return self._map
+
+    visual = header.copy()
+    for idx in reversed(range(self.rows)):
+      selected_seats = selection.get(idx)
+      rendered = self.rendered_row(idx)
+      visual.append(overlay_row(rendered, len(self.labels[idx]), selected_seats, self.spr) if selected_seats else rendered)
+    visual.append(footer)
+    return "\n".join(visual)
+
+  def iter_theatre(self, selection=None, rows:range=None, columns:range=None, context:int=None):
+    """
+    Yield the lines of get_theatre one at a time, or of a window of it, so large halls can be shown a screenful at a time
+    without building the whole map.
+    :param selection: Dictionary of row_idx: [List of seat_idx] to mark "o", e.g. Booking.seats.
+    :param rows: Range of row indexes to show, e.g. range(100, 140). Defaults to every row.
+    :param columns: Range of seat indexes to show, with the screen and column labels narrowed to match. Defaults to every seat.
+    :param context: Only show rows of the selection and this many rows either side of them, with "..." marking skipped rows.
+    """
+    selection = selection or {}
+    rows = range(self.rows) if rows is None else range(max(rows.start, 0), min(rows.stop, self.rows))
+    columns = range(self.spr) if columns is None else range(max(columns.start, 0), min(columns.stop, self.spr))
+    full_width = len(columns) == self.spr
+    header, footer = self.frame if full_width else theatre_frame(self.rows, columns)
+
+    yield from header
+    bands = [rows] if context is None else context_bands(selection, context, rows)
+    for band_idx, band in enumerate(reversed(bands)):
+      if band_idx > 0:
+        yield " " * len(self.labels[band.stop]) + " ..."
+      for idx in reversed(band):
+        selected_seats = selection.get(idx)
+        if full_width:
+          rendered = self.rendered_row(idx)
+          yield overlay_row(rendered, len(self.labels[idx]), selected_seats, self.spr) if selected_seats else rendered
+        else:
+          yield self._window_row(idx, selected_seats, columns)
+    yield footer
+
+  def _window_row(self, row:int, seats:list[int], columns:range) -> str:
+    label_width = len(self.labels[row])
+    # Seat n of a rendered row is " x " starting at label_width + 3n, except the last seat's trailing space is stripped.
+    rendered = self.rendered_row(row)
+    window = (self.labels[row] + rendered[label_width + 3 * columns.start:label_width + 3 * columns.stop]).rstrip()
+    if seats:
+      window = overlay_row(window, label_width, [seat - columns.start for seat in seats if seat in columns], len(columns))
+    return window
+
+  def rendered_row(self, row:int) -> str:
+    rendered = self._rendered[row]
+    if rendered is None:
+      if metrics.enabled:
+        metrics.count("rows_rendered_total")
+      seats = self.occupancy[row].translate(_SEAT_CHARS).decode()
+      # Same as joining " . " and " # " per seat after the label, then stripping the trailing space.
+      rendered = self.labels[row] + " " + "  ".join(seats) if seats else self.labels[row]
+      self._rendered.fill(row, rendered)
+    return rendered
+
+  def publish(self, title:str, vacancies:int, changed_rows:dict) -> "AvailabilitySnapshot":
+    """
+    Next version of this snapshot, sharing every chunk of rows without a row in changed_rows, so publishing costs
+    in proportion to the rows changed rather than the size of the theatre.
+    :param changed_rows: Dictionary of row_idx: occupancy bytes of the row.
+    """
+    return AvailabilitySnapshot(
+      self.version + 1, title, self.rows, self.spr, vacancies, self.occupancy.replace(changed_rows),
+      self.row_free.replace({row: seats.count(0) for row, seats in changed_rows.items()}), self.labels, self.frame,
+      self._rendered.replace(dict.fromkeys(changed_rows))
+    )
@@ -1,4 +1,238 @@
+from array import array
+from bisect import bisect_left
+from itertools import accumulate
+import threading
+import time
+
+def pack_seats(selection) -> array:
+  """
+  Pack a selection of row_idx: [List of seat_idx] into a flat array of unsigned ints: row, number of seats, then the seats,
+  for each row in turn. E.g. {1: [2, 3], 2: [4]} -> array("I", [1, 2, 2, 3, 2, 1, 4]).
+  The selection may also be given as its (row_idx, [List of seat_idx]) pairs, as stored in snapshots.
+  """
+  packed = array("I")
+  for row_idx, seats in (selection.items() if isinstance(selection, dict) else selection):
+    packed.append(row_idx)
+    packed.append(len(seats))
+    packed.extend(seats)
+  return packed
+
+def unpack_seats(packed, start:int=0, end:int=None) -> dict:
+  """
+  Inverse of pack_seats, optionally for the packed seats of one booking within a larger array.
+  """
+  end = len(packed) if end is None else end
+  selection = {}
+  idx = start
+  while idx < end:
+    count = packed[idx + 1]
+    selection[packed[idx]] = packed[idx + 2:idx + 2 + count].tolist()
+    idx += 2 + count
+  return selection
+
+class BookingIndexes:
+  def __init__(self, clock=time.time):
+    """
+    Secondary indexes of a bookings store, updated by the store as bookings are created, changed, confirmed and removed.
+    Queries return booking IDs, in creation order for status and time queries.
+
+    Seats are indexed per row in arrays of booking numbers, e.g. 12 for GIC0012 and 0 for none, grown to the furthest seat indexed.
+    """
+    self.seat_owners = {}
+    self.seat_holders = {}
+    # Outside hold mode, unconfirmed bookings may share seats. (row_idx, seat_idx): {Booking numbers} of holders after the first.
+    self.shared_holders = {}
+    # Ordered sets of booking IDs by status, as dictionaries of booking_id: None.
+    self.confirmed = {}
+    self.unconfirmed = {}
+    # Creation times and booking numbers of current bookings, in order of booking ID. Removed bookings are dropped from both,
+    # so time queries only visit the bookings they return.
+    # Each time is clamped to the latest one before it, so they never decrease even if the wall clock steps back, and can be bisected.
+    self.created_times = array("d")
+    self.created_numbers = array("I")
+    self._latest_created = float("-inf")
+    self.clock = clock
+
+  def add(self, booking_id:str, selection:dict, confirmed:bool, created:float=None):
+    created = self._latest_created = max(self.clock() if created is None else created, self._latest_created)
+    self.created_times.append(created)
+    self.created_numbers.append(int(booking_id[3:]))
+    if confirmed:
+      self.confirmed[booking_id] = None
+      self._occupy(booking_id, selection)
+    else:
+      self.unconfirmed[booking_id] = None
+      self._hold(booking_id, selection)
+
+  def add_many(self, entries:list):
+    """
+    Index bookings in bulk, e.g. when restoring a snapshot, with the same result as calling add for each in turn.
+    :param entries: Bookings in order of booking ID, as [booking_id, count, confirmed, [(row_idx, [List of seat_idx]) pairs], created]
+      as stored in snapshots. Bookings without a creation time, i.e. created None or left out, are indexed as created now.
+    """
+    now = self.clock()
+    numbers = [int(entry[0][3:]) for entry in entries]
+    # Clamped as add does, starting from the latest time already indexed.
+    times = accumulate([now if len(entry) < 5 or entry[4] is None else entry[4] for entry in entries], max, initial=self._latest_created)
+    next(times)
+    self.created_times.extend(times)
+    self.created_numbers.extend(numbers)
+    if entries:
+      self._latest_created = self.created_times[-1]
+
+    self.confirmed.update(dict.fromkeys([entry[0] for entry in entries if entry[2]]))
+    for entry in entries:
+      if not entry[2]:
+        self.unconfirmed[entry[0]] = None
+        self._hold(entry[0], dict(entry[3]))
+
+    # Grow each row's array once, to the furthest seat confirmed in it, then fill in the owners.
+    furthest = {}
+    for entry in entries:
+      if entry[2]:
+        for row_idx, seats in entry[3]:
+          furthest[row_idx] = max(furthest.get(row_idx, -1), max(seats, default=-1))
+    for row_idx, seat_idx in furthest.items():
+      self._row(self.seat_owners, row_idx, [seat_idx])
+    seat_owners = self.seat_owners
+    for entry, number in zip(entries, numbers):
+      if entry[2]:
+        for row_idx, seats in entry[3]:
+          owners = seat_owners[row_idx]
+          for seat_idx in seats:
+            owners[seat_idx] = number
+
+  def dump(self) -> dict:
+    """
+    Creation times and seat owners as bytes in native byte order, e.g. to store in a snapshot and restore with load
+    instead of indexing every booking again. Seats held by unconfirmed bookings are left out, load holds them again.
+    :return: Dictionary of "created_times", "created_numbers" and "seat_owners" as row_idx: bytes.
+    """
+    return {
+      "created_times": self.created_times.tobytes(),
+      "created_numbers": self.created_numbers.tobytes(),
+      "seat_owners": {row_idx: owners.tobytes() for row_idx, owners in self.seat_owners.items()},
+    }
+
+  def load(self, data:dict, entries:list):
+    """
+    Restore indexes from dump, with the same result as add_many for the bookings they were dumped with.
+    :param entries: Bookings in order of booking ID, see add_many. Only their IDs, status and seats of unconfirmed bookings are read.
+    """
+    self.created_times.frombytes(data["created_times"])
+    self.created_numbers.frombytes(data["created_numbers"])
+    if self.created_times:
+      self._latest_created = max(self._latest_created, self.created_times[-1])
+    for row_idx, owners in data["seat_owners"].items():
+      self.seat_owners[row_idx] = array("I", owners)
+    self.confirmed.update(dict.fromkeys([entry[0] for entry in entries if entry[2]]))
+    for entry in entries:
+      if not entry[2]:
+        self.unconfirmed[entry[0]] = None
+        self._hold(entry[0], dict(entry[3]))
+
+  def change_seats(self, booking_id:str, old_selection:dict, selection:dict):
+    """
+    Move the seats held by an unconfirmed booking.
+    """
+    self._unhold(booking_id, old_selection)
+    self._hold(booking_id, selection)
+
+  def confirm(self, booking_id:str, selection:dict):
+    self._unhold(booking_id, selection)
+    del self.unconfirmed[booking_id]
+    self.confirmed[booking_id] = None
+    self._occupy(booking_id, selection)
+
+  def remove(self, booking_id:str, selection:dict, confirmed:bool):
+    number = int(booking_id[3:])
+    idx = bisect_left(self.created_numbers, number)
+    if idx < len(self.created_numbers) and self.created_numbers[idx] == number:
+      del self.created_numbers[idx]
+      del self.created_times[idx]
+    if confirmed:
+      del self.confirmed[booking_id]
+      for row_idx, seats in selection.items():
+        owners = self.seat_owners[row_idx]
+        for seat_idx in seats:
+          if owners[seat_idx] == number:
+            owners[seat_idx] = 0
+    else:
+      del self.unconfirmed[booking_id]
+      self._unhold(booking_id, selection)
+
+  def at_seat(self, row_idx:int, seat_idx:int) -> list[str]:
+    """
+    IDs of bookings with a seat: the confirmed booking occupying it if any, followed by unconfirmed bookings holding it.
+    """
+    numbers = []
+    for table in [self.seat_owners, self.seat_holders]:
+      row = table.get(row_idx)
+      if row is not None and seat_idx < len(row) and row[seat_idx]:
+        numbers.append(row[seat_idx])
+    numbers.extend(sorted(self.shared_holders.get((row_idx, seat_idx), ())))
+    return [f"GIC{number:04d}" for number in numbers]
+
+  def created_between(self, since:float, until:float=None) -> list[str]:
+    """
+    IDs of bookings created at or after since, and before until if given, found by binary search over creation times.
+    """
+    start = bisect_left(self.created_times, since)
+    end = len(self.created_times) if until is None else bisect_left(self.created_times, until, start)
+    return [f"GIC{number:04d}" for number in self.created_numbers[start:end]]
+
+  def creation_times(self) -> dict:
+    """
+    :return: Dictionary of booking_id: creation time of every current booking, e.g. to store in a snapshot.
+    """
+    return {f"GIC{number:04d}": created for number, created in zip(self.created_numbers, self.created_times)}
+
+  @staticmethod
+  def _row(table:dict, row_idx:int, seats:list[int]) -> array:
+    """
+    Array of a row in table, grown to fit seats.
+    """
+    row = table.get(row_idx)
+    if row is None:
+      row = table[row_idx] = array("I")
+    if seats and max(seats) >= len(row):
+      row.frombytes(bytes(row.itemsize * (max(seats) + 1 - len(row))))
+    return row
+
+  def _occupy(self, booking_id:str, selection:dict):
+    number = int(booking_id[3:])
+    for row_idx, seats in selection.items():
+      owners = self._row(self.seat_owners, row_idx, seats)
+      for seat_idx in seats:
+        owners[seat_idx] = number
+
+  def _hold(self, booking_id:str, selection:dict):
+    number = int(booking_id[3:])
+    for row_idx, seats in selection.items():
+      holders = self._row(self.seat_holders, row_idx, seats)
+      for seat_idx in seats:
+        if holders[seat_idx]:
+          self.shared_holders.setdefault((row_idx, seat_idx), set()).add(number)
+        else:
+          holders[seat_idx] = number
+
+  def _unhold(self, booking_id:str, selection:dict):
+    number = int(booking_id[3:])
+    for row_idx, seats in selection.items():
+      holders = self.seat_holders[row_idx]
+      for seat_idx in seats:
+        shared = self.shared_holders.get((row_idx, seat_idx))
+        if holders[seat_idx] == number:
+          # Promote another holder of a shared seat, if any.
+          holders[seat_idx] = shared.pop() if shared else 0
+        elif shared:
+          shared.discard(number)
+        if shared is not None and not shared:
+          del self.shared_holders[(row_idx, seat_idx)]
+
 class Booking:
+  __slots__ = ("id", "count", "packed_seats", "confirmed")
+
   def __init__(self, id, count, seats=None, confirmed=False):
     """
     seats are dictionaries with the following shape:
@@ -7,38 +241,354 @@ class Booking:
     }
 
     Row and seat are 0-indexed and refer to position in theatre matrix.
+    Seats are stored packed (see pack_seats) and unpacked into a new dictionary each time Booking.seats is read,
+    so changes must be made by assigning Booking.seats. Bookings in a store are changed through the store, e.g. Bookings.update_booking,
+    which keeps its indexes up to date.
     """
     self.id: str = id
     self.count: int = count
-    self.seats: dict = seats.copy() if seats else {}
+    self.packed_seats: array = pack_seats(seats) if seats else array("I")
     self.confirmed: bool = confirmed
 
+  @property
+  def seats(self) -> dict:
+    return unpack_seats(self.packed_seats)
+
+  @seats.setter
+  def seats(self, selection:dict):
+    self.packed_seats = pack_seats(selection)
+
 class Bookings:
-  def __init__(self, bookings=None):
+  def __init__(self, bookings=None, next_id=None):
     """
     bookings are dictionaries with the following shape:
     {
       booking_id: Booking object
     }
+
+    :param next_id: Number of the next booking ID to issue. Defaults to following on from bookings.
     """
     self.bookings: dict = bookings.copy() if bookings else {}
+    # IDs are drawn from a counter under a lock rather than from len(self.bookings), so concurrent callers
+    # cannot be handed the same ID and removing bookings does not cause IDs to be reused.
+    self.next_id: int = next_id if next_id is not None else len(self.bookings) + 1
+    self._lock = threading.Lock()
+    self.indexes = BookingIndexes()
+    # Bookings passed in are indexed as created now, in order of booking ID as creation times are.
+    # See restore for bookings with known creation times, e.g. from a snapshot.
+    self.indexes.add_many([
+      [booking.id, booking.count, booking.confirmed, booking.seats.items()]
+      for booking in sorted(self.bookings.values(), key=lambda booking: int(booking.id[3:]))
+    ])
+
+  @classmethod
+  def restore(cls, entries:list, next_id:int, indexes:dict=None) -> "Bookings":
+    """
+    Store holding bookings restored from a snapshot, packed and indexed straight from their snapshot entries.
+    :param entries: Bookings in order of booking ID, as stored in snapshots, see BookingIndexes.add_many.
+    :param indexes: Indexes stored with the bookings, see BookingIndexes.dump. Built from entries if None.
+    """
+    store = cls(next_id=next_id)
+    store.bookings = {entry[0]: Booking(entry[0], entry[1], entry[3], entry[2]) for entry in entries}
+    if indexes is None:
+      store.indexes.add_many(entries)
+    else:
+      store.indexes.load(indexes, entries)
+    return store
+
+  def __len__(self) -> int:
+    return len(self.bookings)
+
+  def values(self):
+    return self.bookings.values()
 
   def create_booking(self, tickets: int=0, selection: dict=None) -> Booking:
-    booking_id = f"GIC{(len(self.bookings.values()) + 1):04d}"
-    new_booking = Booking(booking_id, tickets, selection)
-    # If there are other avenues to create booking, should add validation to ensure uniqueness
-    self.bookings[booking_id] = new_booking
+    with self._lock:
+      booking_id = f"GIC{self.next_id:04d}"
+      self.next_id += 1
+      new_booking = Booking(booking_id, tickets, selection)
+      # If there are other avenues to create booking, should add validation to ensure uniqueness
+      self.bookings[booking_id] = new_booking
+      self.indexes.add(booking_id, selection or {}, False)
     return new_booking
-  
+
+  def create_bookings(self, entries: list[tuple[int, dict]], confirmed: bool=False) -> list[Booking]:
+    """
+    Create a booking for each (tickets, selection) entry, drawing consecutive IDs under a single lock acquisition.
+    """
+    created = []
+    with self._lock:
+      for tickets, selection in entries:
+        booking_id = f"GIC{self.next_id:04d}"
+        self.next_id += 1
+        new_booking = Booking(booking_id, tickets, selection, confirmed)
+        self.bookings[booking_id] = new_booking
+        self.indexes.add(booking_id, selection, confirmed)
+        created.append(new_booking)
+    return created
+
   def update_booking(self, booking_id, selection: dict) -> Booking:
     booking = self.get_booking(booking_id)
     if not booking:
       # Within the scope of assessment, update_booking is only called for unconfirmed bookings when changing seats,
       # as such, they would have been verified prior to calling this method.
       raise Exception("Booking not found!")
-    # Change seats dictionary reference
-    booking.seats = selection
+    with self._lock:
+      self.indexes.change_seats(booking_id, booking.seats, selection)
+      # Repack seats
+      booking.seats = selection
     return booking
-  
+
+  def confirm_booking(self, booking_id) -> Booking:
+    booking = self.get_booking(booking_id)
+    with self._lock:
+      booking.confirmed = True
+      self.indexes.confirm(booking_id, booking.seats)
+    return booking
+
+  def remove_booking(self, booking_id) -> Booking:
+    with self._lock:
+      booking = self.bookings.pop(booking_id, None)
+      if booking:
+        self.indexes.remove(booking_id, booking.seats, booking.confirmed)
+      return booking
+
   def get_booking(self, booking_id, fallback=None):
-    return self.bookings.get(booking_id, fallback)
\ No newline at end of file
+    return self.bookings.get(booking_id, fallback)
+
+  def bookings_at_seat(self, row_idx:int, seat_idx:int) -> list[Booking]:
+    """
+    The confirmed booking occupying a seat if any, followed by unconfirmed bookings holding it.
+    """
+    return [self.bookings[booking_id] for booking_id in self.indexes.at_seat(row_idx, seat_idx)]
+
+  def confirmed_bookings(self) -> list[Booking]:
+    return [self.bookings[booking_id] for booking_id in self.indexes.confirmed]
+
+  def unconfirmed_bookings(self) -> list[Booking]:
+    return [self.bookings[booking_id] for booking_id in self.indexes.unconfirmed]
+
+  def bookings_created_between(self, since:float, until:float=None) -> list[Booking]:
+    """
+    Bookings created at or after since and before until, as time.time() timestamps, in creation order.
+    """
+    return [self.bookings[booking_id] for booking_id in self.indexes.created_between(since, until)]
+
+# States of bookings in ColumnarBookings.status
+_REMOVED, _UNCONFIRMED, _CONFIRMED = 0, 1, 2
+
+class BookingRecord:
+  __slots__ = ("store", "slot")
+
+  def __init__(self, store, slot:int):
+    """
+    Read-only view of a booking in the columns of a ColumnarBookings store. Changes are made through the store, which keeps its indexes up to date.
+    """
+    self.store = store
+    self.slot = slot
+
+  @property
+  def id(self) -> str:
+    return f"GIC{self.slot + 1:04d}"
+
+  @property
+  def count(self) -> int:
+    return self.store.counts[self.slot]
+
+  @property
+  def confirmed(self) -> bool:
+    return self.store.status[self.slot] == _CONFIRMED
+
+  @property
+  def packed_seats(self) -> array:
+    return self.store.seat_data[self.store.seat_starts[self.slot]:self.store.seat_ends[self.slot]]
+
+  @property
+  def seats(self) -> dict:
+    return unpack_seats(self.store.seat_data, self.store.seat_starts[self.slot], self.store.seat_ends[self.slot])
+
+class ColumnarBookings:
+  def __init__(self, bookings=None, next_id=None):
+    """
+    Bookings store with one array per field instead of one object per booking, for seasons with hundreds of thousands of bookings.
+    Takes the same arguments and offers the same methods as Bookings, with get_booking returning BookingRecord views.
+
+    As booking IDs are issued in sequence, booking GIC0001 is kept in slot 0 of each column and so on. Removed bookings leave an empty slot.
+    Seats of every booking are packed (see pack_seats) into one shared array, with the start and end of each booking's seats.
+    Changing seats overwrites the old seats where the new ones fit, otherwise appends them, leaving the old ones unused.
+    Once more than half of the array is unused, it is compacted.
+    """
+    self.counts = array("I")
+    self.status = bytearray()
+    self.seat_starts = array("Q")
+    self.seat_ends = array("Q")
+    self.seat_data = array("I")
+    # Entries of seat_data no booking refers to any more, left behind by seat changes and removed bookings.
+    self._unused_seats = 0
+    self._size = 0
+    self._lock = threading.Lock()
+    self.indexes = BookingIndexes()
+    entries = []
+    for booking_id, booking in sorted((bookings or {}).items(), key=lambda item: self._slot(item[0])):
+      self._grow(self._slot(booking_id))
+      self._append_columns(booking.count, booking.packed_seats, booking.confirmed)
+      entries.append([booking_id, booking.count, booking.confirmed, booking.seats.items()])
+    # Bookings passed in are indexed as created now, see restore for bookings with known creation times.
+    self.indexes.add_many(entries)
+    self.next_id: int = next_id if next_id is not None else self._size + 1
+    self._grow(self.next_id - 1)
+
+  @classmethod
+  def restore(cls, entries:list, next_id:int, indexes:dict=None) -> "ColumnarBookings":
+    """
+    As Bookings.restore, appending each booking to the columns.
+    """
+    # Every slot up to next_id starts out empty, and slots of bookings removed before the snapshot stay that way.
+    store = cls(next_id=next_id)
+    seat_data = store.seat_data
+    for entry in entries:
+      slot = store._slot(entry[0])
+      store.status[slot] = _CONFIRMED if entry[2] else _UNCONFIRMED
+      store.counts[slot] = entry[1]
+      store.seat_starts[slot] = len(seat_data)
+      seat_data.extend(pack_seats(entry[3]))
+      store.seat_ends[slot] = len(seat_data)
+    store._size = len(entries)
+    if indexes is None:
+      store.indexes.add_many(entries)
+    else:
+      store.indexes.load(indexes, entries)
+    return store
+
+  def __len__(self) -> int:
+    return self._size
+
+  def values(self):
+    return [BookingRecord(self, slot) for slot, status in enumerate(self.status) if status != _REMOVED]
+
+  def create_booking(self, tickets: int=0, selection: dict=None) -> BookingRecord:
+    with self._lock:
+      slot = self.next_id - 1
+      self.next_id += 1
+      self._append(f"GIC{slot + 1:04d}", tickets, selection or {}, False)
+    return BookingRecord(self, slot)
+
+  def create_bookings(self, entries: list[tuple[int, dict]], confirmed: bool=False) -> list[BookingRecord]:
+    created = []
+    with self._lock:
+      for tickets, selection in entries:
+        created.append(BookingRecord(self, self.next_id - 1))
+        self._append(f"GIC{self.next_id:04d}", tickets, selection, confirmed)
+        self.next_id += 1
+    return created
+
+  def update_booking(self, booking_id, selection: dict) -> BookingRecord:
+    booking = self.get_booking(booking_id)
+    if not booking:
+      raise Exception("Booking not found!")
+    with self._lock:
+      self.indexes.change_seats(booking_id, booking.seats, selection)
+      self._set_seats(booking.slot, selection)
+    return booking
+
+  def confirm_booking(self, booking_id) -> BookingRecord:
+    booking = self.get_booking(booking_id)
+    with self._lock:
+      self.status[booking.slot] = _CONFIRMED
+      self.indexes.confirm(booking_id, booking.seats)
+    return booking
+
+  def remove_booking(self, booking_id) -> BookingRecord:
+    with self._lock:
+      booking = self.get_booking(booking_id)
+      if booking:
+        # Keep a copy, as the removed slot no longer reads as a booking.
+        booking = Booking(booking.id, booking.count, booking.seats, booking.confirmed)
+        slot = self._slot(booking_id)
+        self.status[slot] = _REMOVED
+        self._unused_seats += self.seat_ends[slot] - self.seat_starts[slot]
+        self.seat_starts[slot] = self.seat_ends[slot] = 0
+        self._size -= 1
+        self.indexes.remove(booking_id, booking.seats, booking.confirmed)
+      return booking
+
+  def get_booking(self, booking_id, fallback=None):
+    slot = self._slot(booking_id)
+    if 0 <= slot < len(self.status) and self.status[slot] != _REMOVED:
+      return BookingRecord(self, slot)
+    return fallback
+
+  def bookings_at_seat(self, row_idx:int, seat_idx:int) -> list[BookingRecord]:
+    return [self.get_booking(booking_id) for booking_id in self.indexes.at_seat(row_idx, seat_idx)]
+
+  def confirmed_bookings(self) -> list[BookingRecord]:
+    return [self.get_booking(booking_id) for booking_id in self.indexes.confirmed]
+
+  def unconfirmed_bookings(self) -> list[BookingRecord]:
+    return [self.get_booking(booking_id) for booking_id in self.indexes.unconfirmed]
+
+  def bookings_created_between(self, since:float, until:float=None) -> list[BookingRecord]:
+    return [self.get_booking(booking_id) for booking_id in self.indexes.created_between(since, until)]
+
+  @staticmethod
+  def _slot(booking_id) -> int:
+    """
+    :return: Slot of a booking ID, or -1 if it is not an ID this store could have issued.
+    """
+    if not isinstance(booking_id, str) or not booking_id.startswith("GIC") or not booking_id[3:].isdigit():
+      return -1
+    number = int(booking_id[3:])
+    return number - 1 if number > 0 and f"GIC{number:04d}" == booking_id else -1
+
+  def _grow(self, slots:int):
+    """
+    Pad columns with removed bookings up to a number of slots.
+    """
+    while len(self.status) < slots:
+      self.counts.append(0)
+      self.status.append(_REMOVED)
+      self.seat_starts.append(0)
+      self.seat_ends.append(0)
+
+  def _append(self, booking_id:str, count:int, selection:dict, confirmed:bool):
+    self.indexes.add(booking_id, selection, confirmed)
+    self._append_columns(count, pack_seats(selection), confirmed)
+
+  def _append_columns(self, count:int, packed:array, confirmed:bool):
+    self.counts.append(count)
+    self.status.append(_CONFIRMED if confirmed else _UNCONFIRMED)
+    self.seat_starts.append(len(self.seat_data))
+    self.seat_data.extend(packed)
+    self.seat_ends.append(len(self.seat_data))
+    self._size += 1
+
+  def _set_seats(self, slot:int, selection:dict):
+    packed = pack_seats(selection)
+    start, end = self.seat_starts[slot], self.seat_ends[slot]
+    if len(packed) <= end - start:
+      self.seat_data[start:start + len(packed)] = packed
+      self.seat_ends[slot] = start + len(packed)
+      self._unused_seats += end - start - len(packed)
+    else:
+      self.seat_starts[slot] = len(self.seat_data)
+      self.seat_data.extend(packed)
+      self.seat_ends[slot] = len(self.seat_data)
+      self._unused_seats += end - start
+    if self._unused_seats * 2 > len(self.seat_data):
+      self._compact()
+
+  def _compact(self):
+    """
+    Rebuild seat_data with only the seats of current bookings, in slot order.
+    """
+    seat_data = array("I")
+    for slot, status in enumerate(self.status):
+      start, end = self.seat_starts[slot], self.seat_ends[slot]
+      self.seat_starts[slot] = len(seat_data)
+      if status != _REMOVED:
+        seat_data.extend(self.seat_data[start:end])
+      self.seat_ends[slot] = len(seat_data)
+    self.seat_data = seat_data
+    self._unused_seats = 0
+
+BOOKING_STORES = {"objects": Bookings, "columnar": ColumnarBookings}
@@ -0,0 +1,37 @@
+import csv
+import json
+
+def read_ticket_counts(lines):
+  """
+  Parse party sizes for Screening.create_bookings from a CSV or JSONL stream, lazily so large files are never fully loaded.
+
+  CSV lines use the first column as the ticket count, and a non-numeric first line is treated as a header.
+  JSONL lines are objects with a "tickets" field. Blank lines are skipped.
+  :param lines: Iterable of lines, e.g. an open file.
+  :return: Generator of ticket counts.
+  """
+  for line_number, line in enumerate(lines, 1):
+    line = line.strip()
+    if not line:
+      continue
+    if line.startswith("{"):
+      tickets = json.loads(line).get("tickets")
+    else:
+      tickets = next(csv.reader([line]))[0].strip()
+      if not tickets.isnumeric():
+        if line_number == 1:
+          # Header row
+          continue
+        raise Exception(f"Line {line_number}: \"{tickets}\" is not a valid number of tickets!")
+      tickets = int(tickets)
+    if not isinstance(tickets, int) or tickets < 1:
+      raise Exception(f"Line {line_number}: \"{tickets}\" is not a valid number of tickets!")
+    yield tickets
+
+def write_booking_results(screening, results, output):
+  """
+  Stream results of Screening.create_bookings as JSON lines of booking ID and seat labels.
+  Parties which could not be seated are written with an empty booking_id.
+  """
+  for booking_id, selection in results:
+    output.write(json.dumps({"booking_id": booking_id, "seats": screening.seat_labels(selection)}) + "\n")
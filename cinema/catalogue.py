@@ -0,0 +1,102 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+import threading
+
+from cinema.screening import Screening
+
+# Screening methods which may be routed through the catalogue, and whether they can change availability.
+ROUTED_OPERATIONS = {
+  "create_booking": False,
+  "change_seats": False,
+  "check_booking": False,
+  "confirm_booking": True,
+  "get_theatre": False,
+}
+
+class Catalogue:
+  def __init__(self, shards:int=4):
+    """
+    Registry of screenings keyed by (title, showtime, hall).
+
+    Each screening is owned by one shard, a single-threaded executor, so operations on a screening run in submission order
+    while independent screenings are processed in parallel by other shards.
+    Availability per screening is cached when a screening is added and refreshed only after operations that can change it,
+    so listing availability across the catalogue does not touch any screening.
+    """
+    self.screenings: dict = {}
+    self._shards = [ThreadPoolExecutor(1, thread_name_prefix=f"catalogue-shard-{i}") for i in range(shards)]
+    self._shard_of: dict = {}
+    # Cached aggregates. Shape: {key: vacancies}, plus running totals across the catalogue and per title.
+    self._vacancies: dict = {}
+    self.total_vacancies = 0
+    self.title_vacancies: dict = {}
+    self._cache_lock = threading.Lock()
+
+  def add_screening(self, title:str, showtime:str, hall:str, rows:int, spr:int, **kwargs) -> tuple:
+    key = (title, showtime, hall)
+    if key in self.screenings:
+      raise Exception(f"Screening {key} already exists!")
+    screening = Screening(title, rows, spr, **kwargs)
+    self.screenings[key] = screening
+    # Spread screenings across shards round-robin so busy halls are not grouped by hash collisions.
+    self._shard_of[key] = self._shards[len(self.screenings) % len(self._shards)]
+    self._refresh_availability(key)
+    return key
+
+  def get_screening(self, key:tuple) -> Screening:
+    screening = self.screenings.get(key)
+    if not screening:
+      raise Exception(f"Screening {key} not found!")
+    return screening
+
+  def submit(self, key:tuple, operation:str, *args) -> Future:
+    """
+    Route an operation to the shard owning the screening.
+    :param operation: Name of a Screening method listed in ROUTED_OPERATIONS.
+    :return: Future resolving to the method's return value.
+    """
+    if operation not in ROUTED_OPERATIONS:
+      raise Exception(f"Operation {operation} cannot be routed!")
+    screening = self.get_screening(key)
+    return self._shard_of[key].submit(self._apply, key, screening, operation, args)
+
+  def run_batch(self, operations:list[tuple]) -> list:
+    """
+    Apply a list of (key, operation, *args) tuples. Operations on the same screening run in list order,
+    different screenings run in parallel. Results are returned in list order; failed operations return their exception.
+    """
+    futures = [self.submit(key, operation, *args) for key, operation, *args in operations]
+    results = []
+    for future in futures:
+      error = future.exception()
+      results.append(error if error else future.result())
+    return results
+
+  def get_availability(self, title:str=None) -> list[str]:
+    """
+    List availability of every screening, or of one title, from the cached aggregates.
+    """
+    with self._cache_lock:
+      vacancies = list(self._vacancies.items())
+    return [
+      f"{key[0]} {key[1]} {key[2]} ({count} {'seat' if count == 1 else 'seats'} available)"
+      for key, count in vacancies if title is None or key[0] == title
+    ]
+
+  def shutdown(self):
+    for shard in self._shards:
+      shard.shutdown()
+
+  def _apply(self, key:tuple, screening:Screening, operation:str, args:tuple):
+    try:
+      return getattr(screening, operation)(*args)
+    finally:
+      if ROUTED_OPERATIONS[operation]:
+        self._refresh_availability(key)
+
+  def _refresh_availability(self, key:tuple):
+    vacancies = self.screenings[key].get_vacancy()
+    with self._cache_lock:
+      change = vacancies - self._vacancies.get(key, 0)
+      self._vacancies[key] = vacancies
+      self.total_vacancies += change
+      self.title_vacancies[key[0]] = self.title_vacancies.get(key[0], 0) + change
@@ -0,0 +1,101 @@
+import re
+
+# Seat strings are a row label followed by a 1-index seat number, e.g. "B03" or "aa12".
+SEAT_PATTERN = re.compile(r"([A-Za-z]+)(\d+)")
+
+class SeatCodec:
+  def __init__(self, rows:int, spr:int):
+    """
+    Conversions between 0-index row/seat coordinates and their labels, using tables built once per screening.
+
+    Rows are labelled A to Z, then AA to ZZ, AAA to ZZZ and so on, repeating the letter once per 26 rows, which keeps the label
+    width at rows // 26 + 1 as assumed when rendering. Seat numbers are 1-index and padded to 2 digits, e.g. "03".
+    """
+    self.rows = rows
+    self.spr = spr
+    self.row_labels = [self.encode_row(row) for row in range(rows)]
+    self.row_indices = {label: row for row, label in enumerate(self.row_labels)}
+    self.seat_numbers = [f"{seat + 1:02d}" for seat in range(spr)]
+
+  @staticmethod
+  def encode_row(row:int) -> str:
+    return chr(row % 26 + 65) * (row // 26 + 1)
+
+  @staticmethod
+  def decode_row(alpha_row:str) -> int:
+    """
+    :return: 0-index of the row, or -1 if alpha_row is not a row label.
+    """
+    alpha_row = alpha_row.upper()
+    if not alpha_row.isalpha() or not alpha_row.isascii() or alpha_row.count(alpha_row[0]) != len(alpha_row):
+      return -1
+    return (len(alpha_row) - 1) * 26 + ord(alpha_row[0]) - 65
+
+  def row_label(self, row:int) -> str:
+    if 0 <= row < self.rows:
+      return self.row_labels[row]
+    return self.encode_row(row)
+
+  def row_index(self, alpha_row:str) -> int:
+    """
+    :return: 0-index of the row, or -1 if alpha_row is not a row label. Labels beyond the theatre still decode to their row.
+    """
+    row = self.row_indices.get(alpha_row)
+    if row is None:
+      row = self.row_indices.get(alpha_row.upper())
+    if row is None:
+      row = self.decode_row(alpha_row) if alpha_row else -1
+    return row
+
+  def seat_number(self, seat:int) -> str:
+    if 0 <= seat < self.spr:
+      return self.seat_numbers[seat]
+    return f"{seat + 1:02d}"
+
+  def seat_label(self, row:int, seat:int) -> str:
+    return self.row_label(row) + self.seat_number(seat)
+
+  def split_seat(self, seat:str) -> tuple[str, str]:
+    """
+    Split a seat string into its row label and seat number, e.g. "B03" -> ("B", "03").
+    :return: Tuple of empty strings if seat is not a row label followed by a number.
+    """
+    match = SEAT_PATTERN.fullmatch(seat.strip())
+    return match.groups() if match else ("", "")
+
+  def parse_seat(self, seat:str) -> tuple[int, int]:
+    """
+    :return: (row, seat) 0-index coordinates of a seat string, or None if it is malformed or outside the theatre.
+    """
+    alpha_row, seat_num = self.split_seat(seat)
+    if not alpha_row:
+      return None
+    row, seat = self.row_index(alpha_row), int(seat_num) - 1
+    if not (0 <= row < self.rows and 0 <= seat < self.spr):
+      return None
+    return row, seat
+
+  def selection_to_labels(self, selection:dict) -> list[str]:
+    """
+    List seats in a selection as labels, e.g. {1: [2, 3]} -> ["B03", "B04"], ordered by row then seat.
+    """
+    labels = []
+    for row, seats in sorted(selection.items()):
+      alpha_row = self.row_label(row)
+      labels.extend([alpha_row + self.seat_numbers[seat] for seat in seats])
+    return labels
+
+  def labels_to_selection(self, labels) -> dict:
+    """
+    Inverse of selection_to_labels, for seats given as labels e.g. by ticket scanners or API clients.
+    :return: Dictionary of row_idx: [Sorted list of seat_idx]
+    """
+    selection = {}
+    for label in labels:
+      coord = self.parse_seat(label)
+      if coord is None:
+        raise Exception(f"\"{label}\" is not a valid seat number!")
+      selection.setdefault(coord[0], []).append(coord[1])
+    for seats in selection.values():
+      seats.sort()
+    return selection
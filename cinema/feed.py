@@ -0,0 +1,168 @@
+from collections import deque
+import threading
+
+# Seat states in deltas and snapshots: free, held by an unconfirmed booking in hold mode, and occupied by a confirmed booking.
+FREE, HELD, OCCUPIED = ".", "h", "#"
+
+def seat_ranges(seats) -> list[tuple[int, int]]:
+  """
+  Group seat indexes into runs of consecutive seats, e.g. [1, 2, 3, 7] -> [(1, 4), (7, 8)], with ends exclusive.
+  """
+  ranges = []
+  for seat in sorted(seats):
+    if ranges and ranges[-1][1] == seat:
+      ranges[-1][1] = seat + 1
+    else:
+      ranges.append([seat, seat + 1])
+  return [tuple(seat_range) for seat_range in ranges]
+
+def encode_changes(states:dict) -> list[list]:
+  """
+  Encode new seat states as [row, start, stop, state] entries, one per run of consecutive seats in the same state.
+  :param states: Dictionary of row_idx: {seat_idx: state}
+  """
+  changes = []
+  for row_idx in sorted(states):
+    row_states = states[row_idx]
+    by_state = {}
+    for seat, state in row_states.items():
+      by_state.setdefault(state, []).append(seat)
+    runs = [(start, stop, state) for state, seats in by_state.items() for start, stop in seat_ranges(seats)]
+    changes.extend([row_idx, start, stop, state] for start, stop, state in sorted(runs))
+  return changes
+
+def decode_changes(changes:list[list], states:dict=None) -> dict:
+  """
+  Inverse of encode_changes, applying the changes over states if given, so later deltas override earlier ones.
+  """
+  states = {} if states is None else states
+  for row_idx, start, stop, state in changes:
+    row_states = states.setdefault(row_idx, {})
+    for seat in range(start, stop):
+      row_states[seat] = state
+  return states
+
+class Subscription:
+  def __init__(self, feed:"OccupancyFeed", limit:int):
+    """
+    Messages published to one subscriber and not yet received, in order.
+
+    Messages are {"seq", "since", "changes"} deltas, where since is the sequence number of the state the changes apply to,
+    or {"seq", "snapshot"} with the state of every seat as one string per row. Once more than limit messages are waiting,
+    they are coalesced into a single message with the latest state of each seat they change, so a slow subscriber holds
+    at most one message per seat however far behind it falls.
+    """
+    self.feed = feed
+    self.limit = limit
+    self.pending = deque()
+    self.coalesced = 0
+    self._ready = threading.Condition()
+
+  def _push(self, message:dict):
+    with self._ready:
+      self.pending.append(message)
+      if len(self.pending) > self.limit:
+        self._coalesce()
+      self._ready.notify_all()
+
+  def _coalesce(self):
+    messages = list(self.pending)
+    self.pending.clear()
+    if "snapshot" in messages[0]:
+      # Apply the deltas onto the snapshot, so the subscriber still receives a full state.
+      rows = [list(row) for row in messages[0]["snapshot"]]
+      for message in messages[1:]:
+        for row_idx, start, stop, state in message["changes"]:
+          rows[row_idx][start:stop] = state * (stop - start)
+      merged = {"seq": messages[-1]["seq"], "snapshot": ["".join(row) for row in rows]}
+    else:
+      states = {}
+      for message in messages:
+        decode_changes(message["changes"], states)
+      merged = {"seq": messages[-1]["seq"], "since": messages[0]["since"], "changes": encode_changes(states)}
+    self.pending.append(merged)
+    self.coalesced += len(messages) - 1
+
+  def poll(self, timeout:float=None) -> list[dict]:
+    """
+    Receive all waiting messages, waiting up to timeout seconds for one if none are waiting. A timeout of None waits indefinitely.
+    :return: List of messages, empty if none arrived in time.
+    """
+    with self._ready:
+      if not self.pending and timeout != 0:
+        self._ready.wait_for(lambda: self.pending, timeout)
+      messages = list(self.pending)
+      self.pending.clear()
+      return messages
+
+  def close(self):
+    self.feed.unsubscribe(self)
+
+class OccupancyFeed:
+  def __init__(self, snapshot, history:int=1024):
+    """
+    Sequence-numbered deltas of seat states, published by Screening.apply_event and fanned out to subscribers in-process.
+    The last history deltas are kept, so subscribers can resume from a recent sequence number without a full snapshot.
+    :param snapshot: Function returning the current state of every seat as one string per row, see Screening._seat_states.
+    """
+    self.snapshot = snapshot
+    self.seq = 0
+    # [seq, states, message] per delta, the message being encoded when first sent to a subscriber or read through since.
+    # Without subscribers, publishing only records the states.
+    self.history = deque(maxlen=history)
+    self.subscribers = []
+
+  def publish(self, states:dict):
+    """
+    :param states: Dictionary of row_idx: {seat_idx: new state}, for seats changed by one event.
+    """
+    if not states:
+      return
+    self.seq += 1
+    delta = [self.seq, states, None]
+    self.history.append(delta)
+    subscribers = self.subscribers
+    if subscribers:
+      message = self._message(delta)
+      for subscription in subscribers:
+        subscription._push(message)
+
+  @staticmethod
+  def _message(delta:list) -> dict:
+    """
+    Encode a delta in history as a message, once. Readers racing to encode the same delta build equal messages.
+    """
+    if delta[2] is None:
+      delta[2] = {"seq": delta[0], "since": delta[0] - 1, "changes": encode_changes(delta[1])}
+    return delta[2]
+
+  def since(self, seq:int) -> list[dict]:
+    """
+    :return: Deltas published after seq, or None if some of them are no longer kept, or seq was never published, e.g. it was
+      seen before a restart, so a snapshot is needed.
+    """
+    if seq == self.seq:
+      return []
+    if not 0 <= seq < self.seq or self.history[0][0] > seq + 1:
+      return None
+    return [self._message(delta) for delta in self.history if delta[0] > seq]
+
+  def current(self) -> dict:
+    return {"seq": self.seq, "snapshot": self.snapshot()}
+
+  def subscribe(self, since:int=None, limit:int=256) -> Subscription:
+    """
+    Subscribe to deltas published from now on, first receiving the deltas after since, or a snapshot if since is None or
+    too old to resume from.
+    :param limit: Messages kept waiting for the subscriber before they are coalesced, see Subscription.
+    """
+    subscription = Subscription(self, limit)
+    missed = self.since(since) if since is not None else None
+    for message in missed if missed is not None else [self.current()]:
+      subscription._push(message)
+    # Replaced rather than modified, so subscribers can leave from any thread while a publish iterates the list.
+    self.subscribers = self.subscribers + [subscription]
+    return subscription
+
+  def unsubscribe(self, subscription:Subscription):
+    self.subscribers = [subscriber for subscriber in self.subscribers if subscriber is not subscription]
@@ -0,0 +1,250 @@
+from collections import Counter
+import contextlib
+import cProfile
+import functools
+import io
+import json
+import pstats
+import sys
+import threading
+import time
+
+# Upper bounds in seconds of histogram buckets for timings, from 1 microsecond to 10 seconds.
+BUCKETS = tuple(float(f"{step}e{exponent}") for exponent in range(-6, 1) for step in (1, 2.5, 5)) + (10.0,)
+
+class Histogram:
+  def __init__(self):
+    self.counts = [0] * len(BUCKETS)
+    self.count = 0
+    self.sum = 0.0
+
+  def observe(self, value:float):
+    self.count += 1
+    self.sum += value
+    for idx, bound in enumerate(BUCKETS):
+      if value <= bound:
+        self.counts[idx] += 1
+        break
+
+class SamplingProfiler:
+  def __init__(self, thread_id:int, interval:float=0.001):
+    """
+    Samples the stack of a thread at a fixed interval from a background thread, counting collapsed stacks
+    ("outer;inner;innermost"). Unlike cProfile, the profiled code runs at full speed between samples.
+    """
+    self.thread_id = thread_id
+    self.interval = interval
+    self.samples = Counter()
+    self._stop = threading.Event()
+    self._thread = threading.Thread(target=self._sample, daemon=True)
+
+  def start(self):
+    self._thread.start()
+
+  def stop(self):
+    self._stop.set()
+    self._thread.join()
+
+  def _sample(self):
+    while not self._stop.wait(self.interval):
+      frame = sys._current_frames().get(self.thread_id)
+      stack = []
+      while frame is not None:
+        stack.append(f"{frame.f_code.co_name} ({frame.f_code.co_filename}:{frame.f_lineno})")
+        frame = frame.f_back
+      if stack:
+        self.samples[";".join(reversed(stack))] += 1
+
+class Metrics:
+  def __init__(self):
+    """
+    Registry of opt-in counters, timing histograms and stage profiles.
+
+    While disabled, instrumented code only checks Metrics.enabled, so leaving instrumentation in hot paths costs an attribute lookup.
+    Metrics are keyed by name and labels, e.g. ("screening_operation_seconds", (("operation", "create_booking"),)).
+    """
+    self.enabled = False
+    self.counters = {}
+    self.histograms = {}
+    # Stage name: "cprofile" or "sample", for Program stages to profile, and accumulated results per stage.
+    self.profiled_stages = {}
+    self.profiles = {}
+    self._profiling = False
+    self._lock = threading.Lock()
+
+  def enable(self):
+    self.enabled = True
+
+  def disable(self):
+    self.enabled = False
+
+  def reset(self):
+    with self._lock:
+      self.counters.clear()
+      self.histograms.clear()
+      self.profiles.clear()
+
+  @contextlib.contextmanager
+  def isolated(self):
+    """
+    Record into an empty, enabled registry within the block, e.g. to read the counters of one run, then restore the metrics
+    recorded before it and whether they were enabled, discarding everything recorded within the block.
+    """
+    with self._lock:
+      saved = self.enabled, dict(self.counters), dict(self.histograms), dict(self.profiles)
+    self.reset()
+    self.enable()
+    try:
+      yield self
+    finally:
+      with self._lock:
+        self.enabled = saved[0]
+        for current, previous in zip([self.counters, self.histograms, self.profiles], saved[1:]):
+          current.clear()
+          current.update(previous)
+
+  def count(self, name:str, value:int=1, **labels):
+    key = (name, tuple(sorted(labels.items())))
+    with self._lock:
+      self.counters[key] = self.counters.get(key, 0) + value
+
+  def observe(self, name:str, seconds:float, **labels):
+    key = (name, tuple(sorted(labels.items())))
+    with self._lock:
+      if key not in self.histograms:
+        self.histograms[key] = Histogram()
+      self.histograms[key].observe(seconds)
+
+  def timed(self, operation:str, name:str="screening_operation_seconds"):
+    """
+    Decorator recording the duration of each call in a histogram labelled with the operation, while metrics are enabled.
+    """
+    def decorator(function):
+      @functools.wraps(function)
+      def wrapper(*args, **kwargs):
+        if not self.enabled:
+          return function(*args, **kwargs)
+        start = time.perf_counter()
+        try:
+          return function(*args, **kwargs)
+        finally:
+          self.observe(name, time.perf_counter() - start, operation=operation)
+      return wrapper
+    return decorator
+
+  def profile_stage(self, stage:str, mode:str="cprofile"):
+    """
+    Profile every run of a Program stage, e.g. "l_select_seats", with cProfile or the sampling profiler.
+    Only one stage is profiled at a time, so stages nested inside a profiled stage are included in its profile.
+    """
+    if mode not in ["cprofile", "sample"]:
+      raise Exception(f"Unknown profiling mode {mode}!")
+    self.profiled_stages[stage] = mode
+
+  def stop_profiling_stage(self, stage:str):
+    self.profiled_stages.pop(stage, None)
+
+  def run_stage(self, stage:str, method, *args, **kwargs):
+    """
+    Call a Program stage, recording its latency and profiling it if requested.
+    """
+    mode = self.profiled_stages.get(stage)
+    if not mode or self._profiling:
+      start = time.perf_counter()
+      try:
+        return method(*args, **kwargs)
+      finally:
+        self.observe("program_stage_seconds", time.perf_counter() - start, stage=stage)
+
+    self._profiling = True
+    profiler = cProfile.Profile() if mode == "cprofile" else SamplingProfiler(threading.get_ident())
+    start = time.perf_counter()
+    if mode == "cprofile":
+      profiler.enable()
+    else:
+      profiler.start()
+    try:
+      return method(*args, **kwargs)
+    finally:
+      if mode == "cprofile":
+        profiler.disable()
+      else:
+        profiler.stop()
+      self.observe("program_stage_seconds", time.perf_counter() - start, stage=stage)
+      self._profiling = False
+      self._add_profile(stage, profiler)
+
+  def profile_report(self, stage:str, limit:int=20) -> str:
+    """
+    Text report of a profiled stage: cumulative pstats for cProfile, or the most frequent stacks for sampling.
+    """
+    profile = self.profiles.get(stage)
+    if profile is None:
+      return ""
+    if isinstance(profile, Counter):
+      total = sum(profile.values())
+      return "\n".join(f"{count / total:6.1%} {stack}" for stack, count in profile.most_common(limit))
+    output = io.StringIO()
+    profile.stream = output
+    profile.sort_stats("cumulative").print_stats(limit)
+    return output.getvalue()
+
+  def _add_profile(self, stage:str, profiler):
+    with self._lock:
+      if isinstance(profiler, SamplingProfiler):
+        self.profiles[stage] = self.profiles.get(stage, Counter()) + profiler.samples
+      elif stage in self.profiles:
+        self.profiles[stage].add(profiler)
+      else:
+        self.profiles[stage] = pstats.Stats(profiler)
+
+  def snapshot(self) -> dict:
+    """
+    JSON-serializable copy of all counters and histograms.
+    """
+    with self._lock:
+      return {
+        "counters": [
+          {"name": name, "labels": dict(labels), "value": value} for (name, labels), value in self.counters.items()
+        ],
+        "histograms": [
+          {"name": name, "labels": dict(labels), "buckets": {f"{bound:g}": count for bound, count in zip(BUCKETS, histogram.counts)},
+           "count": histogram.count, "sum": histogram.sum}
+          for (name, labels), histogram in self.histograms.items()
+        ],
+      }
+
+  def to_json(self) -> str:
+    return json.dumps(self.snapshot())
+
+  def to_prometheus(self) -> str:
+    """
+    Prometheus text exposition format, with histogram buckets as cumulative counts.
+    """
+    def format_labels(labels, extra=()):
+      pairs = [f'{key}="{value}"' for key, value in list(labels) + list(extra)]
+      return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    lines = []
+    with self._lock:
+      typed = set()
+      for (name, labels), value in sorted(self.counters.items()):
+        if name not in typed:
+          lines.append(f"# TYPE {name} counter")
+          typed.add(name)
+        lines.append(f"{name}{format_labels(labels)} {value}")
+      for (name, labels), histogram in sorted(self.histograms.items()):
+        if name not in typed:
+          lines.append(f"# TYPE {name} histogram")
+          typed.add(name)
+        cumulative = 0
+        for bound, count in zip(BUCKETS, histogram.counts):
+          cumulative += count
+          lines.append(f"{name}_bucket{format_labels(labels, [('le', format(bound, 'g'))])} {cumulative}")
+        lines.append(f"{name}_bucket{format_labels(labels, [('le', '+Inf')])} {histogram.count}")
+        lines.append(f"{name}_sum{format_labels(labels)} {histogram.sum}")
+        lines.append(f"{name}_count{format_labels(labels)} {histogram.count}")
+    return "\n".join(lines) + "\n"
+
+# Shared registry used by Screening and Program.
+metrics = Metrics()
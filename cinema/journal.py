@@ -0,0 +1,256 @@
+import base64
+import gc
+import json
+import os
+import threading
+import time
+import zlib
+
+from cinema.screening import Screening
+
+JOURNAL_FILE = "journal.log"
+SNAPSHOT_FILE = "snapshot.json"
+
+class Journal:
+  def __init__(self, directory:str, sequence:int=0, group_size:int=256, group_delay:float=0.05, snapshot_every:int=None):
+    """
+    Append-only journal of booking events for a single screening, stored as one JSON line per event in directory.
+
+    Recording an event only buffers it. A writer thread writes buffered events in groups sharing a single fsync, either once
+    group_size events are buffered or group_delay seconds after the first buffered event, so no booking waits on the disk.
+    Callers needing events to be durable before answering, e.g. service.server, call flush().
+    Every snapshot_every events, the writer thread writes a compact snapshot of the screening and truncates the journal,
+    so a restart only replays events recorded since the last snapshot.
+    :param sequence: Sequence number of the last event already recorded, when reopening an existing journal.
+    """
+    self.directory = directory
+    self.sequence = sequence
+    self.group_size = group_size
+    self.group_delay = group_delay
+    self.snapshot_every = snapshot_every
+    self.screening = None
+
+    os.makedirs(directory, exist_ok=True)
+    self._file = open(os.path.join(directory, JOURNAL_FILE), "ab")
+    self._buffer = []
+    self._buffered_since = 0
+    self._since_snapshot = 0
+    self._snapshot_due = False
+    self._closing = False
+    # Guards the buffer only, and is taken by record under the screening lock, so nothing else is done while holding it.
+    self._lock = threading.Lock()
+    self._pending = threading.Condition(self._lock)
+    # Held while writing to the journal file, so groups are written in order. Taken before the screening lock, never after.
+    self._write_lock = threading.Lock()
+    self._writer = threading.Thread(target=self._write_groups, daemon=True)
+    self._writer.start()
+
+  def attach(self, screening:Screening):
+    """
+    Record every event applied to the screening from hereon.
+    """
+    self.screening = screening
+    screening.journal = self
+
+  def record(self, event:dict):
+    """
+    Called by Screening.apply_event while holding the screening lock, so events are numbered in the order they were applied.
+    """
+    with self._lock:
+      self.sequence += 1
+      line = json.dumps(encode_event(event, self.sequence), separators=(",", ":"))
+      if not self._buffer:
+        self._buffered_since = time.monotonic()
+        self._pending.notify()
+      self._buffer.append(line)
+      self._since_snapshot += 1
+      if len(self._buffer) == self.group_size:
+        self._pending.notify()
+      if self.snapshot_every and self._since_snapshot >= self.snapshot_every and not self._snapshot_due:
+        self._snapshot_due = True
+        self._pending.notify()
+
+  def flush(self):
+    """
+    Write buffered events and fsync them to disk.
+    """
+    with self._write_lock:
+      with self._lock:
+        lines = self._buffer
+        self._buffer = []
+      if lines and not self._file.closed:
+        self._file.write(("\n".join(lines) + "\n").encode())
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+  def _write_groups(self):
+    while True:
+      with self._lock:
+        self._pending.wait_for(lambda: self._buffer or self._snapshot_due or self._closing)
+        if self._closing:
+          return
+        snapshot_due = self._snapshot_due
+        if not snapshot_due and len(self._buffer) < self.group_size:
+          remaining = self._buffered_since + self.group_delay - time.monotonic()
+          if remaining > 0:
+            self._pending.wait(remaining)
+            continue
+      if snapshot_due:
+        self.write_snapshot()
+      else:
+        self.flush()
+
+  def write_snapshot(self):
+    """
+    Atomically replace the snapshot with the screening's current state, then truncate the journal it covers.
+    """
+    with self._write_lock:
+      # The screening lock is taken before the buffer lock, in the same order as Screening.apply_event calling record.
+      with self.screening._lock:
+        snapshot = dump_snapshot(self.screening, self.sequence)
+        with self._lock:
+          # Events buffered so far are covered by the snapshot, so they need not be written to the journal.
+          self._buffer = []
+          self._since_snapshot = 0
+          self._snapshot_due = False
+      snapshot_path = os.path.join(self.directory, SNAPSHOT_FILE)
+      with open(snapshot_path + ".tmp", "w") as snapshot_file:
+        json.dump(snapshot, snapshot_file, separators=(",", ":"))
+        snapshot_file.flush()
+        os.fsync(snapshot_file.fileno())
+      os.replace(snapshot_path + ".tmp", snapshot_path)
+      # Events are skipped on replay if the snapshot already covers their sequence number, so a crash before truncating is harmless.
+      # Events recorded after the snapshot are still buffered, as writing them needs the lock held here.
+      self._file.truncate(0)
+      os.fsync(self._file.fileno())
+
+  def close(self):
+    with self._lock:
+      self._closing = True
+      self._pending.notify()
+    self._writer.join()
+    self.flush()
+    self._file.close()
+
+def encode_event(event:dict, sequence:int) -> dict:
+  entry = dict(event, seq=sequence)
+  # JSON objects only have string keys, so seats are stored as [row_idx, [List of seat_idx]] pairs.
+  if "seats" in entry:
+    entry["seats"] = list(entry["seats"].items())
+  if "bookings" in entry:
+    entry["bookings"] = [[tickets, list(seats.items())] for tickets, seats in entry["bookings"]]
+  return entry
+
+def decode_event(entry:dict) -> dict:
+  if "seats" in entry:
+    entry["seats"] = dict(entry["seats"])
+  if "bookings" in entry:
+    entry["bookings"] = [(tickets, dict(seats)) for tickets, seats in entry["bookings"]]
+  return entry
+
+def encode_bytes(data:bytes) -> str:
+  return base64.b64encode(zlib.compress(data)).decode()
+
+def decode_bytes(data:str) -> bytes:
+  return zlib.decompress(base64.b64decode(data))
+
+def dump_snapshot(screening:Screening, sequence:int) -> dict:
+  with screening._lock:
+    indexes = screening.bookings.indexes.dump()
+    return {
+      "seq": sequence,
+      "title": screening.title,
+      "rows": screening.rows,
+      "spr": screening.spr,
+      # One byte per seat compresses well, as occupancy is mostly long runs of the same state.
+      "theatre": encode_bytes(screening.theatre.dump()),
+      "next_id": screening.bookings.next_id,
+      "bookings": [
+        [booking.id, booking.count, booking.confirmed, list(booking.seats.items())] for booking in screening.bookings.values()
+      ],
+      # Stored so restoring does not index every booking again.
+      "indexes": {
+        "created_times": encode_bytes(indexes["created_times"]),
+        "created_numbers": encode_bytes(indexes["created_numbers"]),
+        "seat_owners": [[row_idx, encode_bytes(owners)] for row_idx, owners in indexes["seat_owners"].items()],
+      },
+    }
+
+def load_snapshot(snapshot:dict, **screening_kwargs) -> Screening:
+  screening = Screening(snapshot["title"], snapshot["rows"], snapshot["spr"], **screening_kwargs)
+  screening.theatre.load(decode_bytes(snapshot["theatre"]))
+
+  # Bookings of snapshots written without indexes are indexed again, as created now unless they have a fifth field with their creation time.
+  indexes = snapshot.get("indexes")
+  if indexes is not None:
+    indexes = {
+      "created_times": decode_bytes(indexes["created_times"]),
+      "created_numbers": decode_bytes(indexes["created_numbers"]),
+      "seat_owners": {row_idx: decode_bytes(owners) for row_idx, owners in indexes["seat_owners"]},
+    }
+  screening.bookings = type(screening.bookings).restore(snapshot["bookings"], snapshot["next_id"], indexes)
+
+  # Rebuild state derived from the theatre matrix, then hold seats of bookings which were still unconfirmed.
+  for row_idx in range(screening.rows):
+    screening.seat_index.set_free(row_idx, screening.theatre.free_seats(row_idx))
+  screening.vacancies = screening.seat_index.free
+  screening._unpublished_rows.update(range(screening.rows))
+  screening._publish_availability()
+  for booking in screening.bookings.unconfirmed_bookings():
+    screening._hold_seats(booking.id, booking.seats)
+  return screening
+
+def replay(screening:Screening, directory:str, after:int) -> int:
+  """
+  Apply journal events recorded after a sequence number.
+  :return: Sequence number of the last applied event.
+  """
+  sequence = after
+  path = os.path.join(directory, JOURNAL_FILE)
+  if not os.path.exists(path):
+    return sequence
+  with open(path, "r+b") as journal_file:
+    data = journal_file.read()
+    valid_length = data.rfind(b"\n") + 1
+    if valid_length < len(data):
+      # Partially written group from a crash, none of it was acknowledged as durable.
+      # Cut it off so events appended from hereon start on a fresh line.
+      journal_file.truncate(valid_length)
+  # Decoding the whole tail as one JSON array avoids per-line decoder overhead.
+  lines = data[:valid_length].decode().splitlines()
+  events = json.loads("[" + ",".join(lines) + "]")
+
+  events = [event for event in events if event["seq"] > sequence]
+  screening.apply_events(decode_event(event) for event in events)
+  return events[-1]["seq"] if events else sequence
+
+def open_screening(directory:str, title:str=None, rows:int=None, spr:int=None, journal_options:dict=None, **screening_kwargs) -> Screening:
+  """
+  Restore a screening from its latest snapshot and journal tail, or create a new one if the directory has no snapshot.
+  The returned screening has a Journal attached, close it with screening.journal.close().
+  :param journal_options: Keyword arguments for Journal, e.g. group_size or snapshot_every.
+  :param screening_kwargs: Keyword arguments for Screening which are not persisted, e.g. backend or hold_timeout.
+  """
+  snapshot_path = os.path.join(directory, SNAPSHOT_FILE)
+  if os.path.exists(snapshot_path):
+    # Restoring allocates an object per booking and nothing to collect, so cyclic GC passes would only slow startup down.
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+      with open(snapshot_path) as snapshot_file:
+        snapshot = json.load(snapshot_file)
+      screening = load_snapshot(snapshot, **screening_kwargs)
+      sequence = replay(screening, directory, snapshot["seq"])
+    finally:
+      if gc_enabled:
+        gc.enable()
+    journal = Journal(directory, sequence, **(journal_options or {}))
+    journal.attach(screening)
+  else:
+    if title is None or rows is None or spr is None:
+      raise Exception(f"No screening found in {directory}!")
+    screening = Screening(title, rows, spr, **screening_kwargs)
+    journal = Journal(directory, **(journal_options or {}))
+    journal.attach(screening)
+    journal.write_snapshot()
+  return screening
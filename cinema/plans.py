@@ -0,0 +1,67 @@
+from cinema.instrumentation import metrics
+
+class AllocationPlans:
+  def __init__(self, allocate, max_size:int=6):
+    """
+    Cache of default seat allocations for party sizes 1 to max_size, so repeated bookings of common sizes skip the walk.
+
+    The default allocation fills the first rows with free seats, so it only depends on the rows up to the last row it uses.
+    Each plan keeps that row, and a change to the free seats of any row up to it drops the plan, to be recomputed on next use.
+    Changes to rows further from the back leave the plan as it is.
+
+    Plans only pay off while the rows they use stay unchanged, e.g. several bookings created before any is confirmed outside hold mode.
+    Each confirmation, or each hold in hold mode, takes seats from the last row of every plan, so when bookings are created and
+    confirmed in turn no plan is ever reused: 20000 bookings of 1-4 tickets in a 400x400 hall hit 0% of lookups with or without
+    holds, and each miss costs more than allocating directly. Screening leaves the cache disabled by default for this reason.
+    :param allocate: Function returning the default allocation for a number of tickets, e.g. Screening.allocate_seats.
+    :param max_size: Largest party size to cache plans for. 0 disables caching.
+    """
+    self.allocate = allocate
+    self.max_size = max_size
+    # tickets: (selection, last row used)
+    self.plans = {}
+    self.hits = 0
+    self.misses = 0
+    self.invalidations = 0
+
+  def get(self, tickets:int) -> dict:
+    """
+    Same result as allocate(tickets), served from the cache when the plan for that party size is still valid.
+    :return: Dictionary of row_idx: [List of seat_idx], which the caller is free to modify.
+    """
+    if not 0 < tickets <= self.max_size:
+      return self.allocate(tickets)
+    plan = self.plans.get(tickets)
+    if plan is None:
+      self.misses += 1
+      if metrics.enabled:
+        metrics.count("allocation_plans_total", result="miss")
+      selection = self.allocate(tickets)
+      if not selection:
+        return selection
+      plan = self.plans[tickets] = (selection, max(selection))
+    else:
+      self.hits += 1
+      if metrics.enabled:
+        metrics.count("allocation_plans_total", result="hit")
+    return {row_idx: seats.copy() for row_idx, seats in plan[0].items()}
+
+  def invalidate_row(self, row:int):
+    """
+    Drop plans which depend on a row, after its free seats changed.
+    """
+    stale = [tickets for tickets, (selection, last_row) in self.plans.items() if last_row >= row]
+    for tickets in stale:
+      del self.plans[tickets]
+    self.invalidations += len(stale)
+
+  def clear(self):
+    self.invalidations += len(self.plans)
+    self.plans.clear()
+
+  def stats(self) -> dict:
+    lookups = self.hits + self.misses
+    return {
+      "hits": self.hits, "misses": self.misses, "invalidations": self.invalidations, "cached": len(self.plans),
+      "hit_rate": self.hits / lookups if lookups else 0.0,
+    }
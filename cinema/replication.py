@@ -0,0 +1,236 @@
+"""
+Leader/follower replication of a screening over a local socket, so reads can be served by other processes and a follower
+can take over with the full booking state if the leader is lost.
+
+The leader records every event applied to its screening, as Journal does, and streams them to followers as JSON lines with
+sequence numbers. A follower starts from a snapshot of the leader's screening (see cinema.journal.dump_snapshot), then applies
+each event through Screening.apply_event, so it ends up with the same bookings and seats. Followers which reconnect resume from
+their last sequence number while the leader still has the events after it, otherwise they start from a new snapshot.
+"""
+from collections import deque
+import json
+import queue
+import socket
+import threading
+import time
+
+from cinema.journal import decode_event, dump_snapshot, encode_event, load_snapshot
+from cinema.screening import Screening
+
+class ReplicationLeader:
+  def __init__(self, screening:Screening, host:str="127.0.0.1", port:int=0, backlog:int=65536, follower_buffer:int=65536):
+    """
+    Stream events applied to a screening to any follower that connects. A journal already attached to the screening keeps
+    recording events, as the leader passes them on to it.
+    :param port: Port to listen on, 0 for any free port, see ReplicationLeader.address.
+    :param backlog: Number of recent events kept for followers resuming from a sequence number.
+    :param follower_buffer: Events queued for a follower before it is considered too slow and disconnected.
+      It then reconnects and catches up from the backlog or a snapshot, rather than the leader buffering without limit.
+    """
+    self.screening = screening
+    self.sequence = 0
+    self.backlog = deque(maxlen=backlog)
+    self.follower_buffer = follower_buffer
+    self.followers = []
+    self.journal = screening.journal
+    screening.journal = self
+
+    self._server = socket.create_server((host, port))
+    self.address = self._server.getsockname()[:2]
+    self._closed = False
+    threading.Thread(target=self._accept, daemon=True).start()
+
+  def record(self, event:dict):
+    """
+    Called by Screening.apply_event while holding the screening lock, so events are numbered in the order they were applied.
+    """
+    self.sequence += 1
+    entry = encode_event(event, self.sequence)
+    # Wall clock time of the event, for followers on the same host to measure replication lag.
+    entry["ts"] = time.time()
+    line = (json.dumps(entry, separators=(",", ":")) + "\n").encode()
+    self.backlog.append((self.sequence, line))
+    for follower in self.followers:
+      try:
+        follower.put_nowait(line)
+      except queue.Full:
+        self._drop(follower)
+    if self.journal is not None:
+      self.journal.record(event)
+
+  def flush(self):
+    if self.journal is not None:
+      self.journal.flush()
+
+  def close(self):
+    self._closed = True
+    self._server.close()
+    for follower in list(self.followers):
+      self._drop(follower)
+    self.screening.journal = self.journal
+
+  def _drop(self, follower:queue.Queue):
+    self.followers = [other for other in self.followers if other is not follower]
+    # Wake the follower's sender with a sentinel, making room for it if the queue is full.
+    while True:
+      try:
+        follower.put_nowait(None)
+        return
+      except queue.Full:
+        try:
+          follower.get_nowait()
+        except queue.Empty:
+          pass
+
+  def _accept(self):
+    while not self._closed:
+      try:
+        connection, address = self._server.accept()
+      except OSError:
+        return
+      threading.Thread(target=self._serve, args=(connection,), daemon=True).start()
+
+  def _serve(self, connection:socket.socket):
+    follower = queue.Queue(self.follower_buffer)
+    try:
+      with connection, connection.makefile("rb") as reader:
+        hello = json.loads(reader.readline() or b"{}")
+        since = hello.get("since") if isinstance(hello, dict) else None
+        # Anything but a sequence number, including true and false, is answered with a fresh snapshot.
+        if type(since) is not int:
+          since = None
+        with self.screening._lock:
+          # Taken under the lock record is called with, so no event is missed or sent twice between catch-up and streaming.
+          if since is not None and since <= self.sequence and (since == self.sequence or self.backlog[0][0] <= since + 1):
+            catch_up = [line for sequence, line in self.backlog if sequence > since]
+          else:
+            snapshot = dump_snapshot(self.screening, self.sequence)
+            message = {"snapshot": snapshot, "hold_timeout": self.screening.hold_timeout}
+            catch_up = [(json.dumps(message, separators=(",", ":")) + "\n").encode()]
+          self.followers = self.followers + [follower]
+        connection.sendall(b"".join(catch_up))
+        while True:
+          lines = [follower.get()]
+          # Send whatever else is already queued in the same write.
+          while len(lines) < 1024 and not follower.empty():
+            lines.append(follower.get_nowait())
+          if None in lines:
+            connection.sendall(b"".join(lines[:lines.index(None)]))
+            return
+          connection.sendall(b"".join(lines))
+    except (OSError, ValueError):
+      pass
+    finally:
+      self.followers = [other for other in self.followers if other is not follower]
+
+class ReplicationFollower:
+  def __init__(self, address:tuple[str, int], retry_delay:float=0.1, **screening_kwargs):
+    """
+    Replica of a leader's screening, kept up to date from a background thread, for serving read-only queries.
+
+    Holds are only expired by the leader, whose expiry events are replicated, so the replica is created without a hold timeout.
+    The leader's hold timeout is kept for promote, which restores it. Bookings must not be made on the replica directly,
+    except after promote.
+    :param screening_kwargs: Keyword arguments for the replica's Screening which are not replicated, e.g. backend or booking_store.
+    """
+    self.address = address
+    self.retry_delay = retry_delay
+    self.screening_kwargs = dict(screening_kwargs, hold_timeout=None)
+    self.screening = None
+    self.sequence = None
+    self.hold_timeout = None
+    # Replication lag of recent events in seconds, from the leader applying them to this replica applying them.
+    self.lags = deque(maxlen=100000)
+    self._applied = threading.Condition()
+    self._stopped = threading.Event()
+    self._socket = None
+    self._thread = threading.Thread(target=self._run, daemon=True)
+
+  def start(self, timeout:float=None):
+    """
+    Connect to the leader, waiting up to timeout seconds for the first snapshot.
+    """
+    self._thread.start()
+    if not self.wait_for(0, timeout):
+      raise Exception(f"No snapshot received from {self.address[0]}:{self.address[1]}!")
+    return self
+
+  def wait_for(self, sequence:int, timeout:float=None) -> bool:
+    """
+    Wait until the replica has applied events up to a sequence number, e.g. to read a booking just made on the leader.
+    :return: Whether the sequence number was reached within timeout seconds.
+    """
+    with self._applied:
+      return self._applied.wait_for(lambda: self.sequence is not None and self.sequence >= sequence, timeout)
+
+  def get_title_availability(self) -> str:
+    return self.screening.availability.get_title_availability()
+
+  def check_booking(self, booking_id:str) -> tuple[str, str]:
+    return self.screening.check_booking(booking_id)
+
+  def get_booking(self, booking_id:str, fallback=None):
+    return self.screening.bookings.get_booking(booking_id, fallback)
+
+  def promote(self, hold_timeout:float=None) -> Screening:
+    """
+    Stop following and hand over the replica, e.g. to take bookings after the leader has failed.
+
+    The replica takes the leader's hold timeout, and seats of bookings which were still unconfirmed are held again, as when
+    loading a snapshot, so new bookings are not handed the same seats. Their holds run from the time of promotion.
+    :param hold_timeout: Hold timeout of the promoted screening, defaults to the leader's.
+    """
+    self.close()
+    screening = self.screening
+    with screening._lock:
+      screening.hold_timeout = self.hold_timeout if hold_timeout is None else hold_timeout
+      for booking in screening.bookings.values():
+        if not booking.confirmed:
+          screening._hold_seats(booking.id, booking.seats)
+    return screening
+
+  def close(self):
+    self._stopped.set()
+    if self._socket is not None:
+      try:
+        self._socket.shutdown(socket.SHUT_RDWR)
+      except OSError:
+        pass
+    if self._thread.is_alive():
+      self._thread.join()
+
+  def _run(self):
+    while not self._stopped.is_set():
+      try:
+        self._follow()
+      except (OSError, ValueError):
+        pass
+      except Exception:
+        # The replica diverged from the leader, e.g. an event replayed with another booking ID. Start again from a snapshot.
+        self.sequence = None
+      self._stopped.wait(self.retry_delay)
+
+  def _follow(self):
+    with socket.create_connection(self.address) as connection, connection.makefile("rb") as reader:
+      self._socket = connection
+      connection.sendall((json.dumps({"since": self.sequence}) + "\n").encode())
+      for line in reader:
+        entry = json.loads(line)
+        if "snapshot" in entry:
+          screening = load_snapshot(entry["snapshot"], **self.screening_kwargs)
+          with self._applied:
+            self.hold_timeout = entry.get("hold_timeout")
+            self.screening = screening
+            self.sequence = entry["snapshot"]["seq"]
+            self._applied.notify_all()
+          continue
+        if entry["seq"] != self.sequence + 1:
+          raise Exception(f"Expected event {self.sequence + 1} but received {entry['seq']}!")
+        sent = entry.pop("ts")
+        self.screening.apply_event(decode_event(entry))
+        self.lags.append(time.time() - sent)
+        with self._applied:
+          self.sequence = entry["seq"]
+          self._applied.notify_all()
+      if self._stopped.is_set():
+        return
@@ -0,0 +1,96 @@
+import heapq
+import itertools
+import threading
+
+class ExpiryScheduler:
+  def __init__(self):
+    """
+    Deadlines of pending holds, kept in a heap so the next hold to expire is found in O(1) and each expiry costs O(log n).
+
+    Rescheduling or cancelling a key leaves its old heap entry in place, to be skipped when popped. Once stale entries outnumber
+    live ones, the heap is rebuilt so it stays proportional to the number of pending holds.
+    """
+    # key: deadline of its live heap entry
+    self.deadlines = {}
+    self._heap = []
+    # Tie-breaker so keys with equal deadlines expire in the order they were scheduled.
+    self._order = itertools.count()
+
+  def __len__(self) -> int:
+    return len(self.deadlines)
+
+  def __contains__(self, key) -> bool:
+    return key in self.deadlines
+
+  def schedule(self, key, deadline:float):
+    """
+    Schedule a key to expire at a deadline, replacing any deadline it already has.
+    """
+    self.deadlines[key] = deadline
+    heapq.heappush(self._heap, (deadline, next(self._order), key))
+    if len(self._heap) > 64 and len(self._heap) > 2 * len(self.deadlines):
+      self._compact()
+
+  def cancel(self, key) -> float:
+    """
+    :return: Deadline the key was scheduled for, or None if it was not scheduled.
+    """
+    return self.deadlines.pop(key, None)
+
+  def next_deadline(self) -> float:
+    """
+    :return: Earliest pending deadline, or None if nothing is scheduled.
+    """
+    heap = self._heap
+    while heap and self.deadlines.get(heap[0][2]) != heap[0][0]:
+      heapq.heappop(heap)
+    return heap[0][0] if heap else None
+
+  def pop_due(self, now:float) -> list:
+    """
+    Remove and return keys whose deadline is at or before now, earliest first.
+    """
+    due = []
+    heap = self._heap
+    while heap and heap[0][0] <= now:
+      deadline, order, key = heapq.heappop(heap)
+      if self.deadlines.get(key) == deadline:
+        del self.deadlines[key]
+        due.append(key)
+    return due
+
+  def _compact(self):
+    self._heap = [entry for entry in self._heap if self.deadlines.get(entry[2]) == entry[0]]
+    heapq.heapify(self._heap)
+
+class HoldReaper:
+  def __init__(self, screening, max_wait:float=60):
+    """
+    Background thread expiring a screening's holds as their deadlines pass, so abandoned bookings release their seats
+    even when no other booking operation comes along to expire them.
+    The thread sleeps until the next deadline, waking early when a hold is scheduled while none were pending.
+    :param max_wait: Longest the thread sleeps between checks, e.g. to pick up deadlines brought forward by a clock change.
+    """
+    self.screening = screening
+    self.max_wait = max_wait
+    self._stop = threading.Event()
+    self._thread = threading.Thread(target=self._run, daemon=True)
+
+  def start(self):
+    self._thread.start()
+    return self
+
+  def stop(self):
+    self._stop.set()
+    self.screening._hold_added.set()
+    self._thread.join()
+
+  def _run(self):
+    screening = self.screening
+    while not self._stop.is_set():
+      screening._hold_added.clear()
+      with screening._lock:
+        screening.expire_holds()
+        deadline = screening.hold_scheduler.next_deadline()
+      wait = self.max_wait if deadline is None else min(self.max_wait, max(0, deadline - screening._clock()))
+      screening._hold_added.wait(wait)
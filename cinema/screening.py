@@ -1,7 +1,27 @@
-from cinema.booking import Bookings
+from bisect import bisect_left
+import threading
+import time
+
+from cinema.availability import AvailabilitySnapshot, RowChunks, theatre_frame
+from cinema.booking import BOOKING_STORES
+from cinema.codec import SeatCodec
+from cinema.feed import FREE, HELD, OCCUPIED, OccupancyFeed
+from cinema.scheduler import ExpiryScheduler
+from cinema.instrumentation import metrics
+from cinema.plans import AllocationPlans
+from cinema.seat_index import FreeSeatIndex
+from cinema.theatre import THEATRE_BACKENDS
 
 class Screening:
-  def __init__(self, title, rows, spr):
+  def __init__(self, title, rows, spr, backend="list", hold_timeout=None, booking_store="objects", plan_sizes=0):
+    """
+    :param backend: Storage for the theatre matrix, "list" for a list of lists or "bytes" for a compact contiguous buffer.
+    :param booking_store: Storage for bookings, "objects" for a dictionary of Booking objects or "columnar" for one array per field.
+    :param hold_timeout: Seconds an unconfirmed booking holds its seats for. When set, seats are held as soon as they are allocated,
+      so concurrent unconfirmed bookings cannot be handed the same seats. When None, seats are only taken on confirmation.
+    :param plan_sizes: Largest party size whose default allocation is cached between bookings, see cinema.plans. 0, the default,
+      disables the cache, as confirming a booking drops the plans it would serve and bookings which are confirmed never hit it.
+    """
     # Store inputs
     self.title = title
     self.rows = rows
@@ -9,13 +29,49 @@ class Screening:
 
     # Generate theatre based on rows and spr
     # Seats are initialized as 0, indicating unoccupied. Occupied seats should be indicated by booking ID.
-    self.theatre = [spr * [0] for i in range(rows)]
+    if backend not in THEATRE_BACKENDS:
+      raise Exception(f"Unknown theatre backend {backend}!")
+    self.theatre = THEATRE_BACKENDS[backend](rows, spr)
+    if booking_store not in BOOKING_STORES:
+      raise Exception(f"Unknown booking store {booking_store}!")
     # Separate vacancies counter to prevent needing to iterate through matrix to count empty seats.
     self.vacancies = rows * spr
+    # Bitmask index of unoccupied seats, kept in sync with the theatre matrix so allocation does not need to scan it.
+    self.seat_index = FreeSeatIndex(rows, spr)
+    # Default allocations of common party sizes, dropped as the rows they depend on change.
+    self.allocation_plans = AllocationPlans(self.allocate_seats, plan_sizes)
+    if plan_sizes:
+      self.seat_index.row_watchers.append(self.allocation_plans.invalidate_row)
+    # Precomputed row labels and seat numbers.
+    self.codec = SeatCodec(rows, spr)
+
+    # Initialize empty bookings store, looked up by booking ID.
+    self.bookings = BOOKING_STORES[booking_store]()
+
+    # Concurrent booking mode. Seat state is only read or modified while holding the lock, so a Screening can be shared by a thread pool.
+    self.hold_timeout = hold_timeout
+    # Expiry time of each held booking. Holds are expired by the next booking operation, or by a cinema.scheduler.HoldReaper.
+    self.hold_scheduler = ExpiryScheduler()
+    self._hold_added = threading.Event()
+    self._clock = time.monotonic
+    self._lock = threading.RLock()
+
+    # Deltas of seat states published by every change to seats, for live seat maps, see Screening.subscribe.
+    self.feed = OccupancyFeed(self._seat_states)
 
-    # Initialize empty dict of bookings. Shape: {'booking_id': < Booking object >}
-    # Could convert this to a data structure to add functionality to keep track of booking IDs
-    self.bookings = Bookings()
+    # Optional cinema.journal.Journal recording every change to bookings and seats, attached with Journal.attach,
+    # or a cinema.replication.ReplicationLeader streaming them to followers.
+    self.journal = None
+
+    # Latest AvailabilitySnapshot of confirmed seats, replaced after every confirmation, for readers which should not take the lock.
+    # Rows occupied since the last snapshot are copied into the next one, every other row is shared with the previous version.
+    self._unpublished_rows = set()
+    # Set by apply_events, which publishes one snapshot after the whole run of events instead of one per confirmation.
+    self._defer_publishing = False
+    self.availability = AvailabilitySnapshot(
+      0, title, rows, spr, self.vacancies, RowChunks([bytes(spr)] * rows), RowChunks([spr] * rows), self.codec.row_labels,
+      self._generate_frame()
+    )
 
   def get_vacancy(self) -> int:
     """
@@ -24,48 +80,42 @@ class Screening:
     # return self._count_empty_seats()
     return self.vacancies
   
+  def get_available(self) -> int:
+    """
+    Getter to get the number of seats a new booking can be given, which excludes seats held by unconfirmed bookings in hold mode.
+    """
+    # Held seats are no longer in the seat index, so vacancies alone would over-count seats available to a new booking.
+    return self.seat_index.free if self.hold_timeout is not None else self.vacancies
+
   def get_title_availability(self) -> str:
     return f"{self.title} ({self.vacancies} {'seat' if self.vacancies == 1 else 'seats'} available)"
   
+  @metrics.timed("get_theatre")
   def get_theatre(self, selection=None):
-    # Get width of alphabet labels on left hand. Need to match this with trailing space on right to maintain symmetry
-    vertical_label_width = (self.rows // 26) + 1
-    row_width = self.spr * 3
-    # Calculate number of hyphens to represent screen width. Written in this "redundant" way for visualization.
-    screen_width = vertical_label_width + row_width + vertical_label_width
-
-    # Find starting index to place "S C R E E N". Displaced to the left for even number widths
-    screen_label_index = (screen_width - 11) // 2
-    screen_label = (" " * screen_label_index) + "S C R E E N" + (" " * screen_label_index)
-    screen_repr = "-" * screen_width
-
-    visual = [screen_label, screen_repr]
-
-
-    def generate_row(row: int, seats: list[int]):
-      output = self.row_to_alpha_row(row)
-      for idx, seat in enumerate(seats):
-        # Check if seat is within selection, output "o" if so.
-        if selection and idx in selection.get(row, []):
-          seat_repr = "o"
-        elif seat == 1:
-          seat_repr = "#"
-        else:
-          seat_repr = "."
-        output += f" {seat_repr} "
-      return output.rstrip()
-    
-    for idx, seats in reversed(list(enumerate(self.theatre))):
-      visual.append(generate_row(idx, seats))
-    
-    column_labels = vertical_label_width * " "
-    for i in range(1, self.spr + 1):
-      column_labels += f" {i} "
-    visual.append(column_labels)
-
-    return "\n".join(visual)
-  
-  def create_booking(self, tickets) -> str:
+    """
+    Render the theatre matrix as text, with seats in selection marked "o".
+
+    Rendered from the latest availability snapshot, which caches rendered rows and only re-renders rows confirmed since the
+    previous version, see AvailabilitySnapshot.get_theatre.
+    :param selection: Dictionary of row_idx: [List of seat_idx], e.g. Booking.seats.
+    """
+    return self.availability.get_theatre(selection)
+
+  def _generate_frame(self) -> tuple[list[str], str]:
+    """
+    Generate the screen header and column labels, which only depend on the theatre size.
+    """
+    return theatre_frame(self.rows, range(self.spr))
+
+  def iter_theatre(self, selection=None, rows:range=None, columns:range=None, context:int=None):
+    """
+    Yield the lines of get_theatre one at a time, optionally only a window of rows and seats, or the rows of a selection with
+    context rows either side. Lines are rendered from the latest availability snapshot, see AvailabilitySnapshot.iter_theatre.
+    """
+    return self.availability.iter_theatre(selection, rows, columns, context)
+
+  @metrics.timed("create_booking")
+  def create_booking(self, tickets, together=False) -> str:
     """
     Creates booking based on number of tickets.
 
@@ -76,19 +126,84 @@ class Screening:
 
     For odd-numbered groups, round down mid index.
     :param tickets: Number of seats to reserve
+    :param together: Prefer seating the group side by side, in the row furthest from the screen with enough adjacent free seats,
+      as near to the middle of the row as possible. Falls back to the rules above when no row has enough adjacent free seats.
     :return: ID of the created Booking object or Falsy string if unable to create booking.
     """
-    
-    if tickets > self.vacancies:
-      # If insufficient vacancy
-      return ""
-    selection = self.allocate_seats(tickets)
-    
-    # Create booking_id and "save" booking
-    booking = self.bookings.create_booking(tickets, selection)
-
-    return booking.id
+    with self._lock:
+      self.expire_holds()
+      if tickets > self.get_available():
+        # If insufficient vacancy
+        return ""
+      block = self.seat_index.together_block(tickets) if together else None
+      if block:
+        row_idx, seat = block
+        selection = {row_idx: list(range(seat, seat + tickets))}
+      else:
+        selection = self.allocation_plans.get(tickets)
+      
+      # Create booking_id and "save" booking
+      return self.apply_event({"op": "create", "count": tickets, "seats": selection})
   
+  def create_bookings(self, ticket_counts, chunk_size:int=1024):
+    """
+    Book and confirm many parties, e.g. block sales for schools and corporate groups.
+
+    Gives the same bookings as calling create_booking then confirm_booking for each party in order, but each chunk of parties is
+    allocated in one pass over the seat index and confirmed together, marking the theatre matrix once per affected row.
+    Results are yielded chunk by chunk, so the lock is never held while the caller consumes them.
+    :param ticket_counts: Iterable of ticket counts, one per party.
+    :return: Generator of (booking_id, selection) tuples in input order. booking_id is a falsy string if the party could not be seated.
+    """
+    chunk = []
+    for tickets in ticket_counts:
+      chunk.append(tickets)
+      if len(chunk) >= chunk_size:
+        yield from self._create_bookings_chunk(chunk)
+        chunk = []
+    if chunk:
+      yield from self._create_bookings_chunk(chunk)
+
+  def _create_bookings_chunk(self, ticket_counts:list[int]) -> list[tuple[str, dict]]:
+    with self._lock:
+      self.expire_holds()
+      entries = []
+      selections = []
+      # Middle-out walk order of each partly filled row, with the position of the next seat to hand out.
+      # Default allocation always takes the first free seats in walk order, so successive parties in a row continue from the last one.
+      walk_orders = {}
+      seat_index = self.seat_index
+      for tickets in ticket_counts:
+        # Seats are taken from the index as parties are placed, so its free count tracks what confirming each party would leave.
+        if tickets > seat_index.free:
+          selections.append(None)
+          continue
+        selection = {}
+        remaining_tickets = tickets
+        while remaining_tickets > 0:
+          # Same rules as allocate_seats without a selected position: fill the first row with free seats, middle-out if the party fits.
+          row_idx = (seat_index.free_rows & -seat_index.free_rows).bit_length() - 1
+          availability = seat_index.row_free[row_idx]
+          if availability <= remaining_tickets:
+            seats = seat_index.free_seats(row_idx)
+            walk_orders.pop(row_idx, None)
+          else:
+            walk_order = walk_orders.get(row_idx)
+            if walk_order is None:
+              walk_order = walk_orders[row_idx] = [seat_index.walk_order(row_idx), 0]
+            position = walk_order[1]
+            seats = sorted(walk_order[0][position:position + remaining_tickets])
+            walk_order[1] = position + remaining_tickets
+          seat_index.take(row_idx, seats)
+          selection[row_idx] = seats
+          remaining_tickets -= availability
+        entries.append((tickets, selection))
+        selections.append(selection)
+
+      booking_ids = iter(self.apply_event({"op": "batch", "bookings": entries}))
+    return [(next(booking_ids), selection) if selection is not None else ("", {}) for selection in selections]
+
+  @metrics.timed("change_seats")
   def change_seats(self, booking_id:str, alpha_row:str, seat_num:str):
     """
     Method to change seats for unconfirmed bookings.
@@ -102,85 +217,120 @@ class Screening:
     :param alpha_row: String of alphabets representing a row.
     :param seat_num: String of numerals representing the seat number.
     """
-    booking = self.bookings.get_booking(booking_id)
-    if not booking or booking.confirmed:
-      # Outside the scope of assessment, does not provide scenarios where confirmed bookings can be modified via the required interface.
-      # As such, exceptions will be raised in these scenarios for this assessment.
-      raise Exception(f"Booking {booking_id} cannot be modified!")
-    
     row, seat = self.seat_to_row_coord(alpha_row, seat_num)
-    selected_seats = self.allocate_seats(booking.count, row, seat)
-    updated_booking = self.bookings.update_booking(booking_id, selected_seats)
-    return updated_booking.id
+    if not self.check_valid_coord(row, seat):
+      # Without this, an unknown row would fall back to the default allocation rather than the position asked for.
+      raise Exception(f"\"{alpha_row}{seat_num}\" is not a valid seat number!")
+    with self._lock:
+      self.expire_holds()
+      booking = self.bookings.get_booking(booking_id)
+      if not booking or booking.confirmed:
+        # Outside the scope of assessment, does not provide scenarios where confirmed bookings can be modified via the required interface.
+        # As such, exceptions will be raised in these scenarios for this assessment.
+        raise Exception(f"Booking {booking_id} cannot be modified!")
+      
+      # Seats held by this booking are available to it again when picking the new position.
+      self._release_hold(booking_id, booking.seats)
+      selected_seats = self._reseat(booking.count, row, seat)
+      return self.apply_event({"op": "change", "id": booking_id, "seats": selected_seats})
+
+  def _reseat(self, tickets:int, selected_row:int, selected_seat:int) -> dict:
+    """
+    Select the same seats as allocate_seats(tickets, selected_row, selected_seat), for change_seats.
+
+    Customers often try several positions for the same booking. Rather than collecting free seats bit by bit on every attempt,
+    each row visited is read through FreeSeatIndex.row_view, whose lists are reused until the row changes. The seats from the
+    selected position are then a slice, and middle-out seats a prefix of the row's walk order.
+    Overflow back to the row furthest from the screen is a further pass over the rows instead of a recursive call.
+    """
+    seat_index = self.seat_index
+    if not seat_index.free:
+      # allocate_seats would recurse without end here, as no pass over the rows grants any seats.
+      raise Exception("No seats available!")
+    selection = {}
+    remaining_tickets = tickets
+    start_row = selected_row
+    while True:
+      for row_idx in seat_index.iter_free_rows(start_row):
+        if remaining_tickets < 1:
+          break
+        if row_idx == selected_row:
+          free_seats, walk_order = seat_index.row_view(row_idx)
+          valid_seats = free_seats[bisect_left(free_seats, selected_seat):]
+          availability = len(valid_seats)
+          if availability > 0:
+            selection[row_idx] = valid_seats[:remaining_tickets]
+            remaining_tickets -= availability
+          continue
+        availability = seat_index.row_free[row_idx]
+        if availability <= remaining_tickets:
+          free_seats, walk_order = seat_index.row_view(row_idx)
+          selection[row_idx] = free_seats.copy()
+        else:
+          free_seats, walk_order = seat_index.row_view(row_idx, walk=True)
+          existing_selections_in_row = selection.get(row_idx)
+          if existing_selections_in_row:
+            excluded = set(existing_selections_in_row)
+            picked = [seat for seat in walk_order if seat not in excluded][:remaining_tickets]
+            selection[row_idx] = sorted(picked + existing_selections_in_row)
+          else:
+            selection[row_idx] = sorted(walk_order[:remaining_tickets])
+        remaining_tickets -= availability
+      if remaining_tickets < 1:
+        return selection
+      # As allocate_seats recursing with the selection so far as carryover_selection.
+      if metrics.enabled:
+        metrics.count("allocate_overflow_recursions_total")
+      start_row = selected_row = -1
 
   def allocate_seats(self, tickets, selected_row=-1, selected_seat=-1, carryover_selection={}) -> dict:
+    """
+    Select seats for a number of tickets without modifying the theatre.
+
+    Only rows with free seats are visited, using Screening.seat_index, so the cost scales with the seats granted rather than the size of the theatre.
+    :param selected_row: 0-index of row to start from, if the user has specified a starting position.
+    :param selected_seat: 0-index of seat within selected_row to start from.
+    :param carryover_selection: Seats selected by a previous pass, when overflowing back to the row furthest from the screen.
+    :return: Dictionary of row_idx: [List of seat_idx]
+    """
     selection = carryover_selection.copy()
     remaining_tickets = tickets
-    for row_idx, row in enumerate(self.theatre):
-      if row_idx < selected_row:
-        # If selected row has been specified, i.e. more than 0, skip rows until the selected row.
-        continue
-      elif remaining_tickets < 1:
+    rows_scanned = 0
+    seats_examined = 0
+    for row_idx in self.seat_index.iter_free_rows(selected_row):
+      if remaining_tickets < 1:
         break
-      existing_selections_in_row = selection.get(row_idx, [])
-      availability = row.count(0)
+      rows_scanned += 1
       if row_idx == selected_row:
         # If currently at selected_row, check availability starting from selected seat (ignore the front seat).
         # If overflow, this block can be disregarded afterwards.
-        row = row[selected_seat:]
-        availability = row.count(0)
+        valid_seats = self.seat_index.free_seats(row_idx, selected_seat)
+        availability = len(valid_seats)
+        seats_examined += availability
         if availability > 0:
-          # len(valid_seats) should tally with availability, as long as logic [seat == 0 is available] is maintained.
-          valid_seats = [seat_idx + selected_seat for seat_idx, seat in enumerate(row) if seat == 0]
-          if availability <= remaining_tickets:
-            selection[row_idx] = valid_seats
-          else:
-            selection[row_idx] = valid_seats[:remaining_tickets]
+          selection[row_idx] = valid_seats[:remaining_tickets]
           remaining_tickets -= availability
+        continue
+      availability = self.seat_index.free_count(row_idx)
+      seats_examined += availability
+      if availability <= remaining_tickets:
+        # If row can fit all remaining_tickets or needs to overflow, fill up row as much as possible.
+        selection[row_idx] = self.seat_index.free_seats(row_idx)
       else:
-        if availability > 0:
-          # If there are any available seats, attempt to shove people in
-          if availability <= remaining_tickets:
-            # If row can fit all remaining_tickets or needs to overflow, fill up row as much as possible.
-            selection[row_idx] = [seat_idx for seat_idx, seat in enumerate(row) if seat == 0]
-          else:
-            # Otherwise, the row can accomodate all remaining tickets
-            # Find middle most position then slowly check left and right for any available positions 
-            # (based on rules, don't have to seat together?)
-            empty_stack = []
-            check_left = True
-            if len(row) % 2 == 0:
-              # For [0, 0, 0, 0], length 4, the middle idx is 4 // 2 - 1 = 1. Check "middle", then right then left...
-              mid_idx = len(row) // 2 - 1
-              left_idx = mid_idx
-              right_idx = mid_idx + 1
-            else:
-              # For [0, 0, 0, 0 ,0], length 5, the middle idx is 5 // 2 = 2. Check middle, then left then right...
-              mid_idx = len(row) // 2
-              left_idx = mid_idx - 1
-              right_idx = mid_idx
-              check_left = False
-
-            # Check if any seats have already been selected in row
-            # There can be situations, esp in very full theatres, where overflow loops back into already checked-through rows.
-            # E.g. 10 seats per row and 8 tickets to allocate but seat 9 was selected.
-            # Allocation would thus have to allocate seat 9 and 10, then "overflow" the remaining into the middle seats.
-            existing_selections_in_row = selection.get(row_idx, [])
-            
-            # Loop through seats in row, starting from middle then Right, Left, Right...
-            while len(empty_stack) < remaining_tickets and left_idx >= 0 and right_idx < len(row):
-              if check_left:
-                if row[left_idx] == 0 and not left_idx in existing_selections_in_row:
-                  # Append coordinates if seat is empty
-                  empty_stack.append(left_idx)
-                left_idx -= 1
-              else:
-                if row[right_idx] == 0 and not right_idx in existing_selections_in_row:
-                  empty_stack.append(right_idx)
-                right_idx += 1
-              check_left = not check_left
-            selection[row_idx] = list(sorted(empty_stack + existing_selections_in_row))
-          remaining_tickets -= availability
+        # Otherwise, the row can accomodate all remaining tickets
+        # Find middle most position then slowly check left and right for any available positions 
+        # (based on rules, don't have to seat together?)
+        # There can be situations, esp in very full theatres, where overflow loops back into already checked-through rows.
+        # E.g. 10 seats per row and 8 tickets to allocate but seat 9 was selected.
+        # Allocation would thus have to allocate seat 9 and 10, then "overflow" the remaining into the middle seats.
+        existing_selections_in_row = selection.get(row_idx, [])
+        empty_stack = self.seat_index.middle_out_seats(row_idx, remaining_tickets, existing_selections_in_row)
+        selection[row_idx] = list(sorted(empty_stack + existing_selections_in_row))
+      remaining_tickets -= availability
+    if metrics.enabled:
+      metrics.count("allocate_rows_scanned_total", rows_scanned)
+      metrics.count("allocate_seats_examined_total", seats_examined)
+      metrics.count("allocate_overflow_recursions_total", 1 if remaining_tickets > 0 else 0)
     if remaining_tickets > 0:
       # If need to overflow back to the start row, recurse.
       return self.allocate_seats(remaining_tickets, carryover_selection=selection)
@@ -194,86 +344,252 @@ class Screening:
     :return (booking, message): Booking object representing the found booking and a message illustrating the theatre matrix and occupancy
       Alternatively, if no booking was found, return a None/Falsy value and a "Not Found" message for caller to handle.
     """
+    with self._lock:
+      self.expire_holds()
     booking = self.bookings.get_booking(booking_id, None)
     found_booking_id = ""
     # Message to return to Program when user enters an invalid booking_id
     message = f"Booking id \"{booking_id}\" does not exist!\n"
     if booking:
       found_booking_id = booking.id
+      # Rendered from the latest snapshot, so checking bookings never waits for writers.
       message = f"Booking id: {booking_id}\nSelected seats:\n\n{self.get_theatre(booking.seats)}\n"
     return found_booking_id, message
   
+  @metrics.timed("confirm_booking")
   def confirm_booking(self, booking_id:str):
-    booking = self.bookings.get_booking(booking_id, None)
-    if not booking or booking.confirmed:
-      # Outside the scope of assessment, does not provide scenarios where confirmed bookings can be modified via the required interface.
-      # As such, exceptions will be raised in these scenarios for this assessment.
-      raise Exception(f"Booking {booking_id} cannot be modified!")
-    
-    # Update Booking object
-    booking.confirmed = True
-
-    # Update Screening.theatre matrix with confirmed seats
-    selected_seats = booking.seats
-
-    for row_idx, seats in selected_seats.items():
-      for seat_idx in seats:
-        self.theatre[row_idx][seat_idx] = 1
-    
-    # Update Screening.vacancies
-    self.vacancies -= booking.count
-    
-    return booking.id
+    with self._lock:
+      self.expire_holds()
+      booking = self.bookings.get_booking(booking_id, None)
+      if not booking or booking.confirmed:
+        # Outside the scope of assessment, does not provide scenarios where confirmed bookings can be modified via the required interface.
+        # As such, exceptions will be raised in these scenarios for this assessment.
+        raise Exception(f"Booking {booking_id} cannot be modified!")
+      return self.apply_event({"op": "confirm", "id": booking_id})
+
+  def apply_event(self, event:dict) -> str:
+    """
+    Apply a change to bookings and seats. Every change made by create_booking, change_seats, confirm_booking and hold expiry
+    goes through here and is recorded to the journal if one is attached, so replaying recorded events rebuilds the same state.
+
+    Events have the following shape, with seats as dictionaries of row_idx: [List of seat_idx]:
+    {"op": "create", "count": tickets, "seats": seats}, optionally with the expected "id" when replaying
+    {"op": "change", "id": booking_id, "seats": seats}
+    {"op": "confirm", "id": booking_id}
+    {"op": "expire", "id": booking_id}
+    {"op": "batch", "bookings": [List of (tickets, seats)]}, which creates confirmed bookings, optionally with the expected "ids"
+    :return: ID of the created or modified booking, or list of IDs for batch events.
+    """
+    with self._lock:
+      op = event["op"]
+      if op == "create":
+        booking = self.bookings.create_booking(event["count"], event["seats"])
+        if event.get("id", booking.id) != booking.id:
+          raise Exception(f"Booking {event['id']} was replayed as {booking.id}!")
+        event = dict(event, id=booking.id)
+        self._hold_seats(booking.id, event["seats"])
+        if self.hold_timeout is not None:
+          self.feed.publish(self._state_changes(held=event["seats"]))
+      elif op == "change":
+        booking = self.bookings.get_booking(event["id"])
+        previous_seats = booking.seats
+        self._release_hold(booking.id, previous_seats)
+        self.bookings.update_booking(booking.id, event["seats"])
+        self._hold_seats(booking.id, event["seats"])
+        if self.hold_timeout is not None:
+          self.feed.publish(self._state_changes(freed=previous_seats, held=event["seats"]))
+      elif op == "confirm":
+        # Update Booking object
+        booking = self.bookings.confirm_booking(event["id"])
+        # Held seats are already out of the seat index, the hold just no longer needs to expire.
+        self.hold_scheduler.cancel(booking.id)
+
+        # Update Screening.theatre matrix with confirmed seats
+        selection = booking.seats
+        for row_idx, seats in selection.items():
+          self._occupy_seats(row_idx, seats)
+        
+        # Update Screening.vacancies
+        self.vacancies -= booking.count
+        self._publish_availability()
+        self.feed.publish(self._state_changes(occupied=selection))
+      elif op == "expire":
+        booking = self.bookings.remove_booking(event["id"])
+        # Expired holds are already off the scheduler, except when replaying, but their seats are still held.
+        self.hold_scheduler.cancel(booking.id)
+        for row_idx, seats in booking.seats.items():
+          self.seat_index.release(row_idx, seats)
+        self.feed.publish(self._state_changes(freed=booking.seats))
+      elif op == "batch":
+        created = self.bookings.create_bookings(event["bookings"], confirmed=True)
+        booking_ids = [booking.id for booking in created]
+        if event.get("ids", booking_ids) != booking_ids:
+          raise Exception(f"Bookings {event['ids']} were replayed as {booking_ids}!")
+        event = dict(event, ids=booking_ids)
+
+        # Gather seats per row so each row is marked and re-rendered once for the whole batch.
+        seats_by_row = {}
+        for tickets, selection in event["bookings"]:
+          for row_idx, seats in selection.items():
+            seats_by_row.setdefault(row_idx, []).extend(seats)
+        for row_idx, seats in seats_by_row.items():
+          self._occupy_seats(row_idx, seats)
+        self.vacancies -= sum(tickets for tickets, selection in event["bookings"])
+        self._publish_availability()
+        self.feed.publish(self._state_changes(occupied=seats_by_row))
+
+        if self.journal is not None:
+          self.journal.record(event)
+        return booking_ids
+      else:
+        raise Exception(f"Unknown booking event {op}!")
+
+      if self.journal is not None:
+        self.journal.record(event)
+      return booking.id
+
+  def apply_events(self, events):
+    """
+    Apply events in turn as apply_event does, e.g. when replaying a journal, publishing one availability snapshot once all are applied.
+    :param events: Iterable of events, see apply_event.
+    """
+    with self._lock:
+      self._defer_publishing = True
+      try:
+        for event in events:
+          self.apply_event(event)
+      finally:
+        self._defer_publishing = False
+        self._publish_availability()
+
+  def _occupy_seats(self, row_idx:int, seats:list[int]):
+    """
+    Mark confirmed seats in the theatre matrix and keep the seat index in sync. The row is re-rendered once published.
+    """
+    self.theatre.mark(row_idx, seats)
+    self.seat_index.take(row_idx, seats)
+    self._unpublished_rows.add(row_idx)
+
+  def _publish_availability(self):
+    """
+    Publish a new AvailabilitySnapshot with the rows occupied since the last one.
+    """
+    if self._defer_publishing:
+      return
+    changed_rows = {row_idx: bytes(self.theatre[row_idx]) for row_idx in self._unpublished_rows}
+    self._unpublished_rows.clear()
+    self.availability = self.availability.publish(self.title, self.vacancies, changed_rows)
+
+  def _state_changes(self, freed:dict=None, held:dict=None, occupied:dict=None) -> dict:
+    """
+    New states of seats changed by an event, for Screening.feed. Seats both freed and held, e.g. when a booking moves by one seat,
+    are reported as held.
+    :return: Dictionary of row_idx: {seat_idx: state}
+    """
+    states = {}
+    for selection, state in [(freed, FREE), (held, HELD), (occupied, OCCUPIED)]:
+      for row_idx, seats in (selection or {}).items():
+        row_states = states.setdefault(row_idx, {})
+        for seat in seats:
+          row_states[seat] = state
+    return states
+
+  def _seat_states(self) -> list[str]:
+    """
+    State of every seat as one string per row, e.g. "..hh#.", for snapshots of Screening.feed.
+    """
+    rows = []
+    for row_idx in range(self.rows):
+      mask = self.seat_index.row_masks[row_idx]
+      rows.append("".join([
+        OCCUPIED if seat else (FREE if mask >> seat_idx & 1 else HELD) for seat_idx, seat in enumerate(self.theatre[row_idx])
+      ]))
+    return rows
+
+  def subscribe(self, since:int=None, limit:int=256):
+    """
+    Subscribe to changes of seat states, e.g. to keep a kiosk's seat map current without fetching the whole map on every change.
+    :param since: Sequence number the subscriber has seen up to, to resume from. A snapshot is sent first if it is None or too old.
+    :param limit: Messages kept waiting for the subscriber before they are coalesced.
+    :return: cinema.feed.Subscription
+    """
+    with self._lock:
+      return self.feed.subscribe(since, limit)
+
+  def _hold_seats(self, booking_id:str, selection:dict):
+    """
+    In concurrent booking mode, remove seats from the seat index as soon as they are allocated and schedule the hold to expire.
+    """
+    if self.hold_timeout is None:
+      return
+    for row_idx, seats in selection.items():
+      self.seat_index.take(row_idx, seats)
+    if not self.hold_scheduler:
+      self._hold_added.set()
+    self.hold_scheduler.schedule(booking_id, self._clock() + self.hold_timeout)
+
+  def _release_hold(self, booking_id:str, selection:dict):
+    if self.hold_scheduler.cancel(booking_id) is None:
+      return
+    for row_idx, seats in selection.items():
+      self.seat_index.release(row_idx, seats)
+
+  def expire_holds(self) -> list[str]:
+    """
+    Release seats of unconfirmed bookings whose hold has run out. Expired bookings are removed and can no longer be confirmed.
+    Holds which were confirmed or renewed by a seat change are no longer due, so only expired holds are visited.
+    :return: IDs of expired bookings.
+    """
+    with self._lock:
+      expired = self.hold_scheduler.pop_due(self._clock())
+      for booking_id in expired:
+        self.apply_event({"op": "expire", "id": booking_id})
+      return expired
+
+  def seat_labels(self, selection:dict) -> list[str]:
+    """
+    List seats in a selection as labels, e.g. ["B03", "B04"], ordered by row then seat.
+    """
+    return self.codec.selection_to_labels(selection)
 
   def _count_empty_seats(self) -> int:
     """
     Iterate through matrix to count seats identified as unoccupied.
-    O(rows * spr) time complexity may cause slowdown of program for large theatres.
+    O(rows * spr) time complexity may cause slowdown of program for large theatres, although the "bytes" backend counts in C.
     """
-    count = 0
-    for row in self.theatre:
-      count += row.count(0)
-    return count
+    return self.theatre.count_free()
   
   def row_to_alpha_row(self, row:int) -> str:
-    alpha_row = ""
-    while row > 25:
-      alpha_row += chr(row % 26 + 65)
-      row -= 26
-    alpha_row += chr(row + 65)
-    return alpha_row
+    """
+    Row label, e.g. 0 -> "A", 26 -> "AA", 27 -> "BB". See SeatCodec.
+    """
+    return self.codec.row_label(row)
   
   def alpha_row_to_row(self, alpha_row:str) -> int:
-    row = (len(alpha_row) - 1) * 26
-    for char in alpha_row.upper():
-      row += ord(char) - 65
-    return row
+    """
+    Inverse of row_to_alpha_row, or -1 if alpha_row is not a row label.
+    """
+    return self.codec.row_index(alpha_row)
   
   def seat_to_row_coord(self, alpha_row:str, seat_num:str) -> tuple[int, int]:
     """
     :param alpha_row: Capitalized string of alphabets
     :param seat_num: Numeric, preferably integer, representing 1-index of seat number in the row.
     """
-    seat = int(seat_num) - 1
-    row = self.alpha_row_to_row(alpha_row)
-    
-    return (row, seat)
+    return (self.codec.row_index(alpha_row), int(seat_num) - 1)
   
   def row_coord_to_seat(self, row:int, seat:int) -> tuple[str, str]:
     """
     :param row: 0-index of row in theatre matrix.
     :param seat: 0-index of seat in theatre matrix.
+    :return: Row label and 1-index seat number padded to 2 digits, e.g. (1, 2) -> ("B", "03"), the inverse of seat_to_row_coord.
+      Earlier versions returned the 0-index seat number, e.g. ("B", "02"), which seat_to_row_coord read as the seat before.
+      Callers passing the result on to change_seats or seat_to_row_coord, as the benchmarks do, rely on the 1-index number.
     """
-    alpha_row = self.row_to_alpha_row(row)
-    
-    seat_num = str(seat)
-    if seat < 10:
-      seat_num = "0" + seat_num
-    
-    return (alpha_row, seat_num)
+    return (self.codec.row_label(row), self.codec.seat_number(seat))
   
   def check_valid_coord(self, row:int, seat:int) -> bool:
-    return row < self.rows and seat < self.spr
+    return 0 <= row < self.rows and 0 <= seat < self.spr
   
   def check_valid_seat(self, alpha_row:str, seat_num:str) -> bool:
     row, seat = self.seat_to_row_coord(alpha_row, seat_num)
@@ -0,0 +1,340 @@
+class FreeRunTree:
+  def __init__(self, spr:int, mask:int):
+    """
+    Segment tree over the seats of one row, storing for each node the free run at its start, the free run at its end and its
+    longest free run, so contiguous blocks of free seats are found in O(log spr) rather than by scanning the row.
+
+    Nodes are stored in lists indexed from 1, with the children of node n at 2n and 2n + 1 and the seats as leaves from node size.
+    Leaves past the end of the row are treated as taken, so runs never extend beyond it.
+    """
+    self.spr = spr
+    self.size = 1 << max(spr - 1, 0).bit_length()
+    self.prefix = [0] * (2 * self.size)
+    self.suffix = [0] * (2 * self.size)
+    self.longest = [0] * (2 * self.size)
+    self.rebuild(mask)
+
+  def rebuild(self, mask:int):
+    size = self.size
+    for seat in range(self.spr):
+      self.prefix[size + seat] = self.suffix[size + seat] = self.longest[size + seat] = mask >> seat & 1
+    for seat in range(self.spr, size):
+      self.prefix[size + seat] = self.suffix[size + seat] = self.longest[size + seat] = 0
+    for node in reversed(range(1, size)):
+      self._combine(node)
+
+  def update(self, seat:int, free:bool):
+    node = self.size + seat
+    self.prefix[node] = self.suffix[node] = self.longest[node] = 1 if free else 0
+    node >>= 1
+    while node:
+      self._combine(node)
+      node >>= 1
+
+  def _combine(self, node:int):
+    # Children of node n each span half of its seats, size >> bit_length(n) seats.
+    half = self.size >> node.bit_length()
+    left, right = 2 * node, 2 * node + 1
+    prefix, suffix = self.prefix, self.suffix
+    prefix[node] = prefix[left] + prefix[right] if prefix[left] == half else prefix[left]
+    suffix[node] = suffix[right] + suffix[left] if suffix[right] == half else suffix[right]
+    self.longest[node] = max(self.longest[left], self.longest[right], suffix[left] + prefix[right])
+
+  def longest_run(self) -> tuple[int, int]:
+    """
+    :return: (start, length) of the left-most longest run of free seats, or (-1, 0) if the row is full.
+    """
+    length = self.longest[1]
+    if length == 0:
+      return -1, 0
+    node = 1
+    while node < self.size:
+      left, right = 2 * node, 2 * node + 1
+      if self.longest[left] == length:
+        node = left
+      elif self.suffix[left] + self.prefix[right] == length:
+        # Run straddles the children, starting within the left child's trailing run.
+        return self._node_end(left) - self.suffix[left], length
+      else:
+        node = right
+    return node - self.size, length
+
+  def first_fit(self, count:int, start:int=0) -> int:
+    """
+    :return: Lowest seat s >= start such that count seats from s are free, or -1 if there is none.
+    """
+    end, carry = self._first_fit(1, 0, self.size, start, count, 0)
+    return end - count + 1 if end >= 0 else -1
+
+  def last_fit(self, count:int, end:int) -> int:
+    """
+    :return: Highest seat s such that count seats from s are free and end within the first end seats, or -1 if there is none.
+    """
+    return self._last_fit(1, 0, self.size, end, count, 0)[0]
+
+  def _first_fit(self, node:int, lo:int, hi:int, start:int, count:int, carry:int) -> tuple[int, int]:
+    """
+    Walk nodes left to right from start, carrying the length of the free run reaching the current node.
+    :return: (last seat of the first block of count free seats or -1, free run reaching the end of the node)
+    """
+    if hi <= start:
+      return -1, 0
+    if lo >= start:
+      if carry + self.prefix[node] >= count:
+        return lo + count - carry - 1, 0
+      if self.longest[node] < count:
+        return -1, carry + hi - lo if self.prefix[node] == hi - lo else self.suffix[node]
+    mid = (lo + hi) // 2
+    end, carry = self._first_fit(2 * node, lo, mid, start, count, carry)
+    if end >= 0:
+      return end, 0
+    return self._first_fit(2 * node + 1, mid, hi, start, count, carry)
+
+  def _last_fit(self, node:int, lo:int, hi:int, end:int, count:int, carry:int) -> tuple[int, int]:
+    """
+    Mirror of _first_fit, walking nodes right to left from end and carrying the free run reaching the start of the current node.
+    :return: (first seat of the last block of count free seats or -1, free run reaching the start of the node)
+    """
+    if lo >= end:
+      return -1, 0
+    if hi <= end:
+      if carry + self.suffix[node] >= count:
+        return hi - count + carry, 0
+      if self.longest[node] < count:
+        return -1, carry + hi - lo if self.suffix[node] == hi - lo else self.prefix[node]
+    mid = (lo + hi) // 2
+    start, carry = self._last_fit(2 * node + 1, mid, hi, end, count, carry)
+    if start >= 0:
+      return start, 0
+    return self._last_fit(2 * node, lo, mid, end, count, carry)
+
+  def _node_end(self, node:int) -> int:
+    span = self.size >> (node.bit_length() - 1)
+    return (node - (1 << (node.bit_length() - 1))) * span + span
+
+class FreeSeatIndex:
+  def __init__(self, rows, spr):
+    """
+    Index of seats that are still available for allocation in a theatre.
+
+    Each row is stored as an integer bitmask where bit n is set when seat n is free, alongside a cached free count per row.
+    A further bitmask over rows marks rows with at least one free seat, so full rows can be skipped without being visited.
+    Bit operations on Python integers run in C, so finding the next free seat or row does not require a Python-level scan.
+    """
+    self.rows = rows
+    self.spr = spr
+    self.full_row = (1 << spr) - 1
+    self.row_masks = [self.full_row] * rows
+    self.row_free = [spr] * rows
+    self.free_rows = (1 << rows) - 1 if spr > 0 else 0
+    self.free = rows * spr
+    self._walk = None
+    # row: [mask, free seats, walk order or None], see row_view.
+    self._row_views = {}
+    # row: FreeRunTree, built the first time a row is asked for contiguous blocks and kept up to date from then on.
+    self._run_trees = {}
+    # Functions called with the index of each row whose free seats change, e.g. to drop caches derived from the row.
+    self.row_watchers = []
+
+  def free_count(self, row:int) -> int:
+    return self.row_free[row]
+
+  def iter_free_rows(self, start:int=0):
+    """
+    Yield indexes of rows with at least one free seat, from the start row towards the screen.
+    """
+    start = max(start, 0)
+    remaining_rows = self.free_rows >> start
+    while remaining_rows:
+      lowest = remaining_rows & -remaining_rows
+      yield start + lowest.bit_length() - 1
+      remaining_rows ^= lowest
+
+  def free_seats(self, row:int, start:int=0, limit:int=-1) -> list[int]:
+    """
+    List free seat indexes in a row from the start seat onwards, in ascending order.
+    :param limit: Maximum number of seats to return. Negative values return all free seats.
+    """
+    mask = self.row_masks[row] >> start << start
+    seats = []
+    while mask and limit != 0:
+      lowest = mask & -mask
+      seats.append(lowest.bit_length() - 1)
+      mask ^= lowest
+      limit -= 1
+    return seats
+
+  def middle_out_seats(self, row:int, count:int, exclude:list[int]=None) -> list[int]:
+    """
+    Pick up to count free seats in a row, walking outwards from the middle of the row.
+
+    Even rows check the middle-left seat first, then alternate right and left. Odd rows check the middle seat first, then alternate left and right.
+    The walk stops as soon as either side runs past the edge of the row, so the right-most seat is never reached by the walk.
+    :param exclude: Seats which should be treated as unavailable, e.g. seats already selected in the row.
+    """
+    # Both parities share the starting seats, only the side checked first differs.
+    left_start = self.spr // 2 - 1
+    right_start = self.spr // 2
+    left_first = self.spr % 2 == 0
+
+    # Drop the right-most seat as the walk ends once the left side is exhausted, before it can be checked.
+    eligible = self.row_masks[row] & (self.full_row >> 1)
+    for seat in exclude or []:
+      eligible &= ~(1 << seat)
+    left_mask = eligible & ((1 << (left_start + 1)) - 1) if left_start >= 0 else 0
+    right_mask = eligible >> right_start << right_start
+
+    seats = []
+    left_seat = left_mask.bit_length() - 1 if left_mask else -1
+    right_seat = (right_mask & -right_mask).bit_length() - 1 if right_mask else -1
+    while len(seats) < count and (left_seat >= 0 or right_seat >= 0):
+      # Walk order rank of a seat is twice its distance from its side's starting seat, plus one for the side checked second.
+      left_rank = 2 * (left_start - left_seat) + (0 if left_first else 1) if left_seat >= 0 else None
+      right_rank = 2 * (right_seat - right_start) + (1 if left_first else 0) if right_seat >= 0 else None
+      if right_rank is None or (left_rank is not None and left_rank < right_rank):
+        seats.append(left_seat)
+        left_mask ^= 1 << left_seat
+        left_seat = left_mask.bit_length() - 1 if left_mask else -1
+      else:
+        seats.append(right_seat)
+        right_mask ^= 1 << right_seat
+        right_seat = (right_mask & -right_mask).bit_length() - 1 if right_mask else -1
+    return seats
+
+  def walk_order(self, row:int) -> list[int]:
+    """
+    List all free seats in a row in the order middle_out_seats would pick them.
+    """
+    if self._walk is None:
+      # The walk over an empty row only depends on the row width, so it is worked out once.
+      self._walk = self._full_walk()
+    mask = self.row_masks[row]
+    return [seat for seat in self._walk if mask >> seat & 1]
+
+  def row_view(self, row:int, walk:bool=False) -> tuple[list[int], list[int]]:
+    """
+    Free seats of a row in ascending order and, if walk is set, in walk order, for callers which look at the same rows repeatedly.
+    Views are cached against the row's mask, so they are reused for as long as the row is unchanged, or once it returns to the same
+    seats, e.g. when a held booking releases its seats to try another position. The returned lists must not be modified.
+    :return: (free seats, walk order), with walk order None unless requested.
+    """
+    mask = self.row_masks[row]
+    view = self._row_views.get(row)
+    if view is None or view[0] != mask:
+      view = self._row_views[row] = [mask, self.free_seats(row), None]
+    if walk and view[2] is None:
+      view[2] = self.walk_order(row)
+    return view[1], view[2]
+
+  def run_tree(self, row:int) -> FreeRunTree:
+    tree = self._run_trees.get(row)
+    if tree is None:
+      tree = self._run_trees[row] = FreeRunTree(self.spr, self.row_masks[row])
+    return tree
+
+  def largest_block(self, row:int) -> tuple[int, int]:
+    """
+    :return: (start, length) of the left-most largest block of free seats in a row, or (-1, 0) if the row is full.
+    """
+    return self.run_tree(row).longest_run()
+
+  def can_seat_together(self, row:int, count:int) -> bool:
+    return 0 < count <= self.row_free[row] and self.run_tree(row).longest[1] >= count
+
+  def middle_block(self, row:int, count:int) -> int:
+    """
+    Find the block of count free seats in a row nearest to the middle, i.e. starting nearest to (spr - count) // 2.
+    When blocks either side of the middle are equally near, the left block is picked, as odd-numbered groups round down the mid index.
+    :return: First seat of the block, or -1 if count seats cannot sit together in the row.
+    """
+    if not self.can_seat_together(row, count):
+      return -1
+    tree = self.run_tree(row)
+    middle = (self.spr - count) // 2
+    left = tree.last_fit(count, middle + count)
+    right = tree.first_fit(count, middle)
+    if right < 0 or (left >= 0 and middle - left <= right - middle):
+      return left
+    return right
+
+  def together_block(self, count:int, start:int=0) -> tuple[int, int]:
+    """
+    Find a block of count free seats in one row, in the row furthest from the screen that has one, nearest to the middle of that row.
+    Rows with fewer than count free seats in total are skipped without looking at their trees.
+    :return: (row, first seat), or None if count seats cannot sit together in any row.
+    """
+    if count < 1 or count > self.spr:
+      return None
+    for row in self.iter_free_rows(start):
+      if self.row_free[row] >= count:
+        seat = self.middle_block(row, count)
+        if seat >= 0:
+          return row, seat
+    return None
+
+  def _full_walk(self) -> list[int]:
+    """
+    Seats of an empty row in walk order, pairing seats at the same distance from the starting seats on either side.
+    """
+    left_start = self.spr // 2 - 1
+    right_start = self.spr // 2
+    walk = []
+    for distance in range(right_start + 1):
+      sides = [left_start - distance, right_start + distance]
+      if self.spr % 2 == 1:
+        sides.reverse()
+      walk += [seat for seat in sides if 0 <= seat < self.spr - 1]
+    return walk
+
+  def take(self, row:int, seats:list[int]):
+    """
+    Mark seats in a row as no longer free. Seats which are already taken are ignored.
+    """
+    taken = 0
+    for seat in seats:
+      taken |= 1 << seat
+    self._set_row(row, self.row_masks[row] & ~taken)
+
+  def release(self, row:int, seats:list[int]):
+    """
+    Mark seats in a row as free again. Seats which are already free are ignored.
+    """
+    mask = self.row_masks[row]
+    for seat in seats:
+      mask |= 1 << seat
+    self._set_row(row, mask)
+
+  def set_free(self, row:int, seats:list[int]):
+    """
+    Replace the free seats of a row, e.g. when rebuilding the index from a restored theatre matrix.
+    """
+    mask = 0
+    for seat in seats:
+      mask |= 1 << seat
+    self._set_row(row, mask)
+
+  def _set_row(self, row:int, mask:int):
+    if mask == self.row_masks[row]:
+      return
+    tree = self._run_trees.get(row)
+    if tree is not None:
+      changed = self.row_masks[row] ^ mask
+      if changed.bit_count() > tree.size // 8:
+        # Many seats at once, e.g. a whole row restored, is cheaper to rebuild than to update seat by seat.
+        tree.rebuild(mask)
+        changed = 0
+      while changed:
+        lowest = changed & -changed
+        seat = lowest.bit_length() - 1
+        tree.update(seat, mask >> seat & 1)
+        changed ^= lowest
+    free = mask.bit_count()
+    self.free += free - self.row_free[row]
+    self.row_masks[row] = mask
+    self.row_free[row] = free
+    if free:
+      self.free_rows |= 1 << row
+    else:
+      self.free_rows &= ~(1 << row)
+    for watcher in self.row_watchers:
+      watcher(row)
@@ -0,0 +1,338 @@
+"""
+Screening state kept in a memory-mapped file, so several worker processes can serve the same screening.
+
+The file holds a header of counters, the occupancy matrix, a table of bookings, their packed seats (see cinema.booking.pack_seats)
+and a ring of recently changed rows. Vacancies and seat states are read straight from the mapping without copying or locking.
+Changes are made under an exclusive flock on the file, combined with a thread lock, so every seat claim checks and writes
+the seats it claims as one step across all processes. Requires a platform with fcntl, e.g. Linux or macOS.
+"""
+from array import array
+from contextlib import contextmanager
+import fcntl
+import mmap
+import threading
+
+from cinema.booking import Booking, pack_seats, unpack_seats
+from cinema.screening import Screening
+
+MAGIC = 0x47494353
+# Header fields, each an unsigned 64-bit integer.
+(H_MAGIC, H_ROWS, H_SPR, H_BOOKING_CAPACITY, H_SEAT_CAPACITY, H_VACANCIES, H_FREE, H_BOOKINGS, H_SEATS_USED, H_SEQUENCE,
+ H_TITLE_LENGTH) = range(11)
+HEADER_FIELDS = 16
+TITLE_BYTES = 256
+# Rows changed by the last RING_SIZE changes are kept, so processes which fall further behind than that reload every row.
+RING_SIZE = 4096
+
+# Occupancy values are 0 when free, the booking number while held and the booking number with CONFIRMED set once confirmed.
+CONFIRMED = 1 << 31
+# Booking table columns, each an unsigned 32-bit integer.
+B_COUNT, B_STATUS, B_SEATS_START, B_SEATS_END = range(4)
+BOOKING_FIELDS = 4
+HELD, CONFIRMED_STATUS = 1, 2
+
+class SharedScreening:
+  def __init__(self, path:str):
+    """
+    Attach to a screening created with SharedScreening.create, e.g. from a worker process.
+
+    Each process keeps a local Screening mirroring the shared seats, used to allocate seats by the same rules as
+    Screening.create_booking in hold mode and to render seat maps. Rows changed by other processes are read into the mirror
+    from the ring of changed rows when this process next takes the lock or renders.
+    Unlike Screening, holds do not expire: seats stay claimed until confirmed.
+    """
+    self.path = path
+    self._file = open(path, "r+b")
+    self._mmap = mmap.mmap(self._file.fileno(), 0)
+    view = memoryview(self._mmap)
+    self.header = view[:HEADER_FIELDS * 8].cast("Q")
+    if self.header[H_MAGIC] != MAGIC:
+      raise Exception(f"{path} is not a shared screening!")
+    self.rows = rows = self.header[H_ROWS]
+    self.spr = spr = self.header[H_SPR]
+    booking_capacity = self.header[H_BOOKING_CAPACITY]
+    seat_capacity = self.header[H_SEAT_CAPACITY]
+    offset = HEADER_FIELDS * 8
+    self.title = bytes(view[offset:offset + self.header[H_TITLE_LENGTH]]).decode()
+    offset += TITLE_BYTES
+    self.occupancy = view[offset:offset + rows * spr * 4].cast("I")
+    offset += rows * spr * 4
+    self.booking_table = view[offset:offset + booking_capacity * BOOKING_FIELDS * 4].cast("I")
+    offset += booking_capacity * BOOKING_FIELDS * 4
+    self.seat_data = view[offset:offset + seat_capacity * 4].cast("I")
+    offset += seat_capacity * 4
+    self.changed_rows = view[offset:offset + RING_SIZE * 4].cast("I")
+
+    self.local = Screening(self.title, rows, spr)
+    # Sequence number of the last change read into the local mirror.
+    self._seen = 0
+    self._thread_lock = threading.RLock()
+    self._lock_depth = 0
+    with self._locked():
+      self._sync()
+
+  @classmethod
+  def create(cls, path:str, title:str, rows:int, spr:int, booking_capacity:int=None, seat_capacity:int=None) -> "SharedScreening":
+    """
+    Create the file for a new screening and attach to it.
+    :param booking_capacity: Most bookings the screening can issue. Defaults to one per seat.
+    :param seat_capacity: Size of the packed seats area in unsigned ints. Each booking and seat change appends its seats,
+      so the default leaves room for every seat to be booked and then changed a few times.
+    """
+    booking_capacity = booking_capacity or max(rows * spr, 1)
+    seat_capacity = seat_capacity or 4 * (rows * spr + 2 * booking_capacity)
+    encoded_title = title.encode()[:TITLE_BYTES]
+    header = array("Q", [0] * HEADER_FIELDS)
+    header[H_MAGIC] = MAGIC
+    header[H_ROWS], header[H_SPR] = rows, spr
+    header[H_BOOKING_CAPACITY], header[H_SEAT_CAPACITY] = booking_capacity, seat_capacity
+    header[H_VACANCIES] = header[H_FREE] = rows * spr
+    header[H_TITLE_LENGTH] = len(encoded_title)
+    size = HEADER_FIELDS * 8 + TITLE_BYTES + 4 * (rows * spr + booking_capacity * BOOKING_FIELDS + seat_capacity + RING_SIZE)
+    with open(path, "wb") as shared_file:
+      shared_file.write(header.tobytes() + encoded_title.ljust(TITLE_BYTES, b"\0"))
+      shared_file.truncate(size)
+    return cls(path)
+
+  def close(self):
+    for view in [self.header, self.occupancy, self.booking_table, self.seat_data, self.changed_rows]:
+      view.release()
+    self._mmap.close()
+    self._file.close()
+
+  @contextmanager
+  def _locked(self):
+    """
+    Exclusive access to the shared state, across threads of this process and across processes.
+    Re-entrant within a thread, as flock does not count nested locks on the same file.
+    """
+    with self._thread_lock:
+      if self._lock_depth == 0:
+        fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+      self._lock_depth += 1
+      try:
+        yield
+      finally:
+        self._lock_depth -= 1
+        if self._lock_depth == 0:
+          fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+
+  def _sync(self):
+    """
+    Read rows changed since the last sync into the local mirror. Must be called while holding the lock.
+    """
+    sequence = self.header[H_SEQUENCE]
+    if sequence == self._seen:
+      return
+    if sequence - self._seen > RING_SIZE:
+      rows = range(self.rows)
+    else:
+      rows = {self.changed_rows[change % RING_SIZE] for change in range(self._seen, sequence)}
+    local = self.local
+    spr = self.spr
+    for row in rows:
+      seats = self.occupancy[row * spr:(row + 1) * spr].tolist()
+      local.seat_index.set_free(row, [seat for seat, value in enumerate(seats) if value == 0])
+      confirmed = [seat for seat, value in enumerate(seats) if value & CONFIRMED]
+      if confirmed:
+        local.theatre.mark(row, confirmed)
+        local._unpublished_rows.add(row)
+    local.vacancies = self.header[H_VACANCIES]
+    local._publish_availability()
+    self._seen = sequence
+
+  def _record_change(self, rows):
+    sequence = self.header[H_SEQUENCE]
+    for row in rows:
+      self.changed_rows[sequence % RING_SIZE] = row
+      sequence += 1
+    self.header[H_SEQUENCE] = sequence
+
+  def _booking_number(self, booking_id:str) -> int:
+    """
+    :return: Number of a booking ID issued by this screening, e.g. 12 for GIC0012, or 0 if there is no such booking.
+    """
+    if not isinstance(booking_id, str) or not booking_id.startswith("GIC") or not booking_id[3:].isdigit():
+      return 0
+    number = int(booking_id[3:])
+    return number if 0 < number <= self.header[H_BOOKINGS] and f"GIC{number:04d}" == booking_id else 0
+
+  def _booking_seats(self, number:int) -> dict:
+    record = (number - 1) * BOOKING_FIELDS
+    return unpack_seats(self.seat_data, self.booking_table[record + B_SEATS_START], self.booking_table[record + B_SEATS_END])
+
+  def _claim_seats(self, number:int, selection:dict):
+    """
+    Claim free seats for a held booking and store them as its seats, failing without changes if any seat was claimed already.
+    """
+    spr = self.spr
+    for row_idx, seats in selection.items():
+      if any(self.occupancy[row_idx * spr + seat] for seat in seats):
+        raise Exception(f"Seats in row {row_idx} were claimed by another booking!")
+    packed = pack_seats(selection)
+    start = self.header[H_SEATS_USED]
+    if start + len(packed) > self.header[H_SEAT_CAPACITY]:
+      raise Exception("Shared screening has no space left for booking seats!")
+    self.seat_data[start:start + len(packed)] = packed
+    self.header[H_SEATS_USED] = start + len(packed)
+    record = (number - 1) * BOOKING_FIELDS
+    self.booking_table[record + B_SEATS_START] = start
+    self.booking_table[record + B_SEATS_END] = start + len(packed)
+    self._hold_seats(number, selection)
+
+  def _hold_seats(self, number:int, selection:dict):
+    """
+    Mark seats as held by a booking, without changing the seats stored for it.
+    """
+    spr = self.spr
+    held = 0
+    for row_idx, seats in selection.items():
+      for seat in seats:
+        self.occupancy[row_idx * spr + seat] = number
+      held += len(seats)
+    self.header[H_FREE] -= held
+    self._record_change(selection)
+
+  def _release_seats(self, selection:dict):
+    spr = self.spr
+    released = 0
+    for row_idx, seats in selection.items():
+      for seat in seats:
+        self.occupancy[row_idx * spr + seat] = 0
+      released += len(seats)
+    self.header[H_FREE] += released
+    self._record_change(selection)
+
+  def get_vacancy(self) -> int:
+    return self.header[H_VACANCIES]
+
+  def get_available(self) -> int:
+    """
+    Seats a new booking can be given, i.e. neither held nor confirmed.
+    """
+    return self.header[H_FREE]
+
+  def get_title_availability(self) -> str:
+    vacancies = self.get_vacancy()
+    return f"{self.title} ({vacancies} {'seat' if vacancies == 1 else 'seats'} available)"
+
+  def is_free(self, row:int, seat:int) -> bool:
+    """
+    Whether a seat is neither held nor confirmed, read from the mapping without locking.
+    """
+    return self.occupancy[row * self.spr + seat] == 0
+
+  def create_booking(self, tickets:int, together:bool=False) -> str:
+    """
+    Claim seats for a number of tickets by the same rules as Screening.create_booking, holding them until confirmed.
+    :return: ID of the created booking or Falsy string if unable to create booking.
+    """
+    with self._locked():
+      self._sync()
+      if tickets < 1 or tickets > self.header[H_FREE]:
+        return ""
+      number = self.header[H_BOOKINGS] + 1
+      if number > self.header[H_BOOKING_CAPACITY]:
+        raise Exception("Shared screening has no space left for bookings!")
+      block = self.local.seat_index.together_block(tickets) if together else None
+      if block:
+        row_idx, seat = block
+        selection = {row_idx: list(range(seat, seat + tickets))}
+      else:
+        selection = self.local.allocation_plans.get(tickets)
+      record = (number - 1) * BOOKING_FIELDS
+      self.booking_table[record + B_COUNT] = tickets
+      self._claim_seats(number, selection)
+      self.booking_table[record + B_STATUS] = HELD
+      self.header[H_BOOKINGS] = number
+      self._sync()
+      return f"GIC{number:04d}"
+
+  def change_seats(self, booking_id:str, alpha_row:str, seat_num:str) -> str:
+    """
+    Move an unconfirmed booking by the same rules as Screening.change_seats.
+    """
+    row, seat = self.local.seat_to_row_coord(alpha_row, seat_num)
+    if not self.local.check_valid_coord(row, seat):
+      raise Exception(f"\"{alpha_row}{seat_num}\" is not a valid seat number!")
+    with self._locked():
+      self._sync()
+      number = self._booking_number(booking_id)
+      record = (number - 1) * BOOKING_FIELDS
+      if not number or self.booking_table[record + B_STATUS] != HELD:
+        raise Exception(f"Booking {booking_id} cannot be modified!")
+      old_seats = self._booking_seats(number)
+      self._release_seats(old_seats)
+      self._sync()
+      try:
+        self._claim_seats(number, self.local._reseat(self.booking_table[record + B_COUNT], row, seat))
+      except Exception:
+        # Nothing was claimed, and no other process can claim the released seats while the lock is held, so the booking
+        # takes back its old seats, which are still stored as its seats.
+        self._hold_seats(number, old_seats)
+        raise
+      finally:
+        self._sync()
+      return booking_id
+
+  def confirm_booking(self, booking_id:str) -> str:
+    with self._locked():
+      self._sync()
+      number = self._booking_number(booking_id)
+      record = (number - 1) * BOOKING_FIELDS
+      if not number or self.booking_table[record + B_STATUS] != HELD:
+        raise Exception(f"Booking {booking_id} cannot be modified!")
+      selection = self._booking_seats(number)
+      spr = self.spr
+      for row_idx, seats in selection.items():
+        for seat in seats:
+          self.occupancy[row_idx * spr + seat] = number | CONFIRMED
+      self.booking_table[record + B_STATUS] = CONFIRMED_STATUS
+      self.header[H_VACANCIES] -= self.booking_table[record + B_COUNT]
+      self._record_change(selection)
+      self._sync()
+      return booking_id
+
+  def get_booking(self, booking_id:str, fallback=None) -> Booking:
+    """
+    :return: Copy of a booking as a Booking object, or fallback if there is no such booking.
+    """
+    with self._locked():
+      number = self._booking_number(booking_id)
+      if not number:
+        return fallback
+      record = (number - 1) * BOOKING_FIELDS
+      return Booking(
+        booking_id, self.booking_table[record + B_COUNT], self._booking_seats(number),
+        self.booking_table[record + B_STATUS] == CONFIRMED_STATUS
+      )
+
+  def get_theatre(self, selection=None) -> str:
+    """
+    Same output as Screening.get_theatre, rendered from this process's mirror once it has caught up with other processes.
+    """
+    with self._locked():
+      self._sync()
+    return self.local.availability.get_theatre(selection)
+
+  def iter_theatre(self, selection=None, rows:range=None, columns:range=None, context:int=None):
+    with self._locked():
+      self._sync()
+    return self.local.availability.iter_theatre(selection, rows, columns, context)
+
+  def check_no_double_allocation(self) -> int:
+    """
+    Check every booking's seats are marked with its number and no seat is marked for any other booking.
+    :return: Number of seats claimed.
+    """
+    with self._locked():
+      claimed = 0
+      for number in range(1, self.header[H_BOOKINGS] + 1):
+        for row_idx, seats in self._booking_seats(number).items():
+          for seat in seats:
+            if self.occupancy[row_idx * self.spr + seat] & ~CONFIRMED != number:
+              raise AssertionError(f"Seat {(row_idx, seat)} of GIC{number:04d} is marked for another booking!")
+          claimed += len(seats)
+      if claimed != self.rows * self.spr - self.header[H_FREE]:
+        raise AssertionError(f"{claimed} seats belong to bookings but {self.rows * self.spr - self.header[H_FREE]} are claimed!")
+      return claimed
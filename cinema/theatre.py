@@ -0,0 +1,105 @@
+from itertools import compress
+
+# Translation table mapping unoccupied seats (0) to 1 and any other state to 0.
+_FREE_FLAGS = bytes([1] + [0] * 255)
+
+class ListTheatre(list):
+  def __init__(self, rows, spr):
+    """
+    Default theatre matrix, stored as a list of rows where each row is a list of seat states.
+
+    Seats are 0 when unoccupied and 1 when occupied by a confirmed booking.
+    """
+    super().__init__(spr * [0] for i in range(rows))
+    self.rows = rows
+    self.spr = spr
+
+  def count_free(self, row:int=None) -> int:
+    """
+    Count unoccupied seats in a row, or in the whole theatre if no row is given.
+    """
+    if row is not None:
+      return self[row].count(0)
+    return sum(seats.count(0) for seats in self)
+
+  def free_seats(self, row:int, start:int=0) -> list[int]:
+    return [seat_idx for seat_idx, seat in enumerate(self[row][start:], start) if seat == 0]
+
+  def mark(self, row:int, seats:list[int], value:int=1):
+    seats_in_row = self[row]
+    for seat_idx in seats:
+      seats_in_row[seat_idx] = value
+
+  def dump(self) -> bytes:
+    """
+    Serialize seat states row after row, one byte per seat.
+    """
+    return b"".join(bytes(seats) for seats in self)
+
+  def load(self, data:bytes):
+    for row in range(self.rows):
+      self[row][:] = data[row * self.spr:(row + 1) * self.spr]
+
+class ByteTheatre:
+  def __init__(self, rows, spr):
+    """
+    Compact theatre matrix, stored as one contiguous bytearray with a byte per seat, row after row.
+
+    Indexing a row returns a memoryview over that row's slice of the buffer, so seats can be read and written as with ListTheatre.
+    Counting and bulk marking operate on the buffer directly instead of visiting each seat in Python.
+    """
+    self.rows = rows
+    self.spr = spr
+    self.buffer = bytearray(rows * spr)
+    self._view = memoryview(self.buffer)
+
+  def __len__(self) -> int:
+    return self.rows
+
+  def __getitem__(self, row:int) -> memoryview:
+    if row < 0:
+      row += self.rows
+    if not 0 <= row < self.rows:
+      raise IndexError("theatre row out of range")
+    return self._view[row * self.spr:(row + 1) * self.spr]
+
+  def __iter__(self):
+    for row in range(self.rows):
+      yield self[row]
+
+  def count_free(self, row:int=None) -> int:
+    if row is not None:
+      return self.buffer.count(0, row * self.spr, (row + 1) * self.spr)
+    return self.buffer.count(0)
+
+  def free_seats(self, row:int, start:int=0) -> list[int]:
+    row_start = row * self.spr
+    # Flip the row so free seats become truthy, then let compress pick out their indexes.
+    free_flags = self.buffer[row_start + start:row_start + self.spr].translate(_FREE_FLAGS)
+    return list(compress(range(start, self.spr), free_flags))
+
+  def mark(self, row:int, seats:list[int], value:int=1):
+    """
+    Set seats in a row to a state. A contiguous block of seats is written as a single slice assignment.
+    """
+    if not seats:
+      return
+    row_start = row * self.spr
+    first, last = min(seats), max(seats)
+    if last - first + 1 == len(seats):
+      self.buffer[row_start + first:row_start + last + 1] = bytes([value]) * len(seats)
+    else:
+      for seat_idx in seats:
+        self.buffer[row_start + seat_idx] = value
+
+  def dump(self) -> bytes:
+    return bytes(self.buffer)
+
+  def load(self, data:bytes):
+    self.buffer[:] = data
+
+# Backends selectable by name when creating a Screening.
+THEATRE_BACKENDS = {
+  "list": ListTheatre,
+  "bytes": ByteTheatre,
+}
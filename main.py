@@ -1,6 +1,48 @@
+import argparse
+import sys
+
+from cinema.instrumentation import metrics
 from program.program import Program
+from program.stream import StreamProgram
+
+def main(args=None):
+  """
+  :param args: Command line arguments. Without --script, runs the interactive Program.
+  """
+  parser = argparse.ArgumentParser(description="GIC Cinemas booking system")
+  parser.add_argument("--script", help="Replay commands from a file, or - for stdin, instead of prompting for input")
+  parser.add_argument("--output", help="File to write script results to, defaults to stdout")
+  parser.add_argument("--metrics", help="Record metrics and write them to this file on exit, as JSON if it ends in .json, otherwise Prometheus text")
+  parser.add_argument("--profile", help="Profile a Program stage, e.g. l_select_seats, written to stderr on exit. Append :sample to use the sampling profiler")
+  options = parser.parse_args(args or [])
+
+  if options.metrics or options.profile:
+    metrics.enable()
+  if options.profile:
+    stage, _, mode = options.profile.partition(":")
+    metrics.profile_stage(stage, "sample" if mode == "sample" else "cprofile")
+  try:
+    run_program(options)
+  finally:
+    if options.metrics:
+      with open(options.metrics, "w") as output:
+        output.write(metrics.to_json() if options.metrics.endswith(".json") else metrics.to_prometheus())
+    if options.profile:
+      print(metrics.profile_report(stage), file=sys.stderr)
+
+def run_program(options):
+  if options.script:
+    lines = sys.stdin if options.script == "-" else open(options.script)
+    output = open(options.output, "w") if options.output else sys.stdout
+    try:
+      StreamProgram().run(lines, output)
+    finally:
+      if lines is not sys.stdin:
+        lines.close()
+      if output is not sys.stdout:
+        output.close()
+    return
 
-def main():
   try:
     prog = Program()
     prog.run(prog.l_start)
@@ -9,4 +51,4 @@ def main():
 
 
 if __name__ == "__main__":
-  main()
\ No newline at end of file
+  main(sys.argv[1:])
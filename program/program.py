@@ -1,5 +1,4 @@
-import re
-
+from cinema.instrumentation import metrics
 from cinema.screening import Screening
 
 class Program():
@@ -68,7 +67,7 @@ class Program():
     """
     menu = "Welcome to GIC Cinemas\n"
     options = {
-      "1": f"Book tickets for {self.screening.get_title_availability()}",
+      "1": f"Book tickets for {self.screening.availability.get_title_availability()}",
       "2": "Check bookings",
       "3": "Exit"
     }
@@ -117,7 +116,7 @@ class Program():
       # select_seats won't need to return to booking interface, but go directly back to main menu
       return False, {"return": True}
     else:
-      vacancy = self.screening.get_vacancy()
+      vacancy = self.screening.get_available()
       print(f"Sorry, there are only {vacancy} {'seat' if vacancy == 1 else 'seats'} available.")
       return True, {}
     
@@ -190,10 +189,16 @@ class Program():
     max(n) would be the longest consecutive page sequence, e.g. main_menu > book_tickets > select_seats.
     This avoids the "max recursion depth reached" issue with the previous implementation, which can more easily be reached in
     the current page structure by constantly navigating back and forth between pages, or even by checking 1000 booking numbers.
+
+    While metrics are enabled, the latency of each pass is recorded per stage (including time waiting for input and nested stages),
+    and stages selected with metrics.profile_stage are profiled.
     """
     running = True
     while running:
-      running, instructions = method(*args, **kwargs)
+      if metrics.enabled:
+        running, instructions = metrics.run_stage(method.__name__, method, *args, **kwargs)
+      else:
+        running, instructions = method(*args, **kwargs)
     return instructions
 
   def exit(self):
@@ -206,22 +211,12 @@ class Program():
   
   def _split_alpha_num(self, alphanum:str) -> tuple[str, str]:
     """
-    Method to take in a string containing a mix of alphabets and numbers.
-
-    Currently configured to find
-
+    Method to take in a string containing a mix of alphabets and numbers, e.g. AAA032, and split it into a valid row and seat number.
+    :return: Separated row and seat num strings, or empty strings if the seat is malformed or outside the theatre.
     """
-    seat_alphanum = re.findall("(\d+|\D+)", alphanum.strip())
-    # Check that only an alpha set and a numeric set is passed as a seat number. E.g. AAA032
-    if len(seat_alphanum) == 2:
-      alpha_row, seat_num = seat_alphanum
-      checks = [
-        (alpha_row.isalpha() and seat_num.isnumeric()), 
-        self.screening.check_valid_seat(alpha_row, seat_num)
-      ]
-      if all(checks):
-        # If all checks passed, return the separated row and seat num strings
-        return alpha_row, seat_num
+    alpha_row, seat_num = self.screening.codec.split_seat(alphanum)
+    if alpha_row and self.screening.check_valid_seat(alpha_row, seat_num):
+      return alpha_row, seat_num
     return "", ""
     
   
\ No newline at end of file
@@ -0,0 +1,101 @@
+import json
+
+from cinema.screening import Screening
+
+class StreamProgram():
+  """
+  Non-interactive driver for replaying box-office logs, reading one command per line and writing one JSON result per line.
+
+  Commands:
+    init [Title] [Row] [SeatsPerRow]
+    book [Tickets] [together]
+    change [BookingId] [Seat]
+    confirm [BookingId]
+    check [BookingId] [map] [ContextRows]
+    availability
+  Blank lines and lines starting with "#" are ignored.
+
+  Results are {"ok": true, ...} with the command's output, or {"ok": false, "error": message}.
+  Unlike Program, no prompts are printed and seat maps are only rendered when "map" is passed to check, limited to the booking's
+  rows and ContextRows rows either side if given.
+  Passing "together" to book seats the party side by side where a row has room, see Screening.create_booking.
+  """
+  def __init__(self):
+    self.screening = Screening("None", 0, 0)
+    self.handlers = {
+      "init": self.c_init,
+      "book": self.c_book,
+      "change": self.c_change,
+      "confirm": self.c_confirm,
+      "check": self.c_check,
+      "availability": self.c_availability,
+    }
+
+  def run(self, lines, output):
+    """
+    Execute commands from an iterable of lines, e.g. a file or sys.stdin, writing results to output.
+    :return: Number of commands executed.
+    """
+    executed = 0
+    encode = json.JSONEncoder(separators=(",", ":")).encode
+    for line in lines:
+      command, *args = line.split() or [""]
+      if not command or command.startswith("#"):
+        continue
+      handler = self.handlers.get(command)
+      try:
+        if not handler:
+          raise Exception(f"Unknown command \"{command}\"!")
+        result = handler(*args)
+      except TypeError as error:
+        if error.__traceback__.tb_next is not None:
+          # Raised inside the handler rather than when binding its arguments.
+          raise
+        result = {"ok": False, "error": f"Wrong number of arguments for \"{command}\"!"}
+      except Exception as error:
+        result = {"ok": False, "error": str(error)}
+      output.write(encode(result) + "\n")
+      executed += 1
+    return executed
+
+  def c_init(self, title:str, rows:str, spr:str) -> dict:
+    if not rows.isnumeric() or not spr.isnumeric():
+      raise Exception(f"\"{rows} {spr}\" are not valid numbers of rows and seats per row!")
+    self.screening = Screening(title, int(rows), int(spr))
+    return {"ok": True, "vacancies": self.screening.get_vacancy()}
+
+  def c_book(self, tickets:str, mode:str="") -> dict:
+    if not tickets.isnumeric():
+      raise Exception(f"\"{tickets}\" is not a valid number!")
+    booking_id = self.screening.create_booking(int(tickets), together=mode == "together")
+    if not booking_id:
+      raise Exception(f"Only {self.screening.get_available()} seats available!")
+    return self._booking_result(booking_id)
+
+  def c_change(self, booking_id:str, seat:str) -> dict:
+    alpha_row, seat_num = self.screening.codec.split_seat(seat)
+    if not alpha_row or not self.screening.check_valid_seat(alpha_row, seat_num):
+      raise Exception(f"\"{seat}\" is not a valid seat number!")
+    return self._booking_result(self.screening.change_seats(booking_id, alpha_row, seat_num))
+
+  def c_confirm(self, booking_id:str) -> dict:
+    return {"ok": True, "id": self.screening.confirm_booking(booking_id)}
+
+  def c_check(self, booking_id:str, *options) -> dict:
+    booking = self.screening.bookings.get_booking(booking_id)
+    if not booking:
+      raise Exception(f"Booking id \"{booking_id}\" does not exist!")
+    result = self._booking_result(booking_id)
+    result["confirmed"] = booking.confirmed
+    if "map" in options:
+      context = [int(option) for option in options if option.isnumeric()]
+      result["map"] = "\n".join(self.screening.iter_theatre(booking.seats, context=context[0] if context else None))
+    return result
+
+  def c_availability(self) -> dict:
+    availability = self.screening.availability
+    return {"ok": True, "title": availability.title, "vacancies": availability.vacancies}
+
+  def _booking_result(self, booking_id:str) -> dict:
+    booking = self.screening.bookings.get_booking(booking_id)
+    return {"ok": True, "id": booking_id, "seats": self.screening.seat_labels(booking.seats)}
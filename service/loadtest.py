@@ -0,0 +1,81 @@
+"""
+Load test for the booking service, reporting p50/p99 request latency.
+
+Each simulated client keeps a connection open and repeatedly books 1-4 tickets, checks the booking and confirms it,
+reading availability in between. Without a URL, a local server is started in-process on a free port.
+
+Run with `python -m service.loadtest [clients] [requests_per_client] [host:port]`.
+"""
+import asyncio
+import json
+import random
+import statistics
+import sys
+import time
+
+from cinema.screening import Screening
+from service.server import BookingService
+
+async def request(reader, writer, method:str, path:str, body:dict=None) -> tuple[int, dict]:
+  data = json.dumps(body).encode() if body is not None else b""
+  writer.write(f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nContent-Length: {len(data)}\r\n\r\n".encode() + data)
+  await writer.drain()
+  head = await reader.readuntil(b"\r\n\r\n")
+  status_line, *header_lines = head.decode("latin-1").split("\r\n")
+  length = 0
+  for line in header_lines:
+    if line.lower().startswith("content-length:"):
+      length = int(line.split(":", 1)[1])
+  payload = json.loads(await reader.readexactly(length)) if length else {}
+  return int(status_line.split()[1]), payload
+
+async def client(host:str, port:int, requests:int, seed:int, latencies:list):
+  rng = random.Random(seed)
+  reader, writer = await asyncio.open_connection(host, port)
+
+  async def timed(method, path, body=None):
+    start = time.perf_counter()
+    result = await request(reader, writer, method, path, body)
+    latencies.append(time.perf_counter() - start)
+    return result
+
+  sent = 0
+  while sent < requests:
+    status, payload = await timed("POST", "/bookings", {"tickets": rng.randint(1, 4)})
+    sent += 1
+    if status != 200:
+      await timed("GET", "/availability")
+      sent += 1
+      continue
+    booking_id = payload["booking_id"]
+    await timed("GET", f"/bookings/{booking_id}")
+    await timed("POST", f"/bookings/{booking_id}/confirm")
+    await timed("GET", "/availability")
+    sent += 3
+  writer.close()
+
+async def run(clients=50, requests_per_client=200, address=None):
+  service, server = None, None
+  if address:
+    host, port = address.split(":")
+  else:
+    service = BookingService(Screening("LoadTest", 100, 50, hold_timeout=300))
+    server = await service.start(port=0)
+    host, port = server.sockets[0].getsockname()[:2]
+
+  latencies = []
+  start = time.perf_counter()
+  await asyncio.gather(*[client(host, int(port), requests_per_client, seed, latencies) for seed in range(clients)])
+  elapsed = time.perf_counter() - start
+
+  if server:
+    await service.stop(server)
+
+  latencies.sort()
+  percentiles = statistics.quantiles(latencies, n=100)
+  print(f"{len(latencies)} requests from {clients} clients in {elapsed:.2f}s ({len(latencies) / elapsed:,.0f} req/sec)")
+  print(f"p50: {percentiles[49] * 1000:.2f} ms, p99: {percentiles[98] * 1000:.2f} ms, max: {latencies[-1] * 1000:.2f} ms")
+
+if __name__ == "__main__":
+  args = sys.argv[1:]
+  asyncio.run(run(*[int(arg) for arg in args[:2]], *args[2:3]))
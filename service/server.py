@@ -0,0 +1,251 @@
+"""
+Asyncio HTTP front end for a Screening, so kiosks and web clients can book concurrently.
+
+Routes (JSON request and response bodies):
+  GET  /availability                 -> {"title", "vacancies", "version"}
+  POST /bookings        {"tickets", "together"?} -> {"booking_id", "seats"}
+  GET  /bookings/<id>[?context=N]    -> {"booking_id", "confirmed", "seats", "theatre"}
+  POST /bookings/<id>/seats {"seat"} -> {"booking_id", "seats"}
+  POST /bookings/<id>/confirm        -> {"booking_id", "confirmed"}
+  GET  /changes?since=N              -> {"seq", "deltas"} to resume from N, or {"seq", "snapshot"} without N or if N is too old
+
+Run with `python -m service.server [title] [rows] [spr] [port]`.
+"""
+import asyncio
+import json
+import sys
+from urllib.parse import parse_qsl
+
+from cinema.scheduler import HoldReaper
+from cinema.screening import Screening
+
+class ServiceError(Exception):
+  def __init__(self, status:int, message:str):
+    super().__init__(message)
+    self.status = status
+
+class ScreeningWorker:
+  def __init__(self, screening:Screening, max_batch:int=256):
+    """
+    Applies operations against a single Screening in arrival order.
+
+    Requests only enqueue an operation and await its result. One task drains the queue in batches and runs each
+    batch back to back, so bursts of bookings are applied in order without any request taking a lock.
+    """
+    self.screening = screening
+    self.max_batch = max_batch
+    self.queue = asyncio.Queue()
+    self.task = None
+
+  def start(self):
+    self.task = asyncio.get_running_loop().create_task(self._drain())
+
+  async def stop(self):
+    if self.task:
+      self.task.cancel()
+      await asyncio.gather(self.task, return_exceptions=True)
+
+  async def submit(self, operation, *args):
+    future = asyncio.get_running_loop().create_future()
+    await self.queue.put((operation, args, future))
+    return await future
+
+  async def _drain(self):
+    while True:
+      batch = [await self.queue.get()]
+      while len(batch) < self.max_batch and not self.queue.empty():
+        batch.append(self.queue.get_nowait())
+      outcomes = []
+      for operation, args, future in batch:
+        if future.cancelled():
+          # Client went away before its turn, skip the operation entirely.
+          continue
+        try:
+          outcomes.append((future, operation(*args), None))
+        except ServiceError as error:
+          outcomes.append((future, None, error))
+        except Exception as error:
+          outcomes.append((future, None, ServiceError(409, str(error))))
+      if self.screening.journal is not None:
+        # One fsync covers the whole batch, and no client hears back before its changes are durable.
+        # The fsync runs on a worker thread so other connections are still served while it waits on the disk.
+        await asyncio.get_running_loop().run_in_executor(None, self.screening.journal.flush)
+      for future, result, error in outcomes:
+        if future.cancelled():
+          continue
+        if error:
+          future.set_exception(error)
+        else:
+          future.set_result(result)
+      # Let request handlers pick up their results before draining the next batch.
+      await asyncio.sleep(0)
+
+class BookingService:
+  def __init__(self, screening:Screening):
+    self.screening = screening
+    self.worker = ScreeningWorker(screening)
+
+  # Operations below run inside ScreeningWorker, never concurrently with each other.
+  def _availability(self):
+    availability = self.screening.availability
+    return {"title": availability.title, "vacancies": availability.vacancies, "version": availability.version}
+
+  def _create_booking(self, tickets, together=False):
+    # bool is a subclass of int, so true would otherwise be taken as 1 ticket.
+    if type(tickets) is not int or tickets < 1:
+      raise ServiceError(400, "tickets must be a positive integer")
+    booking_id = self.screening.create_booking(tickets, together=bool(together))
+    if not booking_id:
+      raise ServiceError(409, f"Sorry, there are only {self.screening.get_available()} seats available.")
+    return self._booking_seats(booking_id)
+
+  def _change_seats(self, booking_id, seat):
+    alpha_row, seat_num = self.screening.codec.split_seat(str(seat))
+    if not alpha_row or not self.screening.check_valid_seat(alpha_row, seat_num):
+      raise ServiceError(400, f"\"{seat}\" is not a valid seat number")
+    self._find_booking(booking_id)
+    self.screening.change_seats(booking_id, alpha_row, seat_num)
+    return self._booking_seats(booking_id)
+
+  def _check_booking(self, booking_id, context=None):
+    # As Screening.check_booking, without rendering the whole map up front.
+    booking = self._find_booking(booking_id)
+    return {
+      "booking_id": booking_id,
+      "confirmed": booking.confirmed,
+      "seats": self.screening.seat_labels(booking.seats),
+      # With context, only the booking's rows and context rows either side, which keeps responses small for large halls.
+      "theatre": "\n".join(self.screening.iter_theatre(booking.seats, context=context)),
+    }
+
+  def _changes(self, since=None):
+    feed = self.screening.feed
+    deltas = feed.since(since) if since is not None else None
+    if deltas is None:
+      return feed.current()
+    return {"seq": feed.seq, "deltas": deltas}
+
+  def _confirm_booking(self, booking_id):
+    self._find_booking(booking_id)
+    booking_id = self.screening.confirm_booking(booking_id)
+    return {"booking_id": booking_id, "confirmed": True}
+
+  def _find_booking(self, booking_id):
+    """
+    :return: Booking with an ID, after expiring holds which ran out, raising 404 if there is no such booking.
+    """
+    self.screening.expire_holds()
+    booking = self.screening.bookings.get_booking(booking_id, None)
+    if not booking:
+      raise ServiceError(404, f"Booking id \"{booking_id}\" does not exist!")
+    return booking
+
+  def _booking_seats(self, booking_id):
+    booking = self.screening.bookings.get_booking(booking_id)
+    return {"booking_id": booking_id, "seats": self.screening.seat_labels(booking.seats)}
+
+  async def dispatch(self, method:str, path:str, body:dict):
+    path, _, query = path.partition("?")
+    parameters = dict(parse_qsl(query))
+    parts = [part for part in path.split("/") if part]
+    if method == "GET" and parts == ["availability"]:
+      # Served from the latest availability snapshot without queueing behind writes.
+      return self._availability()
+    if method == "GET" and parts == ["changes"]:
+      since = parameters.get("since")
+      if since is not None and not since.isnumeric():
+        raise ServiceError(400, "since must be a sequence number")
+      return await self.worker.submit(self._changes, int(since) if since is not None else None)
+    if parts[:1] == ["bookings"]:
+      if method == "POST" and len(parts) == 1:
+        return await self.worker.submit(self._create_booking, body.get("tickets"), body.get("together", False))
+      if method == "GET" and len(parts) == 2:
+        context = parameters.get("context")
+        if context is not None and not context.isnumeric():
+          raise ServiceError(400, "context must be a number of rows")
+        return await self.worker.submit(self._check_booking, parts[1], int(context) if context is not None else None)
+      if method == "POST" and len(parts) == 3 and parts[2] == "seats":
+        return await self.worker.submit(self._change_seats, parts[1], body.get("seat", ""))
+      if method == "POST" and len(parts) == 3 and parts[2] == "confirm":
+        return await self.worker.submit(self._confirm_booking, parts[1])
+    raise ServiceError(404, f"No route for {method} {path}")
+
+  async def handle_connection(self, reader:asyncio.StreamReader, writer:asyncio.StreamWriter):
+    """
+    Minimal HTTP/1.1 handling with keep-alive, enough for JSON clients and the load test.
+    """
+    try:
+      while True:
+        try:
+          head = await reader.readuntil(b"\r\n\r\n")
+        except (asyncio.IncompleteReadError, ConnectionError):
+          break
+        request_line, *header_lines = head.decode("latin-1").split("\r\n")
+        headers = {}
+        for line in header_lines:
+          if ":" in line:
+            name, value = line.split(":", 1)
+            headers[name.strip().lower()] = value.strip()
+        try:
+          method, path, version = request_line.split(" ", 2)
+          length = int(headers.get("content-length", 0))
+          if length < 0:
+            raise ValueError(length)
+        except ValueError:
+          # Without a valid request line and body length the rest of the stream cannot be framed, so the connection is closed.
+          await self._respond(writer, 400, {"error": "Malformed request"}, keep_alive=False)
+          break
+        raw_body = await reader.readexactly(length) if length else b""
+
+        try:
+          body = json.loads(raw_body) if raw_body else {}
+          if not isinstance(body, dict):
+            raise ServiceError(400, "Request body must be a JSON object")
+          status, payload = 200, await self.dispatch(method, path, body)
+        except ValueError:
+          # JSONDecodeError, or UnicodeDecodeError for a body which is not UTF-8.
+          status, payload = 400, {"error": "Request body is not valid JSON"}
+        except ServiceError as error:
+          status, payload = error.status, {"error": str(error)}
+
+        keep_alive = headers.get("connection", "").lower() != "close"
+        await self._respond(writer, status, payload, keep_alive)
+        if not keep_alive:
+          break
+    except (asyncio.IncompleteReadError, ConnectionError):
+      # Client closed the connection part way through a request body or a response.
+      pass
+    finally:
+      writer.close()
+
+  async def _respond(self, writer:asyncio.StreamWriter, status:int, payload:dict, keep_alive:bool):
+    data = json.dumps(payload).encode()
+    writer.write(
+      f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}\r\n"
+      f"Content-Type: application/json\r\nContent-Length: {len(data)}\r\n"
+      f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode() + data
+    )
+    await writer.drain()
+
+  async def start(self, host:str="127.0.0.1", port:int=8000) -> asyncio.AbstractServer:
+    self.worker.start()
+    return await asyncio.start_server(self.handle_connection, host, port)
+
+  async def stop(self, server:asyncio.AbstractServer):
+    server.close()
+    await server.wait_closed()
+    await self.worker.stop()
+
+async def serve(title="Inception", rows=26, spr=50, port=8000, hold_timeout=300):
+  # Clients book independently of each other, so seats are held as soon as they are allocated.
+  service = BookingService(Screening(title, rows, spr, hold_timeout=hold_timeout))
+  # Release seats of abandoned bookings as their holds run out, rather than on the next request.
+  HoldReaper(service.screening).start()
+  server = await service.start(port=port)
+  print(f"Serving {title} ({rows}x{spr}) on http://127.0.0.1:{port}")
+  async with server:
+    await server.serve_forever()
+
+if __name__ == "__main__":
+  args = sys.argv[1:]
+  asyncio.run(serve(*args[:1], *[int(arg) for arg in args[1:4]]))
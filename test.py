@@ -1,6 +1,29 @@
-from unittest import main, mock, TestCase
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import io
+import json
+from unittest import IsolatedAsyncioTestCase, main, mock, TestCase
+import os
+import random
+import socket
 import subprocess
+import tempfile
+import threading
+import time
 from main import main as program
+from program.stream import StreamProgram
+from service.loadtest import request
+from service.server import BookingService
+from benchmarks.concurrent_booking import check_no_double_allocation, terminal
+from benchmarks.replication import run as run_replication, state_digest
+from benchmarks.simulation import generate_scenarios, run_simulation
+from cinema.bulk import read_ticket_counts
+from cinema.catalogue import Catalogue
+from cinema.instrumentation import metrics
+from cinema.journal import JOURNAL_FILE, dump_snapshot, load_snapshot, open_screening
+from cinema.replication import ReplicationFollower, ReplicationLeader
+from cinema.scheduler import ExpiryScheduler, HoldReaper
+from cinema.screening import Screening
 
 ticket_booking_inputs = [
       "Inception 8 10",
@@ -48,6 +71,21 @@ class TestMain(TestCase):
     mocked_input.side_effect = test_inputs
     program()
 
+  def test_script(self):
+    """
+    Test the same bookings as test_1 replayed through the command stream driver
+    """
+    commands = ["init Inception 8 10", "book 4", "change GIC0001 B03", "confirm GIC0001", "book 77", "book 12", "change GIC0002 B05",
+      "confirm GIC0002", "check GIC0001", "check GIC0002 map", "check GIC0003", "change GIC0001"]
+    output = io.StringIO()
+    StreamProgram().run(commands, output)
+    results = [json.loads(line) for line in output.getvalue().splitlines()]
+    self.assertEqual(results[4], {"ok": False, "error": "Only 76 seats available!"})
+    self.assertEqual(results[8]["seats"], ["B03", "B04", "B05", "B06"])
+    self.assertEqual(results[9]["seats"], ["B07", "B08", "B09", "B10", "C02", "C03", "C04", "C05", "C06", "C07", "C08", "C09"])
+    self.assertIn("B .  .  #  #  #  #  o  o  o  o", results[9]["map"])
+    self.assertEqual([result["ok"] for result in results[10:]], [False, False])
+
   # @mock.patch("builtins.input")
   # def test_2(self, mocked_input):
   #   """
@@ -59,5 +97,885 @@ class TestMain(TestCase):
   #   mocked_input.side_effect = test_inputs
   #   program()
 
+def reference_allocate_seats(theatre, tickets, selected_row=-1, selected_seat=-1, carryover_selection={}) -> dict:
+  """
+  Original full-scan implementation of Screening.allocate_seats, kept as the specification for differential tests.
+  """
+  selection = carryover_selection.copy()
+  remaining_tickets = tickets
+  for row_idx, row in enumerate(theatre):
+    if row_idx < selected_row:
+      continue
+    elif remaining_tickets < 1:
+      break
+    availability = row.count(0)
+    if row_idx == selected_row:
+      row = row[selected_seat:]
+      availability = row.count(0)
+      if availability > 0:
+        valid_seats = [seat_idx + selected_seat for seat_idx, seat in enumerate(row) if seat == 0]
+        if availability <= remaining_tickets:
+          selection[row_idx] = valid_seats
+        else:
+          selection[row_idx] = valid_seats[:remaining_tickets]
+        remaining_tickets -= availability
+    else:
+      if availability > 0:
+        if availability <= remaining_tickets:
+          selection[row_idx] = [seat_idx for seat_idx, seat in enumerate(row) if seat == 0]
+        else:
+          empty_stack = []
+          check_left = True
+          if len(row) % 2 == 0:
+            mid_idx = len(row) // 2 - 1
+            left_idx = mid_idx
+            right_idx = mid_idx + 1
+          else:
+            mid_idx = len(row) // 2
+            left_idx = mid_idx - 1
+            right_idx = mid_idx
+            check_left = False
+          existing_selections_in_row = selection.get(row_idx, [])
+          while len(empty_stack) < remaining_tickets and left_idx >= 0 and right_idx < len(row):
+            if check_left:
+              if row[left_idx] == 0 and not left_idx in existing_selections_in_row:
+                empty_stack.append(left_idx)
+              left_idx -= 1
+            else:
+              if row[right_idx] == 0 and not right_idx in existing_selections_in_row:
+                empty_stack.append(right_idx)
+              right_idx += 1
+            check_left = not check_left
+          selection[row_idx] = list(sorted(empty_stack + existing_selections_in_row))
+        remaining_tickets -= availability
+  if remaining_tickets > 0:
+    return reference_allocate_seats(theatre, remaining_tickets, carryover_selection=selection)
+  else:
+    return selection
+
+def reference_get_theatre(screening, selection=None) -> str:
+  """
+  Original uncached implementation of Screening.get_theatre, kept as the specification for rendering tests.
+  """
+  vertical_label_width = (screening.rows // 26) + 1
+  screen_width = vertical_label_width + screening.spr * 3 + vertical_label_width
+  screen_label_index = (screen_width - 11) // 2
+  visual = [(" " * screen_label_index) + "S C R E E N" + (" " * screen_label_index), "-" * screen_width]
+  for row, seats in reversed(list(enumerate(screening.theatre))):
+    output = screening.row_to_alpha_row(row)
+    for idx, seat in enumerate(seats):
+      if selection and idx in selection.get(row, []):
+        seat_repr = "o"
+      elif seat == 1:
+        seat_repr = "#"
+      else:
+        seat_repr = "."
+      output += f" {seat_repr} "
+    visual.append(output.rstrip())
+  column_labels = vertical_label_width * " "
+  for i in range(1, screening.spr + 1):
+    column_labels += f" {i} "
+  visual.append(column_labels)
+  return "\n".join(visual)
+
+class TestInstrumentation(TestCase):
+  def tearDown(self):
+    metrics.disable()
+    metrics.stop_profiling_stage("l_book_tickets")
+    metrics.reset()
+
+  @mock.patch("builtins.input")
+  def test_metrics(self, mocked_input):
+    """
+    Test that Program and Screening record metrics only while enabled, and that a profiled stage produces a report
+    """
+    mocked_input.side_effect = ticket_booking_inputs + ["3"]
+    program()
+    self.assertEqual(metrics.snapshot(), {"counters": [], "histograms": []})
+
+    metrics.enable()
+    metrics.profile_stage("l_book_tickets")
+    mocked_input.side_effect = ticket_booking_inputs + ["3"]
+    program()
+    exported = metrics.to_prometheus()
+    self.assertIn('screening_operation_seconds_count{operation="create_booking"} 3', exported)
+    self.assertIn('program_stage_seconds_count{stage="l_select_seats"}', exported)
+    self.assertIn("allocate_rows_scanned_total", exported)
+    # The whole profile is searched, as allocate_seats takes too little time to be sure of a place among the slowest calls.
+    self.assertIn("allocate_seats", metrics.profile_report("l_book_tickets", limit=1000))
+    counters = {counter["name"]: counter["value"] for counter in json.loads(metrics.to_json())["counters"]}
+    self.assertGreater(counters["rows_rendered_total"], 0)
+
+class TestAllocation(TestCase):
+  def test_matches_reference(self):
+    """
+    Randomly fill theatres of odd and even widths and compare default and changed seat allocations against the full-scan implementation.
+    """
+    rng = random.Random(2025)
+    for rows, spr in [(1, 1), (3, 4), (5, 5), (8, 10), (26, 9), (30, 16)]:
+      screening = Screening("Test", rows, spr)
+      while screening.get_vacancy() > 0:
+        tickets = rng.randint(1, min(screening.get_vacancy(), spr + 3))
+        expected = reference_allocate_seats(screening.theatre, tickets)
+        self.assertEqual(list(screening.allocate_seats(tickets).items()), list(expected.items()))
+        row, seat = rng.randrange(rows), rng.randrange(spr)
+        expected = reference_allocate_seats(screening.theatre, tickets, row, seat)
+        self.assertEqual(list(screening.allocate_seats(tickets, row, seat).items()), list(expected.items()))
+
+        booking_id = screening.create_booking(tickets)
+        if rng.random() < 0.5:
+          screening.change_seats(booking_id, screening.row_to_alpha_row(row), str(seat + 1))
+        screening.confirm_booking(booking_id)
+        self.assertEqual(screening.seat_index.free, screening._count_empty_seats())
+
+  def test_reseat_matches(self):
+    """
+    Try several positions for each booking, as customers do when selecting seats, and compare the cached re-seat path against
+    allocate_seats and the full-scan implementation, with and without held seats.
+    """
+    rng = random.Random(15)
+    for rows, spr, hold_timeout in [(3, 4, None), (8, 10, None), (26, 9, 60), (30, 16, 60)]:
+      screening = Screening("Test", rows, spr, hold_timeout=hold_timeout)
+      pending = []
+      while screening.seat_index.free > 0:
+        tickets = rng.randint(1, min(screening.seat_index.free, spr + 3))
+        booking_id = screening.create_booking(tickets)
+        pending.append(booking_id)
+        for attempt in range(4):
+          row, seat = rng.randrange(rows), rng.randrange(spr)
+          booking = screening.bookings.get_booking(booking_id)
+          screening._release_hold(booking_id, booking.seats)
+          expected = screening.allocate_seats(tickets, row, seat)
+          if hold_timeout is None:
+            self.assertEqual(expected, reference_allocate_seats(screening.theatre, tickets, row, seat))
+          self.assertEqual(list(screening._reseat(tickets, row, seat).items()), list(expected.items()))
+          # Outside hold mode, a booking may need more seats than are free, which overflows over the same rows again.
+          more = screening.seat_index.free + rng.randint(1, 3)
+          self.assertEqual(list(screening._reseat(more, row, seat).items()), list(screening.allocate_seats(more, row, seat).items()))
+          screening._hold_seats(booking_id, booking.seats)
+          screening.change_seats(booking_id, screening.row_to_alpha_row(row), str(seat + 1))
+          self.assertEqual(screening.bookings.get_booking(booking_id).seats, expected)
+        # Leave some bookings held while others are placed around them.
+        if len(pending) > 2 or hold_timeout is None:
+          screening.confirm_booking(pending.pop(0))
+
+    screening = Screening("Test", 2, 4)
+    booking_id = screening.create_booking(5)
+    screening.confirm_booking(screening.create_booking(6))
+    screening.change_seats(booking_id, "A", "2")
+    self.assertEqual(screening.bookings.get_booking(booking_id).seats, {1: [0, 3]})
+
+  def test_allocation_plans(self):
+    """
+    Cached default allocations always match a fresh allocate_seats, while bookings are created, moved, confirmed and expired.
+    """
+    rng = random.Random(20)
+    now = [0]
+    for rows, spr, hold_timeout in [(8, 10, None), (12, 9, 5)]:
+      screening = Screening("Test", rows, spr, hold_timeout=hold_timeout, plan_sizes=6)
+      screening._clock = lambda: now[0]
+      while screening.get_vacancy() > 6:
+        for tickets in range(1, 7):
+          if tickets <= screening.seat_index.free:
+            self.assertEqual(screening.allocation_plans.get(tickets), screening.allocate_seats(tickets))
+        booking_id = screening.create_booking(rng.randint(1, 6))
+        if not booking_id:
+          now[0] += 10
+          continue
+        if rng.random() < 0.3:
+          screening.change_seats(booking_id, screening.row_to_alpha_row(rng.randrange(rows)), str(rng.randint(1, spr)))
+        if rng.random() < 0.8:
+          screening.confirm_booking(booking_id)
+        now[0] += 1
+      stats = screening.allocation_plans.stats()
+      self.assertGreater(stats["hits"], 0)
+      self.assertGreater(stats["invalidations"], 0)
+
+  def test_together_seating(self):
+    """
+    Compare contiguous block queries against scanning each row, and check together bookings sit side by side when a row has room.
+    """
+    rng = random.Random(18)
+    for spr in [1, 7, 10, 33]:
+      screening = Screening("Test", 6, spr)
+      while screening.get_vacancy() > 0:
+        tickets = rng.randint(1, min(screening.get_vacancy(), spr + 2))
+        fits = [(row, seat) for row in range(screening.rows) for seat in range(spr - tickets + 1)
+                if all(screening.theatre[row][seat + offset] == 0 for offset in range(tickets))]
+        for row in range(screening.rows):
+          free = "".join("." if seat == 0 else "#" for seat in screening.theatre[row])
+          length = max(len(run) for run in free.split("#"))
+          self.assertEqual(screening.seat_index.largest_block(row), (free.find("." * length) if length else -1, length))
+          self.assertEqual(screening.seat_index.can_seat_together(row, tickets), any(fit[0] == row for fit in fits))
+        booking_id = screening.create_booking(tickets, together=True)
+        seats = screening.bookings.get_booking(booking_id).seats
+        if fits:
+          middle = (spr - tickets) // 2
+          first_row = fits[0][0]
+          expected = min([seat for row, seat in fits if row == first_row], key=lambda seat: (abs(seat - middle), seat))
+          self.assertEqual(seats, {first_row: list(range(expected, expected + tickets))})
+        else:
+          self.assertEqual(sum(len(row_seats) for row_seats in seats.values()), tickets)
+        screening.confirm_booking(booking_id)
+
+class TestRendering(TestCase):
+  def test_matches_reference(self):
+    """
+    Cached rendering must be byte-identical to the original renderer, with and without booking selections.
+    """
+    rng = random.Random(11)
+    for rows, spr in [(1, 1), (3, 12), (27, 5), (60, 8)]:
+      screening = Screening("Test", rows, spr)
+      self.assertEqual(screening.get_theatre(), reference_get_theatre(screening))
+      while screening.get_vacancy() > 0:
+        booking_id = screening.create_booking(rng.randint(1, min(screening.get_vacancy(), spr * 2)))
+        selection = screening.bookings.get_booking(booking_id).seats
+        self.assertEqual(screening.get_theatre(selection), reference_get_theatre(screening, selection))
+        screening.confirm_booking(booking_id)
+        self.assertEqual(screening.get_theatre(), reference_get_theatre(screening))
+        self.assertEqual(screening.get_theatre(selection), reference_get_theatre(screening, selection))
+
+  def test_viewports(self):
+    """
+    Streamed lines match get_theatre in full, and windows match the corresponding slices of it.
+    """
+    rng = random.Random(21)
+    screening = Screening("Test", 60, 14)
+    while screening.get_vacancy() > 200:
+      screening.confirm_booking(screening.create_booking(rng.randint(1, 20)))
+    booking = screening.bookings.get_booking(screening.create_booking(30))
+    for selection in [None, booking.seats]:
+      full = screening.get_theatre(selection).splitlines()
+      self.assertEqual(list(screening.iter_theatre(selection)), full)
+      self.assertEqual(list(screening.iter_theatre(selection, rows=range(20, 45))), full[:2] + full[2 + 60 - 45:2 + 60 - 20] + full[-1:])
+      # Columns are cut from the full map's seats, relabelled and stripped, but otherwise identical.
+      window = list(screening.iter_theatre(selection, rows=range(30, 32), columns=range(4, 9)))
+      for line, row in zip(window[2:-1], [31, 30]):
+        label = screening.row_to_alpha_row(row)
+        self.assertEqual(line, (label + full[2 + 59 - row][len(label) + 12:len(label) + 27]).rstrip())
+      self.assertEqual(window[-1], "   " + " 5  6  7  8  9 ")
+
+    lines = list(screening.iter_theatre(booking.seats, context=1))
+    rows = sorted(booking.seats)
+    shown = {row for selected in rows for row in range(selected - 1, selected + 2) if 0 <= row < 60}
+    self.assertEqual(len([line for line in lines[2:-1] if not line.strip().startswith("...")]), len(shown))
+    self.assertTrue(all("o" in line for line in lines if line.split(" ")[0] in {screening.row_to_alpha_row(row) for row in rows}))
+
+  def test_availability_snapshots(self):
+    """
+    Each confirmation publishes a snapshot rendering the same map as the live screening, while earlier snapshots keep their version.
+    """
+    rng = random.Random(17)
+    for rows, spr, backend in [(1, 1, "list"), (27, 5, "bytes"), (12, 30, "list")]:
+      screening = Screening("Test", rows, spr, backend=backend)
+      snapshots = [(screening.availability, screening.get_theatre())]
+      while screening.get_vacancy() > 0:
+        booking_id = screening.create_booking(rng.randint(1, min(screening.get_vacancy(), spr * 2)))
+        selection = screening.bookings.get_booking(booking_id).seats
+        screening.confirm_booking(booking_id)
+        availability = screening.availability
+        self.assertEqual(availability.version, len(snapshots))
+        self.assertEqual(availability.get_theatre(selection), reference_get_theatre(screening, selection))
+        self.assertEqual(availability.get_title_availability(), screening.get_title_availability())
+        self.assertEqual(sum(availability.row_free), screening.get_vacancy())
+        snapshots.append((availability, screening.get_theatre()))
+      for availability, expected in snapshots:
+        self.assertEqual(availability.get_theatre(), expected)
+      if rows > 1:
+        # Rows untouched by a confirmation are shared with the previous version.
+        self.assertIs(snapshots[0][0].occupancy[-1], snapshots[1][0].occupancy[-1])
+
+class TestSeatCodec(TestCase):
+  def test_round_trip(self):
+    """
+    Test that row labels and seat coordinates decode to what they were encoded from, including multi-letter rows
+    """
+    screening = Screening("Inception", 60, 12)
+    for row in range(screening.rows):
+      for seat in [0, 11]:
+        self.assertEqual(screening.seat_to_row_coord(*screening.row_coord_to_seat(row, seat)), (row, seat))
+    self.assertEqual([screening.row_to_alpha_row(row) for row in [0, 25, 26, 27, 52]], ["A", "Z", "AA", "BB", "AAA"])
+    self.assertEqual(screening.alpha_row_to_row("bb"), 27)
+    self.assertEqual(screening.alpha_row_to_row("AB"), -1)
+    self.assertFalse(screening.check_valid_seat("AB", "1"))
+    self.assertEqual(screening.row_coord_to_seat(1, 2), ("B", "03"))
+    # A position outside the theatre is refused, rather than falling back to the default allocation.
+    booking_id = screening.create_booking(2)
+    for alpha_row, seat_num in [("AB", "1"), ("A", "13"), ("A", "0")]:
+      with self.assertRaises(Exception):
+        screening.change_seats(booking_id, alpha_row, seat_num)
+    self.assertEqual(screening.bookings.get_booking(booking_id).seats, {0: [5, 6]})
+    self.assertEqual(screening.codec.parse_seat("BB12"), (27, 11))
+    self.assertIsNone(screening.codec.parse_seat("BB13"))
+
+    labels = ["A01", "BB03", "BB02", "CCC12"]
+    selection = screening.codec.labels_to_selection(labels)
+    self.assertEqual(selection, {0: [0], 27: [1, 2], 54: [11]})
+    self.assertEqual(screening.seat_labels(selection), ["A01", "BB02", "BB03", "CCC12"])
+    with self.assertRaises(Exception):
+      screening.codec.labels_to_selection(["A13"])
+
+class TestBulkBooking(TestCase):
+  def test_matches_sequential(self):
+    """
+    Bulk bookings match booking and confirming each party in turn, including parties which no longer fit.
+    """
+    rng = random.Random(3)
+    for rows, spr in [(4, 7), (10, 10), (13, 16)]:
+      ticket_counts = [rng.randint(1, 9) for i in range(rows * spr // 3)]
+      sequential = Screening("Test", rows, spr)
+      sequential.confirm_booking(sequential.create_booking(5))
+      expected = []
+      for tickets in ticket_counts:
+        booking_id = sequential.create_booking(tickets)
+        if booking_id:
+          sequential.confirm_booking(booking_id)
+        expected.append((booking_id, sequential.bookings.get_booking(booking_id).seats if booking_id else {}))
+
+      bulk = Screening("Test", rows, spr)
+      bulk.confirm_booking(bulk.create_booking(5))
+      self.assertEqual(list(bulk.create_bookings(ticket_counts, chunk_size=7)), expected)
+      self.assertEqual(bulk.get_theatre(), sequential.get_theatre())
+      self.assertEqual(bulk.get_vacancy(), sequential.get_vacancy())
+
+  def test_read_ticket_counts(self):
+    self.assertEqual(list(read_ticket_counts(["tickets,company", "4,GIC", "", "12,School"])), [4, 12])
+    self.assertEqual(list(read_ticket_counts(['{"tickets": 3}', '{"tickets": 1, "name": "A"}'])), [3, 1])
+    self.assertRaises(Exception, list, read_ticket_counts(["4", "four"]))
+
+class TestTheatreBackends(TestCase):
+  def test_backends_match(self):
+    """
+    Run the same bookings against each theatre backend and compare seat maps and counts.
+    """
+    rng = random.Random(7)
+    screenings = [Screening("Test", 12, 15, backend=backend) for backend in ["list", "bytes"]]
+    while screenings[0].get_vacancy() > 0:
+      tickets = rng.randint(1, min(screenings[0].get_vacancy(), 20))
+      for screening in screenings:
+        screening.confirm_booking(screening.create_booking(tickets))
+      self.assertEqual(screenings[0].get_theatre(), screenings[1].get_theatre())
+      self.assertEqual(screenings[0]._count_empty_seats(), screenings[1]._count_empty_seats())
+      row = rng.randrange(12)
+      self.assertEqual(screenings[0].theatre.free_seats(row, 3), screenings[1].theatre.free_seats(row, 3))
+
+class TestBookingStores(TestCase):
+  def test_stores_match(self):
+    """
+    Run the same bookings, seat changes and hold expiries against each booking store and compare the bookings.
+    """
+    rng = random.Random(11)
+    clock = [0]
+    screenings = [Screening("Test", 10, 12, hold_timeout=5, booking_store=store) for store in ["objects", "columnar"]]
+    for screening in screenings:
+      screening._clock = lambda: clock[0]
+    for step in range(200):
+      clock[0] += 1
+      tickets = rng.randint(1, 6)
+      row, seat = rng.randrange(10), rng.randint(1, 12)
+      confirm = rng.random() < 0.3
+      results = []
+      for screening in screenings:
+        booking_id = screening.create_booking(tickets)
+        if booking_id:
+          screening.change_seats(booking_id, screening.row_to_alpha_row(row), str(seat))
+          if confirm:
+            screening.confirm_booking(booking_id)
+        results.append([(booking.id, booking.count, booking.confirmed, booking.seats) for booking in screening.bookings.values()])
+      self.assertEqual(results[0], results[1])
+      self.assertEqual(len(screenings[0].bookings), len(screenings[1].bookings))
+    self.assertEqual(screenings[0].get_theatre(), screenings[1].get_theatre())
+    # Seats left behind by seat changes are reused or compacted away.
+    columnar = screenings[1].bookings
+    self.assertLessEqual(len(columnar.seat_data), 2 * sum(len(booking.packed_seats) for booking in columnar.values()))
+    self.assertIsNone(screenings[1].bookings.get_booking("GIC1"))
+    self.assertIsNone(screenings[1].bookings.get_booking("GIC9999"))
+
+  def test_indexes(self):
+    """
+    Test seat, status and creation time queries as bookings are created, changed, confirmed and removed.
+    """
+    for store in ["objects", "columnar"]:
+      screening = Screening("Test", 8, 10, booking_store=store)
+      bookings = screening.bookings
+      bookings.indexes.clock = iter(range(100)).__next__
+      ids = lambda found: [booking.id for booking in found]
+      first, second, third = [screening.create_booking(4) for i in range(3)]
+      # Outside hold mode, unconfirmed bookings are given the same seats.
+      self.assertEqual(ids(bookings.bookings_at_seat(0, 4)), [first, second, third])
+      screening.change_seats(second, "C", "1")
+      screening.confirm_booking(first)
+      self.assertEqual(ids(bookings.bookings_at_seat(0, 4)), [first, third])
+      self.assertEqual(ids(bookings.bookings_at_seat(2, 0)), [second])
+      self.assertEqual(ids(bookings.confirmed_bookings()), [first])
+      self.assertEqual(ids(bookings.unconfirmed_bookings()), [second, third])
+      self.assertEqual(ids(bookings.bookings_created_between(1)), [second, third])
+      self.assertEqual(ids(bookings.bookings_created_between(0, 2)), [first, second])
+
+      bookings.remove_booking(third)
+      self.assertEqual(ids(bookings.bookings_at_seat(0, 4)), [first])
+      self.assertEqual(ids(bookings.bookings_created_between(1)), [second])
+      self.assertEqual(bookings.bookings_at_seat(7, 9), [])
+      # A clock stepping back does not place a booking before those created earlier.
+      bookings.indexes.clock = lambda: 1
+      fourth = screening.create_booking(2)
+      self.assertEqual(ids(bookings.bookings_created_between(2)), [fourth])
+      self.assertEqual(ids(bookings.bookings_created_between(1, 2)), [second])
+
+class TestConcurrentBooking(TestCase):
+  def test_no_double_allocation(self):
+    screening = Screening("Test", 30, 20, hold_timeout=60)
+    with ThreadPoolExecutor(8) as pool:
+      list(pool.map(terminal, [screening] * 8, range(8)))
+    self.assertEqual(check_no_double_allocation(screening), 600)
+    self.assertEqual(screening.seat_index.free, 0)
+
+  def test_holds(self):
+    """
+    Unconfirmed bookings hold their seats until the timeout, after which they are released and cannot be confirmed.
+    """
+    now = [0]
+    screening = Screening("Test", 2, 4, hold_timeout=10)
+    screening._clock = lambda: now[0]
+    first = screening.create_booking(4)
+    second = screening.create_booking(4)
+    self.assertEqual(screening.bookings.get_booking(first).seats, {0: [0, 1, 2, 3]})
+    self.assertEqual(screening.bookings.get_booking(second).seats, {1: [0, 1, 2, 3]})
+    self.assertEqual(screening.create_booking(1), "")
+
+    now[0] = 5
+    screening.change_seats(second, "A", "1")
+    screening.confirm_booking(first)
+    now[0] = 12
+    # Second booking's hold was renewed by the seat change, so it survives past the original timeout.
+    self.assertEqual(screening.check_booking(second)[0], second)
+    now[0] = 15
+    self.assertEqual(screening.check_booking(second)[0], "")
+    self.assertRaises(Exception, screening.confirm_booking, second)
+    self.assertEqual(screening.bookings.get_booking(screening.create_booking(4)).seats, {1: [0, 1, 2, 3]})
+
+  def test_hold_scheduler(self):
+    """
+    Holds expire in deadline order, renewed or cancelled holds are skipped, and the reaper expires holds without other traffic.
+    """
+    scheduler = ExpiryScheduler()
+    for idx in range(1000):
+      scheduler.schedule(idx, 1000 - idx)
+    for idx in range(0, 1000, 2):
+      scheduler.schedule(idx, 2000 + idx)
+    for idx in range(1, 1000, 4):
+      scheduler.cancel(idx)
+    self.assertEqual(len(scheduler), 750)
+    self.assertLessEqual(len(scheduler._heap), 2 * 750)
+    self.assertEqual(scheduler.next_deadline(), 1)
+    self.assertEqual(scheduler.pop_due(10), [999, 995, 991])
+    self.assertEqual(scheduler.pop_due(2004), list(range(987, 0, -4)) + [0, 2, 4])
+    self.assertEqual(len(scheduler), 747 - 250)
+
+    screening = Screening("Test", 2, 4, hold_timeout=0.05)
+    reaper = HoldReaper(screening).start()
+    booking_id = screening.create_booking(8)
+    deadline = time.monotonic() + 5
+    while screening.bookings.get_booking(booking_id) and time.monotonic() < deadline:
+      time.sleep(0.01)
+    reaper.stop()
+    self.assertIsNone(screening.bookings.get_booking(booking_id))
+    self.assertEqual(screening.seat_index.free, 8)
+
+class TestCatalogue(TestCase):
+  def test_routed_batch(self):
+    """
+    Bookings routed through the catalogue give the same results as booking each screening directly, with cached availability.
+    """
+    catalogue = Catalogue(shards=3)
+    keys = [catalogue.add_screening("Inception", f"{hour}:00", f"Hall {hall}", 8, 10) for hour in [10, 14] for hall in [1, 2, 3]]
+    operations = []
+    for key in keys:
+      operations += [(key, "create_booking", 4), (key, "change_seats", "GIC0001", "B", "3"), (key, "confirm_booking", "GIC0001")]
+    operations.append((keys[0], "confirm_booking", "GIC0001"))
+    results = catalogue.run_batch(operations)
+    catalogue.shutdown()
+
+    self.assertEqual(results[:3], ["GIC0001"] * 3)
+    self.assertIsInstance(results[-1], Exception)
+    self.assertEqual(catalogue.get_screening(keys[-1]).bookings.get_booking("GIC0001").seats, {1: [2, 3, 4, 5]})
+    self.assertEqual(catalogue.total_vacancies, 6 * 76)
+    self.assertEqual(catalogue.title_vacancies, {"Inception": 6 * 76})
+    self.assertEqual(catalogue.get_availability()[0], "Inception 10:00 Hall 1 (76 seats available)")
+
+class TestJournal(TestCase):
+  def test_restore(self):
+    """
+    A restored screening matches the original, from snapshot alone, journal alone, and snapshot plus journal tail.
+    """
+    now = [0]
+    for snapshot_every in [None, 3, 1000]:
+      with tempfile.TemporaryDirectory() as directory:
+        screening = open_screening(directory, "Inception", 8, 10, {"snapshot_every": snapshot_every}, hold_timeout=10)
+        screening._clock = lambda: now[0]
+        screening.confirm_booking(screening.create_booking(4))
+        screening.change_seats(screening.create_booking(3), "B", "3")
+        screening.confirm_booking(screening.create_booking(12))
+        screening.create_booking(2)
+        list(screening.create_bookings([3, 2]))
+        now[0] += 20
+        # Expire GIC0002 and GIC0004, then book into the released seats.
+        pending = screening.create_booking(5)
+        screening.journal.close()
+        # Simulate a crash part way through writing a group.
+        with open(os.path.join(directory, JOURNAL_FILE), "ab") as journal_file:
+          journal_file.write(b'{"op":"confirm","id":"GIC00')
+
+        restored = open_screening(directory, hold_timeout=10)
+        self.assertEqual(restored.get_theatre(), screening.get_theatre())
+        self.assertEqual(restored.get_vacancy(), screening.get_vacancy())
+        self.assertEqual(restored.seat_index.free, screening.seat_index.free)
+        self.assertEqual(sorted(restored.bookings.bookings), ["GIC0001", "GIC0003", "GIC0005", "GIC0006", pending])
+        self.assertEqual(restored.bookings.get_booking(pending).seats, screening.bookings.get_booking(pending).seats)
+        restored.confirm_booking(pending)
+        self.assertEqual(restored.create_booking(1), "GIC0008")
+        restored.journal.close()
+
+  def test_creation_times(self):
+    """
+    Bookings restored from a snapshot keep their creation times, and removed bookings are dropped from the time index.
+    """
+    for store in ["objects", "columnar"]:
+      with tempfile.TemporaryDirectory() as directory:
+        screening = open_screening(directory, "Inception", 8, 10, booking_store=store)
+        screening.bookings.indexes.clock = iter(range(100, 200)).__next__
+        booking_ids = [screening.create_booking(2) for i in range(4)]
+        screening.confirm_booking(booking_ids[0])
+        screening.bookings.remove_booking(booking_ids[1])
+        self.assertEqual(screening.bookings.indexes.created_between(0), [booking_ids[0], booking_ids[2], booking_ids[3]])
+        screening.journal.write_snapshot()
+        screening.journal.close()
+        restored = open_screening(directory, booking_store=store)
+        self.assertEqual(restored.bookings.indexes.creation_times(), {booking_ids[0]: 100, booking_ids[2]: 102, booking_ids[3]: 103})
+        self.assertEqual(restored.bookings.indexes.created_between(101, 103), [booking_ids[2]])
+        # Indexes stored in the snapshot match indexes built again from its bookings.
+        snapshot = dump_snapshot(restored, 0)
+        del snapshot["indexes"]
+        rebuilt = load_snapshot(snapshot, booking_store=store)
+        for row_idx in range(8):
+          for seat_idx in range(10):
+            self.assertEqual(restored.bookings.indexes.at_seat(row_idx, seat_idx), rebuilt.bookings.indexes.at_seat(row_idx, seat_idx))
+        self.assertEqual(rebuilt.bookings.indexes.unconfirmed, restored.bookings.indexes.unconfirmed)
+        restored.journal.close()
+
+  def test_writer_thread(self):
+    """
+    Recording events never fsyncs on the booking thread, and snapshots written while bookings are made do not deadlock.
+    """
+    synced_on = set()
+    fsync = os.fsync
+    def recording_fsync(fd):
+      synced_on.add(threading.get_ident())
+      fsync(fd)
+    with tempfile.TemporaryDirectory() as directory, mock.patch("cinema.journal.os.fsync", recording_fsync):
+      screening = open_screening(directory, "Inception", 20, 20, {"group_size": 2, "snapshot_every": 7})
+      synced_on.clear()
+      snapshots = threading.Thread(target=lambda: [screening.journal.write_snapshot() for i in range(20)])
+      snapshots.start()
+      for i in range(50):
+        screening.confirm_booking(screening.create_booking(2))
+      snapshots.join(timeout=10)
+      self.assertFalse(snapshots.is_alive())
+      self.assertNotIn(threading.get_ident(), synced_on)
+      screening.journal.close()
+      restored = open_screening(directory)
+      self.assertEqual(restored.get_theatre(), screening.get_theatre())
+      self.assertEqual(len(restored.bookings), 50)
+      restored.journal.close()
+
+  def test_group_delay(self):
+    """
+    Events of a quiet screening are written group_delay seconds after the first of them, without further events or a flush.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+      screening = open_screening(directory, "Inception", 8, 10, {"group_delay": 0.01})
+      screening.confirm_booking(screening.create_booking(4))
+      time.sleep(0.2)
+      restored = open_screening(directory)
+      self.assertEqual(sorted(restored.bookings.bookings), ["GIC0001"])
+      restored.journal.close()
+      screening.journal.close()
+
+class TestSimulation(TestCase):
+  def test_deterministic(self):
+    """
+    Scenarios from the same seed give the same results in one process and across a pool, apart from timings.
+    """
+    runs = []
+    for workers in [1, 2]:
+      output = io.StringIO()
+      scenarios = generate_scenarios(19, 6, [(8, 10), (5, 7)], change_rate=0.5, together_rate=0.3)
+      totals = run_simulation(scenarios, output, workers)
+      self.assertEqual(totals["scenarios"], 6)
+      results = [json.loads(line) for line in output.getvalue().splitlines()]
+      for result in results:
+        result.pop("latency")
+        result.pop("elapsed_s")
+        self.assertEqual(result["fill_rate"], 1.0)
+      runs.append(results)
+    self.assertEqual(runs[0], runs[1])
+    self.assertEqual([result["scenario"] for result in runs[0]], list(range(6)))
+
+  def test_keeps_caller_metrics(self):
+    """
+    Running scenarios in this process leaves metrics recorded before them, and whether metrics are enabled, as they were.
+    """
+    metrics.enable()
+    metrics.count("caller_total", 3)
+    try:
+      run_simulation(generate_scenarios(3, 2, [(4, 5)]), io.StringIO(), 1)
+      self.assertTrue(metrics.enabled)
+      self.assertEqual(metrics.counters, {("caller_total", ()): 3})
+    finally:
+      metrics.disable()
+      metrics.reset()
+    run_simulation(generate_scenarios(3, 2, [(4, 5)]), io.StringIO(), 1)
+    self.assertFalse(metrics.enabled)
+    self.assertEqual(metrics.snapshot(), {"counters": [], "histograms": []})
+
+class TestSharedScreening(TestCase):
+  def test_matches_screening(self):
+    """
+    Two handles on one shared screening, as two worker processes would have, book the same seats as a Screening in hold mode.
+    Then worker processes book it to a sell-out without allocating any seat twice.
+    """
+    try:
+      from benchmarks.shared_screening import run
+      from cinema.shared import SharedScreening
+    except ImportError:
+      self.skipTest("Shared screenings need fcntl")
+    rng = random.Random(22)
+    with tempfile.TemporaryDirectory() as directory:
+      path = os.path.join(directory, "screening.shared")
+      handles = [SharedScreening.create(path, "Inception", 9, 11)]
+      handles.append(SharedScreening(path))
+      screening = Screening("Inception", 9, 11, hold_timeout=60)
+      pending = []
+      while screening.seat_index.free > 0:
+        handle = rng.choice(handles)
+        tickets = rng.randint(1, min(screening.seat_index.free, 8))
+        together = rng.random() < 0.3
+        booking_id = handle.create_booking(tickets, together=together)
+        self.assertEqual(booking_id, screening.create_booking(tickets, together=together))
+        if rng.random() < 0.3:
+          alpha_row, seat_num = screening.row_coord_to_seat(rng.randrange(9), rng.randrange(11))
+          rng.choice(handles).change_seats(booking_id, alpha_row, seat_num)
+          screening.change_seats(booking_id, alpha_row, seat_num)
+        self.assertEqual(rng.choice(handles).get_booking(booking_id).seats, screening.bookings.get_booking(booking_id).seats)
+        pending.append(booking_id)
+        if rng.random() < 0.7:
+          booking_id = pending.pop(rng.randrange(len(pending)))
+          rng.choice(handles).confirm_booking(booking_id)
+          screening.confirm_booking(booking_id)
+        self.assertEqual(handles[0].get_vacancy(), screening.get_vacancy())
+      for handle in handles:
+        self.assertEqual(handle.get_theatre(), screening.get_theatre())
+      self.assertEqual(handles[1].check_no_double_allocation(), 99)
+      for handle in handles:
+        handle.close()
+
+    bookings, reads, elapsed, seats = run(2, 12, 10, 1)
+    self.assertEqual(seats, 120)
+
+  def test_seat_capacity(self):
+    """
+    A seat change failing for lack of space in the packed seats area leaves the booking holding its old seats.
+    """
+    try:
+      from cinema.shared import SharedScreening
+    except ImportError:
+      self.skipTest("Shared screenings need fcntl")
+    with tempfile.TemporaryDirectory() as directory:
+      shared = SharedScreening.create(os.path.join(directory, "screening.shared"), "Inception", 2, 4, seat_capacity=12)
+      booking_id = shared.create_booking(4)
+      shared.change_seats(booking_id, "B", "1")
+      with self.assertRaises(Exception):
+        shared.change_seats(booking_id, "A", "1")
+      self.assertEqual(shared.get_booking(booking_id).seats, {1: [0, 1, 2, 3]})
+      self.assertEqual(shared.check_no_double_allocation(), 4)
+      shared.confirm_booking(booking_id)
+      self.assertEqual(shared.get_theatre(), Screening("Inception", 2, 4).get_theatre({1: [0, 1, 2, 3]}).replace("o", "#"))
+      shared.close()
+
+class TestOccupancyFeed(TestCase):
+  def test_subscribers_converge(self):
+    """
+    Subscribers rebuild the seat states from deltas whether they keep up, fall behind and are coalesced, or resume later.
+    """
+    def apply(rows, messages, seq):
+      for message in messages:
+        if "snapshot" in message:
+          rows = [list(row) for row in message["snapshot"]]
+        else:
+          self.assertEqual(message["since"], seq)
+          for row_idx, start, stop, state in message["changes"]:
+            rows[row_idx][start:stop] = state * (stop - start)
+        seq = message["seq"]
+      return rows, seq
+
+    rng = random.Random(23)
+    now = [0]
+    screening = Screening("Test", 7, 9, hold_timeout=5)
+    screening._clock = lambda: now[0]
+    live = screening.subscribe()
+    slow = screening.subscribe(limit=3)
+    live_rows, live_seq = apply(None, live.poll(0), 0)
+    resumed_at = None
+    while screening.get_vacancy() > 0:
+      booking_id = screening.create_booking(rng.randint(1, 5))
+      now[0] += 1
+      if not booking_id:
+        now[0] += 5
+        continue
+      if rng.random() < 0.4:
+        screening.change_seats(booking_id, screening.row_to_alpha_row(rng.randrange(7)), str(rng.randint(1, 9)))
+      if rng.random() < 0.7:
+        screening.confirm_booking(booking_id)
+      live_rows, live_seq = apply(live_rows, live.poll(0), live_seq)
+      if resumed_at is None and screening.feed.seq > 10:
+        resumed_at = screening.feed.seq
+        resumed_rows = ["".join(row) for row in live_rows]
+    screening.expire_holds()
+
+    states = [list(row) for row in screening._seat_states()]
+    self.assertEqual(apply(live_rows, live.poll(0), live_seq)[0], states)
+    self.assertGreater(slow.coalesced, 0)
+    self.assertEqual(apply(None, slow.poll(0), 0)[0], states)
+    resumed = screening.subscribe(since=resumed_at)
+    self.assertEqual(apply([list(row) for row in resumed_rows], resumed.poll(0), resumed_at)[0], states)
+    self.assertIn("snapshot", screening.subscribe(since=screening.feed.seq + 5).poll(0)[0])
+    live.close()
+    self.assertNotIn(live, screening.feed.subscribers)
+
+    # Without subscribers, deltas are encoded once read from history.
+    screening = Screening("Test", 2, 4)
+    screening.confirm_booking(screening.create_booking(2))
+    self.assertIsNone(screening.feed.history[-1][2])
+    self.assertEqual(screening.feed.since(0), [{"seq": 1, "since": 0, "changes": [[0, 1, 3, "#"]]}])
+
+class TestReplication(TestCase):
+  def test_follower(self):
+    """
+    A follower matches its leader through holds, seat changes, expiry and a reconnect, and can be promoted to take bookings.
+    """
+    now = [0]
+    screening = Screening("Inception", 8, 10, hold_timeout=10)
+    screening._clock = lambda: now[0]
+    screening.confirm_booking(screening.create_booking(4))
+    leader = ReplicationLeader(screening, backlog=8)
+    follower = ReplicationFollower(leader.address).start(timeout=5)
+    screening.change_seats(screening.create_booking(3), "B", "3")
+    screening.confirm_booking(screening.create_booking(12))
+    now[0] += 20
+    list(screening.create_bookings([2, 5]))
+    self.assertTrue(follower.wait_for(leader.sequence, timeout=5))
+    self.assertEqual(state_digest(follower.screening), state_digest(screening))
+    self.assertIsNone(follower.get_booking("GIC0002"))
+    self.assertEqual(follower.check_booking("GIC0003"), screening.check_booking("GIC0003"))
+
+    # Resume from the backlog after a dropped connection, then from a snapshot once the backlog has moved on.
+    for bookings in [2, 20]:
+      follower._socket.shutdown(socket.SHUT_RDWR)
+      for i in range(bookings):
+        screening.confirm_booking(screening.create_booking(1))
+      self.assertTrue(follower.wait_for(leader.sequence, timeout=5))
+      self.assertEqual(state_digest(follower.screening), state_digest(screening))
+    self.assertGreater(len(follower.lags), 0)
+
+    # A hello without a sequence number to resume from is answered with a snapshot.
+    for hello in [b'{"since": "3"}\n', b'{"since": true}\n', b'[3]\n']:
+      with socket.create_connection(leader.address, timeout=5) as connection:
+        connection.sendall(hello)
+        self.assertIn("snapshot", json.loads(connection.makefile("rb").readline()))
+
+    leader.close()
+    promoted = follower.promote()
+    self.assertEqual(promoted.create_booking(2), screening.create_booking(2))
+
+  def test_promote_holds(self):
+    """
+    A promoted follower keeps holding the seats of bookings unconfirmed on the leader, so they are not booked twice.
+    """
+    screening = Screening("Inception", 2, 4, hold_timeout=60)
+    leader = ReplicationLeader(screening)
+    follower = ReplicationFollower(leader.address).start(timeout=5)
+    held = screening.create_booking(4)
+    self.assertTrue(follower.wait_for(leader.sequence, timeout=5))
+    leader.close()
+
+    promoted = follower.promote()
+    self.assertEqual(promoted.hold_timeout, 60)
+    booking_id = promoted.create_booking(4)
+    self.assertEqual(promoted.bookings.get_booking(booking_id).seats, {1: [0, 1, 2, 3]})
+    self.assertEqual(promoted.create_booking(1), "")
+    promoted.confirm_booking(held)
+    promoted.confirm_booking(booking_id)
+    self.assertEqual(promoted.get_vacancy(), 0)
+
+  def test_follower_processes(self):
+    """
+    Followers in separate processes catch up with the leader, recording replication lag while serving reads.
+    """
+    outcomes, digest = run_replication(followers=2, bookings=150, rows=10, spr=12)
+    for outcome in outcomes:
+      self.assertTrue(outcome["caught_up"])
+      self.assertEqual(outcome["digest"], digest)
+      self.assertGreater(outcome["events"], 0)
+      self.assertGreater(outcome["reads_per_sec"], 0)
+
+class TestBookingService(IsolatedAsyncioTestCase):
+  async def test_booking_flow(self):
+    service = BookingService(Screening("Inception", 8, 10, hold_timeout=60))
+    server = await service.start(port=0)
+    reader, writer = await asyncio.open_connection(*server.sockets[0].getsockname()[:2])
+
+    status, payload = await request(reader, writer, "POST", "/bookings", {"tickets": 4})
+    self.assertEqual((status, payload), (200, {"booking_id": "GIC0001", "seats": ["A04", "A05", "A06", "A07"]}))
+    status, payload = await request(reader, writer, "POST", "/bookings/GIC0001/seats", {"seat": "B03"})
+    self.assertEqual(payload["seats"], ["B03", "B04", "B05", "B06"])
+    status, payload = await request(reader, writer, "POST", "/bookings/GIC0001/seats", {"seat": "Z99"})
+    self.assertEqual(status, 400)
+    status, payload = await request(reader, writer, "POST", "/bookings/GIC0099/seats", {"seat": "B03"})
+    self.assertEqual(status, 404)
+    status, payload = await request(reader, writer, "POST", "/bookings", {"tickets": True})
+    self.assertEqual(status, 400)
+    writer.write(b"POST /bookings HTTP/1.1\r\nContent-Length: 1\r\n\r\n\x80")
+    head = await reader.readuntil(b"\r\n\r\n")
+    self.assertTrue(head.startswith(b"HTTP/1.1 400"))
+    await reader.readexactly(int(head.split(b"Content-Length: ")[1].split(b"\r\n")[0]))
+    status, payload = await request(reader, writer, "POST", "/bookings/GIC0001/confirm")
+    self.assertEqual(payload, {"booking_id": "GIC0001", "confirmed": True})
+    status, payload = await request(reader, writer, "POST", "/bookings/GIC0001/confirm")
+    self.assertEqual(status, 409)
+    status, payload = await request(reader, writer, "GET", "/availability")
+    self.assertEqual(payload, {"title": "Inception", "vacancies": 76, "version": 1})
+    status, payload = await request(reader, writer, "GET", "/bookings/GIC0001?context=1")
+    self.assertEqual(payload["theatre"].splitlines()[2:-1], ["C .  .  .  .  .  .  .  .  .  .", "B .  .  o  o  o  o  .  .  .  .", "A .  .  .  .  .  .  .  .  .  ."])
+    status, payload = await request(reader, writer, "GET", "/bookings/GIC0002")
+    self.assertEqual(status, 404)
+    status, payload = await request(reader, writer, "GET", "/changes?since=2")
+    self.assertEqual(payload, {"seq": 3, "deltas": [{"seq": 3, "since": 2, "changes": [[1, 2, 6, "#"]]}]})
+    status, payload = await request(reader, writer, "GET", "/changes")
+    self.assertEqual((payload["seq"], payload["snapshot"][1]), (3, "..####...."))
+    # Seats held by unconfirmed bookings are not available to new ones, though they still count as vacant.
+    await request(reader, writer, "POST", "/bookings", {"tickets": 70})
+    status, payload = await request(reader, writer, "POST", "/bookings", {"tickets": 10})
+    self.assertEqual((status, payload["error"]), (409, "Sorry, there are only 6 seats available."))
+
+    writer.close()
+    # Requests which cannot be parsed are answered with 400 and the connection closed.
+    for raw in [b"GARBAGE\r\n\r\n", b"GET /availability HTTP/1.1\r\nContent-Length: x\r\n\r\n"]:
+      reader, writer = await asyncio.open_connection(*server.sockets[0].getsockname()[:2])
+      writer.write(raw)
+      response = await reader.read()
+      self.assertTrue(response.startswith(b"HTTP/1.1 400"))
+      writer.close()
+    await service.stop(server)
+
 if __name__ == "__main__":
   main()
\ No newline at end of file